@@ -0,0 +1,211 @@
+# -*- coding: utf-8 -*-
+import pandas as pd
+import numpy as np
+import numba
+from .Binary_ANOVA import (
+    NNS_ANOVA_bin,
+    _anova_certainty,
+    _group_ratios,
+    _group_targets,
+)
+from .Internal_Functions import _plot_enabled
+
+
+@numba.jit(nopython=True, nogil=True, error_model="numpy")
+def _anova_group(x: np.ndarray, x_sort: np.ndarray, prefix: np.ndarray) -> tuple:
+    """Sorts a group into \\code{x_sort}, fills the prefix sums; returns center and targets"""
+    x_sort[:] = np.sort(x)
+    center = x_sort.sum() / x_sort.shape[0]
+    prefix[0] = 0.0
+    prefix[1:] = np.cumsum(x_sort - center)
+    return center, _group_targets(x_sort, center, prefix)
+
+
+@numba.jit(parallel=True, nopython=True, nogil=True, error_model="numpy")
+def _anova_groups(values: np.ndarray, offsets: np.ndarray) -> tuple:
+    """
+    Sorted representation of every group, in parallel: sorted values (same layout as
+    \\code{values}), prefix sums (group g at \\code{offsets[g] + g}), centers, means and the
+    \\code{_group_targets} (one row per group)
+    """
+    k = offsets.shape[0] - 1
+    x_sort = np.empty_like(values)
+    prefix = np.empty(values.shape[0] + k)
+    centers = np.empty(k)
+    means = np.empty(k)
+    targets = np.empty((k, 4))
+    for g in numba.prange(k):
+        lo, hi = offsets[g], offsets[g + 1]
+        centers[g], targets[g] = _anova_group(
+            values[lo:hi], x_sort[lo:hi], prefix[lo + g : hi + g + 1]
+        )
+        means[g] = centers[g] + prefix[hi + g] / (hi - lo)
+    return x_sort, prefix, centers, means, targets
+
+
+@numba.jit(nopython=True, nogil=True, error_model="numpy")
+def _anova_pair(
+    x_sort: np.ndarray,
+    prefix: np.ndarray,
+    offsets: np.ndarray,
+    centers: np.ndarray,
+    means: np.ndarray,
+    targets: np.ndarray,
+    i: int,
+    j: int,
+) -> float:
+    """Certainty of \\code{NNS_ANOVA_bin(group i, group j)} from the precomputed groups"""
+    pair = np.empty(5)
+    pair[0] = 0.5 * (means[i] + means[j])
+    pair[1:] = 0.5 * (targets[i] + targets[j])
+    ratios = np.empty((2, 5))
+    for r, g in enumerate((i, j)):
+        lo, hi = offsets[g], offsets[g + 1]
+        ratios[r] = _group_ratios(x_sort[lo:hi], centers[g], prefix[lo + g : hi + g + 1], pair)
+    return _anova_certainty(ratios, offsets[i + 1] - offsets[i] + offsets[j + 1] - offsets[j])
+
+
+@numba.jit(parallel=True, nopython=True, nogil=True, error_model="numpy")
+def _anova_pairs(
+    x_sort: np.ndarray,
+    prefix: np.ndarray,
+    offsets: np.ndarray,
+    centers: np.ndarray,
+    means: np.ndarray,
+    targets: np.ndarray,
+) -> np.ndarray:
+    """Certainty matrix of all the pairs of groups, rows in parallel"""
+    k = offsets.shape[0] - 1
+    ret = np.eye(k)
+    for p in numba.prange(k):
+        i = np.int64(p)  # prange indices are unsigned
+        for j in range(i + 1, k):
+            c = _anova_pair(x_sort, prefix, offsets, centers, means, targets, i, j)
+            ret[i, j] = c
+            ret[j, i] = c
+    return ret
+
+
+@numba.jit(parallel=True, nopython=True, nogil=True, error_model="numpy")
+def _anova_grand(
+    x_sort: np.ndarray,
+    prefix: np.ndarray,
+    offsets: np.ndarray,
+    centers: np.ndarray,
+    grand: np.ndarray,
+) -> np.ndarray:
+    """\\code{_group_ratios} of every group at the grand targets, in parallel"""
+    k = offsets.shape[0] - 1
+    ret = np.empty((k, 5))
+    for g in numba.prange(k):
+        lo, hi = offsets[g], offsets[g + 1]
+        ret[g] = _group_ratios(x_sort[lo:hi], centers[g], prefix[lo + g : hi + g + 1], grand)
+    return ret
+
+
+def _anova_input(x: [pd.DataFrame, np.ndarray, list, dict]) -> tuple:
+    """Groups of \\code{x} as flat values, offsets and names"""
+    if isinstance(x, pd.DataFrame):
+        names = list(x.columns)
+        groups = [x[c].values for c in names]
+    elif isinstance(x, dict):
+        names = list(x.keys())
+        groups = [np.asarray(x[c]) for c in names]
+    elif isinstance(x, np.ndarray) and len(x.shape) == 2:
+        names = list(range(x.shape[1]))
+        groups = [x[:, c] for c in names]
+    else:
+        names = list(range(len(x)))
+        groups = [np.asarray(g) for g in x]
+    groups = [np.asarray(g, dtype=float).ravel() for g in groups]
+    groups = [g[~np.isnan(g)] for g in groups]  # ragged columns of a data frame
+    if len(groups) < 2:
+        raise Exception("NNS_ANOVA needs at least 2 groups")
+    if any(g.shape[0] == 0 for g in groups):
+        raise Exception("NNS_ANOVA groups should not be empty")
+    offsets = np.zeros(len(groups) + 1, dtype=np.int64)
+    np.cumsum([g.shape[0] for g in groups], out=offsets[1:])
+    return np.concatenate(groups), offsets, names
+
+
+def NNS_ANOVA(
+    control: [pd.DataFrame, pd.Series, np.ndarray, list, dict],
+    treatment: [pd.Series, np.ndarray, None] = None,
+    confidence_interval: [float, None] = None,
+    tails: [str, None] = None,
+    plot: [bool, None] = None,
+) -> dict:
+    r"""
+    NNS ANOVA
+
+    Analysis of variance for any number of groups, based on their continuous CDFs (degree 1
+    partial moment ratios).  With \code{control} and \code{treatment} vectors, it is
+    \link{NNS_ANOVA_bin}.
+
+    Each group is sorted once, with prefix sums and its VaR targets, in parallel (linear in the
+    number of groups); the comparisons with the grand mean and every pairwise binary comparison
+    then only need O(log n) lookups, in parallel.
+
+    @param control a data frame / matrix (one group per column, NaN padding ignored), a list or
+        dict of numeric vectors (groups of any sizes), or the control vector of a binary test.
+    @param treatment a numeric vector; binary test \code{NNS_ANOVA_bin(control, treatment)}.
+    @param confidence_interval numeric [0, 1]; binary test only, see \link{NNS_ANOVA_bin}.
+    @param tails options: ("both", "left", "right"); binary test only, see \link{NNS_ANOVA_bin}.
+    @param plot logical; \code{None} (default) plots only when matplotlib runs on an interactive
+        backend, never in headless batch jobs; \code{True} / \code{False} forces it.
+    @return Returns for groups a dict:
+        \code{"Certainty"}: certainty that the groups are drawn from the same population, from
+        their CDFs at the grand mean of means and grand targets,
+        \code{"Grand Mean"}: mean of the group means,
+        \code{"Group Means"}, \code{"Group CDF"}: mean and continuous CDF at the grand mean of each
+        group (series),
+        \code{"Certainty Matrix"}: data frame of the pairwise \link{NNS_ANOVA_bin} certainties (1 on
+        the diagonal).
+        For \code{control} and \code{treatment}, the dict of \link{NNS_ANOVA_bin}.
+    @references Viole, F. (2017) "Continuous CDFs and ANOVA with NNS"
+    \url{https://ssrn.com/abstract=3007373}
+    @examples
+    A = {"a": np.random.randn(100), "b": np.random.randn(80), "c": np.random.randn(120) + 1}
+    NNS_ANOVA(A)["Certainty Matrix"]
+    """
+    if treatment is not None:
+        return NNS_ANOVA_bin(
+            control,
+            treatment,
+            confidence_interval=confidence_interval,
+            tails=tails,
+            plot=plot,
+        )
+
+    values, offsets, names = _anova_input(control)
+    x_sort, prefix, centers, means, targets = _anova_groups(values, offsets)
+    grand = np.empty(5)
+    grand[0] = np.mean(means)
+    grand[1:] = np.mean(targets, axis=0)
+    ratios = _anova_grand(x_sort, prefix, offsets, centers, grand)
+    certainty = _anova_certainty(ratios, values.shape[0])
+    pairs = _anova_pairs(x_sort, prefix, offsets, centers, means, targets)
+
+    # Graphs
+    if _plot_enabled(plot):
+        import matplotlib.pyplot as plt
+
+        plt.title("NNS ANOVA")
+        plt.boxplot(
+            [values[offsets[g] : offsets[g + 1]] for g in range(len(names))],
+            labels=[str(c) for c in names],
+            vert=False,
+        )
+        plt.xlabel("Means")
+        plt.axvline(grand[0], color="red", linewidth=4, label="Grand Mean")
+
+    return {
+        "Certainty": certainty,
+        "Grand Mean": grand[0],
+        "Group Means": pd.Series(means, index=names),
+        "Group CDF": pd.Series(ratios[:, 0], index=names),
+        "Certainty Matrix": pd.DataFrame(pairs, index=names, columns=names),
+    }
+
+
+__all__ = ["NNS_ANOVA"]
@@ -1,9 +1,280 @@
 # -*- coding: utf-8 -*-
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-from .LPM_UPM_VaR import LPM_VaR, UPM_VaR
-from .Partial_Moments import LPM_ratio, UPM_ratio
+import numba
+from .Internal_Functions import _plot_enabled
+from .Sort_Cache import sorted_values
+
+
+def _sorted_prefix(x: [pd.Series, np.ndarray, list]) -> tuple:
+    """
+    Sorted representation of a group: sorted values, center (mean) and prefix sums of the
+    centered sorted values (centered for precision)
+    """
+    x_sort = np.ascontiguousarray(sorted_values(x), dtype=float)
+    center = np.mean(x_sort)
+    prefix = np.zeros(x_sort.shape[0] + 1)
+    np.cumsum(x_sort - center, out=prefix[1:])
+    return x_sort, center, prefix
+
+
+# error_model="numpy": 0 / 0 is NaN, as LPM_ratio of a constant vector at its value
+@numba.jit(nopython=True, nogil=True, error_model="numpy")
+def _lpm_ratio_sorted(
+    x_sort: np.ndarray, center: float, prefix: np.ndarray, target: float
+) -> float:
+    """\\code{LPM_ratio(1, target, x)} in O(log n): lower / (lower + upper) degree 1 areas"""
+    n = x_sort.shape[0]
+    k = np.searchsorted(x_sort, target, side="right")
+    t = target - center
+    lpm = k * t - prefix[k]
+    upm = (prefix[n] - prefix[k]) - (n - k) * t
+    return lpm / (lpm + upm)
+
+
+@numba.jit(nopython=True, nogil=True, error_model="numpy")
+def _lpm_var_sorted(
+    x_sort: np.ndarray, center: float, prefix: np.ndarray, percentile: float
+) -> float:
+    """
+    \\code{LPM_VaR(percentile, 1, x)}: solution of \\code{LPM_ratio(1, b, x) = percentile}.  The
+    ratio is non decreasing in b; the segment between two sorted values is found by bisection on
+    the indices, and the ratio is linear-fractional on it, so b is solved in closed form there.
+    """
+    n = x_sort.shape[0]
+    if x_sort[0] == x_sort[n - 1]:
+        return x_sort[0]
+    p = max(min(percentile, 1.0), 0.0)
+    # largest j with ratio(x_sort[j]) <= p (ratio(x_sort[0]) = 0)
+    lo, hi = 0, n - 1
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if _lpm_ratio_sorted(x_sort, center, prefix, x_sort[mid]) <= p:
+            lo = mid
+        else:
+            hi = mid - 1
+    if lo == n - 1:
+        return x_sort[n - 1]
+    k = np.searchsorted(x_sort, x_sort[lo], side="right")
+    # (1 - p) (k t - P_k) = p ((P_n - P_k) - (n - k) t)
+    b = (p * prefix[n] + (1 - 2 * p) * prefix[k]) / ((1 - p) * k + p * (n - k)) + center
+    return min(max(b, x_sort[lo]), x_sort[k])
+
+
+@numba.jit(nopython=True, nogil=True, error_model="numpy")
+def _group_targets(x_sort: np.ndarray, center: float, prefix: np.ndarray) -> np.ndarray:
+    """Upper 25%, lower 25%, upper 12.5% and lower 12.5% targets (degree 1 VaR) of a group"""
+    ret = np.empty(4)
+    ret[0] = _lpm_var_sorted(x_sort, center, prefix, 0.75)  # UPM_VaR(0.25, 1, x)
+    ret[1] = _lpm_var_sorted(x_sort, center, prefix, 0.25)  # LPM_VaR(0.25, 1, x)
+    ret[2] = _lpm_var_sorted(x_sort, center, prefix, 0.875)  # UPM_VaR(0.125, 1, x)
+    ret[3] = _lpm_var_sorted(x_sort, center, prefix, 0.125)  # LPM_VaR(0.125, 1, x)
+    return ret
+
+
+@numba.jit(nopython=True, nogil=True, error_model="numpy")
+def _group_ratios(
+    x_sort: np.ndarray, center: float, prefix: np.ndarray, targets: np.ndarray
+) -> np.ndarray:
+    """
+    Continuous CDF of a group at the mean of means, and its tail ratios at the upper / lower 25%
+    and 12.5% targets (\\code{targets}: mean of means, then as \\code{_group_targets})
+    """
+    ret = np.empty(5)
+    ret[0] = _lpm_ratio_sorted(x_sort, center, prefix, targets[0])
+    ret[1] = 1 - _lpm_ratio_sorted(x_sort, center, prefix, targets[1])  # UPM_ratio
+    ret[2] = _lpm_ratio_sorted(x_sort, center, prefix, targets[2])
+    ret[3] = 1 - _lpm_ratio_sorted(x_sort, center, prefix, targets[3])  # UPM_ratio
+    ret[4] = _lpm_ratio_sorted(x_sort, center, prefix, targets[4])
+    return ret
+
+
+@numba.jit(nopython=True, nogil=True, error_model="numpy")
+def _anova_certainty(ratios: np.ndarray, n: int) -> float:
+    """Certainty of groups from their \\code{_group_ratios} (one row per group), n observations"""
+    # Continuous CDF Deviation from 0.5
+    MAD_CDF = min(0.5, np.max(np.abs(ratios[:, 0] - 0.5)))
+    upper_25_CDF = min(0.25, np.max(np.abs(ratios[:, 1] - 0.25)))
+    lower_25_CDF = min(0.25, np.max(np.abs(ratios[:, 2] - 0.25)))
+    upper_125_CDF = min(0.125, np.max(np.abs(ratios[:, 3] - 0.125)))
+    lower_125_CDF = min(0.125, np.max(np.abs(ratios[:, 4] - 0.125)))
+
+    # Certainty associated with samples
+    rho = (
+        ((0.5 - MAD_CDF) ** 2) / 0.25
+        + 0.5 * (((0.25 - upper_25_CDF) ** 2) / 0.25 ** 2)
+        + 0.5 * (((0.25 - lower_25_CDF) ** 2) / 0.25 ** 2)
+        + 0.25 * (((0.125 - upper_125_CDF) ** 2) / 0.125 ** 2)
+        + 0.25 * (((0.125 - lower_125_CDF) ** 2) / 0.125 ** 2)
+    ) / 2.5
+    pop_adjustment = ((n - 2) / n) ** 2
+    return min(1.0, rho * pop_adjustment)
+
+
+@numba.jit(nopython=True, nogil=True, error_model="numpy")
+def _anova_bin_stats(
+    c_sort: np.ndarray,
+    c_center: float,
+    c_prefix: np.ndarray,
+    t_sort: np.ndarray,
+    t_center: float,
+    t_prefix: np.ndarray,
+    targets: np.ndarray,
+    CI: float,
+) -> np.ndarray:
+    """
+    Control mean, treatment mean, grand mean, control CDF, treatment CDF, certainty, and the
+    \\code{UPM_VaR} / \\code{LPM_VaR} of the control at \\code{1 - CI} (NaN without CI).
+    \\code{targets}: mean of means, upper / lower 25% and 12.5% targets; computed if the upper and
+    lower 25% targets are NaN, the grand mean if the mean of means is NaN.
+    """
+    n_c, n_t = c_sort.shape[0], t_sort.shape[0]
+    c_mean = c_center + c_prefix[n_c] / n_c
+    t_mean = t_center + t_prefix[n_t] / n_t
+    targets = targets.copy()
+    if np.isnan(targets[1]) and np.isnan(targets[2]):
+        targets[0] = np.nan
+        targets[1:] = 0.5 * (
+            _group_targets(c_sort, c_center, c_prefix)
+            + _group_targets(t_sort, t_center, t_prefix)
+        )
+    if np.isnan(targets[0]):
+        targets[0] = 0.5 * (c_mean + t_mean)
+
+    ratios = np.empty((2, 5))
+    ratios[0] = _group_ratios(c_sort, c_center, c_prefix, targets)
+    ratios[1] = _group_ratios(t_sort, t_center, t_prefix, targets)
+
+    ret = np.full(8, np.nan)
+    ret[0], ret[1], ret[2] = c_mean, t_mean, targets[0]
+    ret[3], ret[4] = ratios[0, 0], ratios[1, 0]
+    ret[5] = _anova_certainty(ratios, n_c + n_t)
+    if not np.isnan(CI):
+        ret[6] = _lpm_var_sorted(c_sort, c_center, c_prefix, CI)  # UPM_VaR(1 - CI, 1, control)
+        ret[7] = _lpm_var_sorted(c_sort, c_center, c_prefix, 1 - CI)  # LPM_VaR(1 - CI, 1, control)
+    return ret
+
+
+def _anova_tails(confidence_interval: [float, None], tails: [str, None]) -> tuple:
+    """Checked tails and the one-sided level \\code{CI} of the effect bounds (NaN without CI)"""
+    if tails is None:
+        tails = "both"
+    if tails not in [None, "both", "left", "right"]:
+        raise Exception("Tails must be None, both, left or right")
+    CI = np.nan
+    if confidence_interval is not None:
+        if tails == "both":
+            CI = confidence_interval + (1 - confidence_interval) / 2
+        elif tails in ["left", "right"]:
+            CI = confidence_interval
+    return tails, CI
+
+
+@numba.jit(nopython=True, nogil=True, error_model="numpy")
+def _anova_bin_sorted(c_sort: np.ndarray, t_sort: np.ndarray, CI: float) -> np.ndarray:
+    """\\code{_anova_bin_stats} of sorted groups, computed targets"""
+    c_center = c_sort.sum() / c_sort.shape[0]
+    t_center = t_sort.sum() / t_sort.shape[0]
+    c_prefix = np.zeros(c_sort.shape[0] + 1)
+    c_prefix[1:] = np.cumsum(c_sort - c_center)
+    t_prefix = np.zeros(t_sort.shape[0] + 1)
+    t_prefix[1:] = np.cumsum(t_sort - t_center)
+    return _anova_bin_stats(
+        c_sort, c_center, c_prefix, t_sort, t_center, t_prefix, np.full(5, np.nan), CI
+    )
+
+
+@numba.jit(nopython=True, nogil=True, error_model="numpy")
+def _anova_bin_cell(control: np.ndarray, treatment: np.ndarray, CI: float) -> np.ndarray:
+    """\\code{_anova_bin_stats} of unsorted groups (NaN if a group is empty)"""
+    if control.shape[0] == 0 or treatment.shape[0] == 0:
+        return np.full(8, np.nan)
+    return _anova_bin_sorted(np.sort(control), np.sort(treatment), CI)
+
+
+@numba.jit(nopython=True, nogil=True)
+def _bootstrap_sorted(x_sort: np.ndarray) -> np.ndarray:
+    """
+    Resample with replacement of a sorted vector, sorted without sorting: the draws are counted
+    per position (O(n)) and the values repeated in order
+    """
+    n = x_sort.shape[0]
+    counts = np.zeros(n, dtype=np.int64)
+    for i in np.random.randint(0, n, n):
+        counts[i] += 1
+    ret = np.empty(n)
+    k = 0
+    for i in range(n):
+        for _ in range(counts[i]):
+            ret[k] = x_sort[i]
+            k += 1
+    return ret
+
+
+@numba.jit(nopython=True, nogil=True, error_model="numpy")
+def _anova_bin_replicate(
+    c_sort: np.ndarray, t_sort: np.ndarray, pooled: np.ndarray, seed: int, permute: bool
+) -> np.ndarray:
+    """
+    Certainty and effect size (treatment mean - control mean) of one replicate drawn from the
+    stream \\code{seed}: bootstrap of each group, or random split of the sorted pooled groups
+    (\\code{permute}); either way the replicate groups come out sorted.
+    """
+    np.random.seed(seed)
+    if permute:
+        mask = np.zeros(pooled.shape[0], dtype=np.bool_)
+        mask[np.random.permutation(pooled.shape[0])[: c_sort.shape[0]]] = True
+        stats = _anova_bin_sorted(pooled[mask], pooled[~mask], np.nan)
+    else:
+        stats = _anova_bin_sorted(_bootstrap_sorted(c_sort), _bootstrap_sorted(t_sort), np.nan)
+    ret = np.empty(2)
+    ret[0] = stats[5]
+    ret[1] = stats[1] - stats[0]
+    return ret
+
+
+@numba.jit(parallel=True, nopython=True, nogil=True, error_model="numpy")
+def _anova_bin_replicates(
+    c_sort: np.ndarray, t_sort: np.ndarray, pooled: np.ndarray, reps: int, seed: int, permute: bool
+) -> np.ndarray:
+    """
+    \\code{_anova_bin_replicate} of \\code{reps} replicates in parallel; replicate b draws from the
+    stream \\code{seed + b}, so results do not depend on the number of threads.
+    """
+    ret = np.empty((reps, 2))
+    for b in numba.prange(reps):
+        ret[b] = _anova_bin_replicate(c_sort, t_sort, pooled, seed + b, permute)
+    return ret
+
+
+@numba.jit(parallel=True, nopython=True, nogil=True, error_model="numpy")
+def _anova_bin_cells(
+    control: np.ndarray,
+    control_offsets: np.ndarray,
+    treatment: np.ndarray,
+    treatment_offsets: np.ndarray,
+    CI: float,
+) -> np.ndarray:
+    """\\code{_anova_bin_cell} of every cell of the ragged groups, in parallel"""
+    m = control_offsets.shape[0] - 1
+    ret = np.empty((m, 8))
+    for i in numba.prange(m):
+        ret[i] = _anova_bin_cell(
+            control[control_offsets[i] : control_offsets[i + 1]],
+            treatment[treatment_offsets[i] : treatment_offsets[i + 1]],
+            CI,
+        )
+    return ret
+
+
+_ANOVA_FIELDS = [
+    "Control Mean",
+    "Treatment Mean",
+    "Grand Mean",
+    "Control CDF",
+    "Treatment CDF",
+    "Certainty",
+]
 
 
 def NNS_ANOVA_bin(
@@ -16,66 +287,51 @@ def NNS_ANOVA_bin(
     lower_125_target: [float, None] = None,
     confidence_interval: [float, None] = None,
     tails: [str, None] = None,
-    plot: bool = True,
+    plot: [bool, None] = None,
     par=None,  # NO USE
 ) -> dict:
-    if tails is None:
-        tails = "both"
-    if tails not in [None, "both", "left", "right"]:
-        raise Exception("Tails must be None, both, left or right")
+    r"""
+    NNS ANOVA Binary
 
-    if upper_25_target is None and lower_25_target is None:
-        mean_of_means = np.mean([np.mean(control), np.mean(treatment)])
-        upper_25_target = np.mean([UPM_VaR(0.25, 1, control), UPM_VaR(0.25, 1, treatment)])
-        lower_25_target = np.mean([LPM_VaR(0.25, 1, control), LPM_VaR(0.25, 1, treatment)])
-        upper_125_target = np.mean([UPM_VaR(0.125, 1, control), UPM_VaR(0.125, 1, treatment)])
-        lower_125_target = np.mean([LPM_VaR(0.125, 1, control), LPM_VaR(0.125, 1, treatment)])
+    Analysis of variance of a control and a treatment group based on their continuous CDFs
+    (degree 1 partial moment ratios).  Each group is sorted once, with prefix sums: every target
+    (\link{LPM_VaR} / \link{UPM_VaR}), ratio and effect bound is then an O(log n) lookup.
 
-    # Continuous CDF for each variable from Mean of Means
-    LPM_ratio_1 = LPM_ratio(1, mean_of_means, control)
-    LPM_ratio_2 = LPM_ratio(1, mean_of_means, treatment)
-
-    Upper_25_ratio_1 = UPM_ratio(1, upper_25_target, control)
-    Upper_25_ratio_2 = UPM_ratio(1, upper_25_target, treatment)
-    # Upper_25_ratio = np.mean([Upper_25_ratio_1, Upper_25_ratio_2])
-
-    Lower_25_ratio_1 = LPM_ratio(1, lower_25_target, control)
-    Lower_25_ratio_2 = LPM_ratio(1, lower_25_target, treatment)
-    # Lower_25_ratio = np.mean([Lower_25_ratio_1, Lower_25_ratio_2])
-
-    Upper_125_ratio_1 = UPM_ratio(1, upper_125_target, control)
-    Upper_125_ratio_2 = UPM_ratio(1, upper_125_target, treatment)
-    # Upper_125_ratio = np.mean([Upper_125_ratio_1, Upper_125_ratio_2])
-
-    Lower_125_ratio_1 = LPM_ratio(1, lower_125_target, control)
-    Lower_125_ratio_2 = LPM_ratio(1, lower_125_target, treatment)
-    # Lower_125_ratio = np.mean([Lower_125_ratio_1, Lower_125_ratio_2])
-
-    # Continuous CDF Deviation from 0.5
-    MAD_CDF = min(0.5, max(abs(LPM_ratio_1 - 0.5), abs(LPM_ratio_2 - 0.5)))
-    upper_25_CDF = min(0.25, max(abs(Upper_25_ratio_1 - 0.25), abs(Upper_25_ratio_2 - 0.25)))
-    lower_25_CDF = min(0.25, max(abs(Lower_25_ratio_1 - 0.25), abs(Lower_25_ratio_2 - 0.25)))
-    upper_125_CDF = min(0.125, max(abs(Upper_125_ratio_1 - 0.125), abs(Upper_125_ratio_2 - 0.125)))
-    lower_125_CDF = min(0.125, max(abs(Lower_125_ratio_1 - 0.125), abs(Lower_125_ratio_2 - 0.125)))
-
-    # Certainty associated with samples
-    NNS_ANOVA_rho = (
-        np.sum(
-            [
-                ((0.5 - MAD_CDF) ** 2) / 0.25,
-                0.5 * (((0.25 - upper_25_CDF) ** 2) / 0.25 ** 2),
-                0.5 * (((0.25 - lower_25_CDF) ** 2) / 0.25 ** 2),
-                0.25 * (((0.125 - upper_125_CDF) ** 2) / 0.125 ** 2),
-                0.25 * (((0.125 - lower_125_CDF) ** 2) / 0.125 ** 2),
-            ]
-        )
-        / 2.5
+    @param control a numeric vector.
+    @param treatment a numeric vector.
+    @param mean_of_means, upper_25_target, lower_25_target, upper_125_target, lower_125_target
+        numeric; targets, computed from the groups when the 25% targets are \code{None}.
+    @param confidence_interval numeric [0, 1]; confidence of the effect size bounds (\code{None},
+        default: no bounds).
+    @param tails options: ("both", "left", "right"); tails of the effect size bounds.
+    @param plot logical; \code{None} (default) plots only when matplotlib runs on an interactive
+        backend, never in headless batch jobs; \code{True} / \code{False} forces it.
+    @return Returns a dict: \code{"Control Mean"}, \code{"Treatment Mean"}, \code{"Grand Mean"},
+        \code{"Control CDF"}, \code{"Treatment CDF"}, \code{"Certainty"}, and with
+        \code{confidence_interval}, \code{"Lower Bound Effect"} and \code{"Upper Bound Effect"}.
+    @references Viole, F. (2017) "Continuous CDFs and ANOVA with NNS"
+    \url{https://ssrn.com/abstract=3007373}
+    """
+    tails, CI = _anova_tails(confidence_interval, tails)
+    targets = np.array(
+        [
+            mean_of_means,
+            upper_25_target,
+            lower_25_target,
+            upper_125_target,
+            lower_125_target,
+        ],
+        dtype=float,
     )
+    stats = _anova_bin_stats(*_sorted_prefix(control), *_sorted_prefix(treatment), targets, CI)
+    control_mean, treatment_mean, mean_of_means = stats[0], stats[1], stats[2]
+    ret = dict(zip(_ANOVA_FIELDS, stats[:6]))
 
-    pop_adjustment = ((len(control) + len(treatment) - 2) / (len(control) + len(treatment))) ** 2
-
+    plot = _plot_enabled(plot)
     # Graphs
     if plot:
+        import matplotlib.pyplot as plt
+
         plt.title("NNS ANOVA and Effect Side")
         plt.boxplot(
             [control, treatment],
@@ -94,65 +350,221 @@ def NNS_ANOVA_bin(
         # mtext("Grand Mean", side = 3, col = "red", at = mean_of_means)
 
     if confidence_interval is None:
-        return {
-            "Control Mean": np.mean(control),
-            "Treatment Mean": np.mean(treatment),
-            "Grand Mean": mean_of_means,
-            "Control CDF": LPM_ratio_1,
-            "Treatment CDF": LPM_ratio_2,
-            "Certainty": min(1, NNS_ANOVA_rho * pop_adjustment),
-        }
-    else:
-        # Upper end of CDF confidence interval for control mean
-        Upper_Bound_Effect, Lower_Bound_Effect, CI = None, None, 0
-        if tails == "both":
-            CI = confidence_interval + (1 - confidence_interval) / 2
-        elif tails in ["left", "right"]:
-            CI = confidence_interval
-        a = UPM_VaR(1 - CI, 1, control)
-        b = np.mean(control)
-        if plot:
-            if tails in ["both", "right"]:
-                plt.axvline(max(a, b), color="green", linewidth=4, label="mu+", linestyle=":")
-                # abline(v = max(a, b), col = "green", lwd = 4, lty = 3)
-                # text(max(a, b), pos = 2, 0.75, "mu+", col = "green")
-                # text(max(a, b), pos = 4, 0.75, paste0((1 - CI) * 100, "% --->"), col = "green")}
-
-        # Lower end of CDF confidence interval for control mean
-        c = LPM_VaR(1 - CI, 1, control)
-        d = np.mean(control)
-
-        if plot:
-            if tails in ["both", "left"]:
-                plt.axvline(min(c, d), color="blue", linewidth=4, label="mu-", linestyle=":")
-                # abline(v = min(c, d), col = "blue", lwd = 4, lty = 3)
-                # text(min(c, d), pos = 4, 0.75, "mu-", col = "blue")
-                # text(min(c, d), pos=2, 0.75, paste0( "<--- ", (1 - CI) * 100, "%"), col = 'blue')}
-            # par(original.par)
-
-        # Effect Size Lower Bound
-        if tails in ["both", "right"]:
-            Lower_Bound_Effect = np.mean(treatment) - max(a, b)
-        elif tails == "left":
-            Lower_Bound_Effect = np.mean(treatment) - max(c, d)
+        return ret
 
-        # Effect Size Upper Bound
+    # Upper end of CDF confidence interval for control mean
+    a = stats[6]  # UPM_VaR(1 - CI, 1, control)
+    b = control_mean
+    # Lower end of CDF confidence interval for control mean
+    c = stats[7]  # LPM_VaR(1 - CI, 1, control)
+    d = control_mean
+    if plot:
+        if tails in ["both", "right"]:
+            plt.axvline(max(a, b), color="green", linewidth=4, label="mu+", linestyle=":")
+            # abline(v = max(a, b), col = "green", lwd = 4, lty = 3)
+            # text(max(a, b), pos = 2, 0.75, "mu+", col = "green")
+            # text(max(a, b), pos = 4, 0.75, paste0((1 - CI) * 100, "% --->"), col = "green")}
         if tails in ["both", "left"]:
-            Upper_Bound_Effect = np.mean(treatment) - min(c, d)
-        elif tails == "right":
-            Upper_Bound_Effect = np.mean(treatment) - min(a, b)
-
-        # Certainty Statistic and Effect Size Given Confidence Interval
-        return {
-            "Control Mean": np.mean(control),
-            "Treatment Mean": np.mean(treatment),
-            "Grand Mean": mean_of_means,
-            "Control CDF": LPM_ratio_1,
-            "Treatment CDF": LPM_ratio_2,
-            "Certainty": min(1, NNS_ANOVA_rho * pop_adjustment),
-            "Lower Bound Effect": Lower_Bound_Effect,
-            "Upper Bound Effect": Upper_Bound_Effect,
-        }
-
-
-__all__ = ["NNS_ANOVA_bin"]
+            plt.axvline(min(c, d), color="blue", linewidth=4, label="mu-", linestyle=":")
+            # abline(v = min(c, d), col = "blue", lwd = 4, lty = 3)
+            # text(min(c, d), pos = 4, 0.75, "mu-", col = "blue")
+            # text(min(c, d), pos=2, 0.75, paste0( "<--- ", (1 - CI) * 100, "%"), col = 'blue')}
+        # par(original.par)
+
+    ret["Lower Bound Effect"], ret["Upper Bound Effect"] = _effect_bounds(
+        treatment_mean, a, b, c, d, tails
+    )
+    # Certainty Statistic and Effect Size Given Confidence Interval
+    return ret
+
+
+def _effect_bounds(treatment_mean: float, a: float, b: float, c: float, d: float, tails: str):
+    """Effect size lower and upper bounds from the control CI ends \\code{a} .. \\code{d}"""
+    Upper_Bound_Effect, Lower_Bound_Effect = None, None
+    # Effect Size Lower Bound (element-wise: also used on the columns of the batch)
+    if tails in ["both", "right"]:
+        Lower_Bound_Effect = treatment_mean - np.maximum(a, b)
+    elif tails == "left":
+        Lower_Bound_Effect = treatment_mean - np.maximum(c, d)
+
+    # Effect Size Upper Bound
+    if tails in ["both", "left"]:
+        Upper_Bound_Effect = treatment_mean - np.minimum(c, d)
+    elif tails == "right":
+        Upper_Bound_Effect = treatment_mean - np.minimum(a, b)
+    return Lower_Bound_Effect, Upper_Bound_Effect
+
+
+def _ragged(
+    values: [pd.Series, np.ndarray, list], offsets: [pd.Series, np.ndarray, list], name: str
+) -> tuple:
+    values = np.ascontiguousarray(values, dtype=float)
+    offsets = np.ascontiguousarray(offsets, dtype=np.int64)
+    if offsets.shape[0] < 1 or offsets[0] != 0 or offsets[-1] != values.shape[0]:
+        raise Exception(f"{name} offsets should start at 0 and end at the number of values")
+    if np.any(np.diff(offsets) < 0):
+        raise Exception(f"{name} offsets should be non decreasing")
+    return values, offsets
+
+
+def _grouped_cells(
+    frame: pd.DataFrame, by: [str, list], group: str, value: str, control: object
+) -> tuple:
+    """Flat control / treatment values and offsets of the cells of \\code{frame}, and their keys"""
+    grouped = frame.groupby(by, sort=True)
+    codes = grouped.ngroup().values
+    keys = grouped.size().index
+    valid = codes >= 0  # NaN keys
+    is_control = (frame[group] == control).values
+    values = frame[value].values.astype(float)
+    ret = []
+    for mask in [valid & is_control, valid & ~is_control]:
+        cell = codes[mask]
+        order = np.argsort(cell, kind="stable")
+        offsets = np.zeros(keys.shape[0] + 1, dtype=np.int64)
+        np.cumsum(np.bincount(cell, minlength=keys.shape[0]), out=offsets[1:])
+        ret += [np.ascontiguousarray(values[mask][order]), offsets]
+    return (*ret, keys)
+
+
+def NNS_ANOVA_bin_batch(
+    control: [pd.DataFrame, np.ndarray],
+    control_offsets: [np.ndarray, list, None] = None,
+    treatment: [np.ndarray, None] = None,
+    treatment_offsets: [np.ndarray, list, None] = None,
+    confidence_interval: [float, None] = None,
+    tails: [str, None] = None,
+    by: [str, list, None] = None,
+    group: str = "group",
+    value: str = "value",
+    control_group: object = "control",
+) -> pd.DataFrame:
+    r"""
+    NNS ANOVA Binary Batch
+
+    \link{NNS_ANOVA_bin} of many cells (e.g. metric x experiment), each with its own control and
+    treatment groups of any size, evaluated in parallel in compiled code.
+
+    Cells are given either as flat values plus offsets (cell i's control is
+    \code{control[control_offsets[i]:control_offsets[i + 1]]}, likewise for the treatment), or as
+    a long data frame with one observation per row, grouped by the \code{by} columns.
+
+    @param control numeric vector of all the control values, or a data frame.
+    @param control_offsets integer vector; cell boundaries in \code{control} (number of cells + 1).
+    @param treatment numeric vector of all the treatment values.
+    @param treatment_offsets integer vector; cell boundaries in \code{treatment}.
+    @param confidence_interval numeric [0, 1]; confidence of the effect size bounds (\code{None},
+        default: no bounds).
+    @param tails options: ("both", "left", "right"); tails of the effect size bounds.
+    @param by data frame: column(s) identifying the cells.
+    @param group data frame: column of the group label.
+    @param value data frame: column of the observations.
+    @param control_group data frame: label of the control group in \code{group}, every other
+        label is treatment.
+    @return Returns a data frame with one row per cell (indexed by the \code{by} keys for a data
+        frame) and the columns of \link{NNS_ANOVA_bin}: \code{"Control Mean"},
+        \code{"Treatment Mean"}, \code{"Grand Mean"}, \code{"Control CDF"},
+        \code{"Treatment CDF"}, \code{"Certainty"}, and with \code{confidence_interval},
+        \code{"Lower Bound Effect"}, \code{"Upper Bound Effect"}.  Cells with an empty group are
+        NaN.
+    @examples
+    NNS_ANOVA_bin_batch(events, by=["metric", "experiment"], group="arm", value="value")
+    NNS_ANOVA_bin_batch(c_values, c_offsets, t_values, t_offsets, confidence_interval=0.95)
+    """
+    tails, CI = _anova_tails(confidence_interval, tails)
+    if isinstance(control, pd.DataFrame):
+        if by is None:
+            raise Exception("by is needed to group a data frame into cells")
+        control, control_offsets, treatment, treatment_offsets, index = _grouped_cells(
+            control, by, group, value, control_group
+        )
+    else:
+        if control_offsets is None or treatment is None or treatment_offsets is None:
+            raise Exception("control, control_offsets, treatment and treatment_offsets are needed")
+        control, control_offsets = _ragged(control, control_offsets, "control")
+        treatment, treatment_offsets = _ragged(treatment, treatment_offsets, "treatment")
+        if control_offsets.shape[0] != treatment_offsets.shape[0]:
+            raise Exception("control and treatment should have the same number of cells")
+        index = None
+
+    stats = _anova_bin_cells(control, control_offsets, treatment, treatment_offsets, CI)
+    ret = pd.DataFrame(stats[:, :6], columns=_ANOVA_FIELDS, index=index)
+    if confidence_interval is not None:
+        control_mean = stats[:, 0]
+        ret["Lower Bound Effect"], ret["Upper Bound Effect"] = _effect_bounds(
+            stats[:, 1], stats[:, 6], control_mean, stats[:, 7], control_mean, tails
+        )
+    return ret
+
+
+def NNS_ANOVA_bin_boot(
+    control: [pd.Series, np.ndarray],
+    treatment: [pd.Series, np.ndarray],
+    reps: int = 10000,
+    confidence_interval: float = 0.95,
+    seed: [int, None] = None,
+) -> dict:
+    r"""
+    NNS ANOVA Binary Resampling
+
+    Resampled confidence intervals and p-values of the certainty and effect size of
+    \link{NNS_ANOVA_bin}.  Confidence intervals are percentiles of \code{reps} bootstrap
+    replicates (each group resampled with replacement); p-values come from \code{reps} random
+    permutations of the pooled observations between the groups (null hypothesis: same
+    population).
+
+    Each group is sorted once; resampled groups are built sorted from it (counts of the draws per
+    position, or a random split of the sorted pooled groups), so no replicate sorts.  Replicates
+    run in parallel in compiled code; replicate b uses the random stream \code{seed + b}
+    (bootstrap) and \code{seed + reps + b} (permutation): results are reproducible for a given
+    \code{seed}, whatever the number of threads.
+
+    @param control a numeric vector.
+    @param treatment a numeric vector.
+    @param reps integer; number of bootstrap replicates, and of permutations (10000, default).
+    @param confidence_interval numeric [0, 1]; level of the two-sided percentile intervals (0.95,
+        default).
+    @param seed integer; seed of the replicates (\code{None}, default: drawn from
+        \code{np.random}).
+    @return Returns a dict:
+        \code{"Certainty"}, \code{"Effect Size"}: of the samples (treatment mean - control mean),
+        \code{"Lower Bound Certainty"}, \code{"Upper Bound Certainty"},
+        \code{"Lower Bound Effect"}, \code{"Upper Bound Effect"}: bootstrap percentile intervals,
+        \code{"Certainty p-value"}: share of permutations with a certainty as low as the samples',
+        \code{"Effect p-value"}: share of permutations with an effect size as large in absolute
+        value (two-sided).
+    @examples
+    NNS_ANOVA_bin_boot(control, treatment, reps=10000, seed=123)
+    """
+    if reps < 1:
+        raise Exception("reps needs to be a positive integer")
+    if not 0 <= confidence_interval <= 1:
+        raise Exception("confidence_interval needs to be between 0 and 1")
+    c_sort = np.ascontiguousarray(sorted_values(control), dtype=float)
+    t_sort = np.ascontiguousarray(sorted_values(treatment), dtype=float)
+    if c_sort.shape[0] == 0 or t_sort.shape[0] == 0:
+        raise Exception("control and treatment should not be empty")
+    pooled = np.sort(np.concatenate([c_sort, t_sort]))
+    if seed is None:
+        seed = np.random.randint(0, 2 ** 31 - 2 * reps)
+
+    stats = _anova_bin_sorted(c_sort, t_sort, np.nan)
+    certainty, effect = stats[5], stats[1] - stats[0]
+    boot = _anova_bin_replicates(c_sort, t_sort, pooled, reps, seed, False)
+    perm = _anova_bin_replicates(c_sort, t_sort, pooled, reps, seed + reps, True)
+    q = [(1 - confidence_interval) / 2, (1 + confidence_interval) / 2]
+    certainty_ci = np.quantile(boot[:, 0], q)
+    effect_ci = np.quantile(boot[:, 1], q)
+    return {
+        "Certainty": certainty,
+        "Effect Size": effect,
+        "Lower Bound Certainty": certainty_ci[0],
+        "Upper Bound Certainty": certainty_ci[1],
+        "Lower Bound Effect": effect_ci[0],
+        "Upper Bound Effect": effect_ci[1],
+        "Certainty p-value": (1 + np.sum(perm[:, 0] <= certainty)) / (reps + 1),
+        "Effect p-value": (1 + np.sum(np.abs(perm[:, 1]) >= abs(effect))) / (reps + 1),
+    }
+
+
+__all__ = ["NNS_ANOVA_bin", "NNS_ANOVA_bin_batch", "NNS_ANOVA_bin_boot"]
@@ -0,0 +1,456 @@
+# -*- coding: utf-8 -*-
+import collections
+import contextlib
+import copy
+import functools
+import hashlib
+import inspect
+import os
+import pickle
+import re
+import shutil
+import sys
+import threading
+import time
+import uuid
+
+try:
+    import fcntl
+except ImportError:  # not available on windows: entries stay atomic, eviction is best effort
+    fcntl = None
+
+import numpy as np
+import pandas as pd
+
+
+def _update_hash(h, obj) -> None:
+    if isinstance(obj, pd.DataFrame):
+        h.update(b"DataFrame")
+        _update_hash(h, list(obj.columns))
+        _update_hash(h, obj.index)
+        for dtype in obj.dtypes:
+            h.update(str(dtype).encode())
+        _update_hash(h, obj.values)
+    elif isinstance(obj, pd.Series):
+        h.update(b"Series")
+        _update_hash(h, obj.name)
+        _update_hash(h, obj.index)
+        _update_hash(h, obj.values)
+    elif isinstance(obj, pd.RangeIndex):
+        h.update(f"RangeIndex{obj.start},{obj.stop},{obj.step}".encode())
+    elif isinstance(obj, pd.Index):
+        h.update(b"Index")
+        _update_hash(h, obj.values)
+    elif isinstance(obj, np.ndarray):
+        h.update(f"ndarray{obj.dtype.str}{obj.shape}".encode())
+        if obj.dtype == object:
+            _update_hash(h, obj.tolist())
+        else:
+            h.update(np.ascontiguousarray(obj).view(np.uint8))
+    elif isinstance(obj, (list, tuple)):
+        h.update(f"{type(obj).__name__}{len(obj)}".encode())
+        for i in obj:
+            _update_hash(h, i)
+    elif isinstance(obj, dict):
+        h.update(f"dict{len(obj)}".encode())
+        for k in sorted(obj, key=repr):
+            _update_hash(h, k)
+            _update_hash(h, obj[k])
+    elif callable(obj):
+        name = f"{getattr(obj, '__module__', '')}.{getattr(obj, '__qualname__', obj)}"
+        h.update(f"callable{name}".encode())
+    else:
+        # scalars, strings, None
+        h.update(f"{type(obj).__name__}:{obj!r}".encode())
+
+
+def fingerprint(*objs) -> str:
+    """Content hash of input buffers (ndarray, pandas objects, lists, dicts and scalars)"""
+    h = hashlib.blake2b(digest_size=20)
+    for obj in objs:
+        _update_hash(h, obj)
+    return h.hexdigest()
+
+
+def _nbytes(obj) -> int:
+    """Approximate memory held by a cached result"""
+    if isinstance(obj, (pd.DataFrame, pd.Series)):
+        return int(np.sum(obj.memory_usage(index=True, deep=False)))
+    if isinstance(obj, np.ndarray):
+        return obj.nbytes
+    if isinstance(obj, dict):
+        return sys.getsizeof(obj) + sum(_nbytes(k) + _nbytes(v) for k, v in obj.items())
+    if isinstance(obj, (list, tuple)):
+        return sys.getsizeof(obj) + sum(_nbytes(i) for i in obj)
+    return sys.getsizeof(obj)
+
+
+class ResultCache:
+    r"""
+    In-memory LRU cache of function results
+
+    Entries are evicted least recently used first once their total size goes above
+    \code{max_bytes}, or their number above \code{max_entries}.  Thread safe.
+    @param max_bytes integer; size limit of all cached results, in bytes.
+    @param max_entries integer; optional limit on the number of entries.
+    """
+
+    # get() hands out the stored objects themselves: memoize copies them for the caller
+    shared_results = True
+
+    def __init__(self, max_bytes: int = 256 * 1024 ** 2, max_entries: [int, None] = None):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self._entries = collections.OrderedDict()  # key -> (value, nbytes)
+        self._bytes = 0
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: tuple) -> tuple:
+        """Returns (True, value) on a hit, (False, None) on a miss"""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return True, self._entries[key][0]
+            self.misses += 1
+            return False, None
+
+    def put(self, key: tuple, value) -> None:
+        nbytes = _nbytes(value)
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= self._entries.pop(key)[1]
+            if nbytes > self.max_bytes:
+                return  # would evict everything else and still not fit
+            self._entries[key] = (value, nbytes)
+            self._bytes += nbytes
+            while self._bytes > self.max_bytes or (
+                self.max_entries is not None and len(self._entries) > self.max_entries
+            ):
+                self._bytes -= self._entries.popitem(last=False)[1][1]
+                self.evictions += 1
+
+    def invalidate(self, func: [callable, str, None] = None) -> int:
+        """Drops the entries of one function (name or callable), or every entry; returns the count"""
+        if callable(func):
+            func = _func_name(getattr(func, "__wrapped__", func))
+        with self._lock:
+            keys = [k for k in self._entries if func is None or k[0] == func]
+            for k in keys:
+                self._bytes -= self._entries.pop(k)[1]
+            return len(keys)
+
+    def clear(self) -> None:
+        """Drops every entry and resets the statistics"""
+        with self._lock:
+            self.invalidate()
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self) -> dict:
+        """Hit/miss statistics and current size"""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+default_cache = ResultCache()
+
+
+def _func_name(func) -> str:
+    return f"{func.__module__}.{func.__qualname__}"
+
+
+def memoize(
+    func: [callable, None] = None, cache: [ResultCache, None] = None, copy_result: bool = True
+):
+    r"""
+    Memoization decorator
+
+    Caches the results of \code{func} keyed on a content hash of every argument (after binding
+    defaults), so unchanged data hits the cache whatever object carries it.  Opt-in: wrap any public
+    function of the package, e.g. \code{PM_matrix = memoize(NNS.PM_matrix)} or \code{@memoize}.
+    @param func the function to wrap.
+    @param cache \link{ResultCache} or \link{DiskCache}; \code{None} (default) uses the shared
+        \code{default_cache}.
+    @param copy_result logical; \code{TRUE} (default) returns a copy on every call so callers can
+        modify results without corrupting the cache.
+    @return the wrapped function, with \code{cache_info()} and \code{cache_clear()} attributes.
+    @examples
+    PM_matrix = memoize(NNS.PM_matrix)
+    PM_matrix(1, 1, variable=df)  # computed
+    PM_matrix(1, 1, variable=df.copy())  # cache hit
+    """
+    if func is None:
+        return functools.partial(memoize, cache=cache, copy_result=copy_result)
+
+    signature = inspect.signature(func)
+    name = _func_name(func)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        store = wrapper.cache if wrapper.cache is not None else default_cache
+        bound = signature.bind(*args, **kwargs)
+        bound.apply_defaults()
+        key = (name, fingerprint(list(bound.arguments.items())))
+        hit, value = store.get(key)
+        if not hit:
+            value = func(*args, **kwargs)
+            store.put(key, value)
+        if copy_result and store.shared_results:
+            return copy.deepcopy(value)
+        return value
+
+    wrapper.cache = cache
+    wrapper.cache_info = lambda: (
+        wrapper.cache if wrapper.cache is not None else default_cache
+    ).stats()
+    wrapper.cache_clear = lambda: (
+        wrapper.cache if wrapper.cache is not None else default_cache
+    ).invalidate(name)
+    return wrapper
+
+
+class _Array:
+    """Placeholder for an array stored in its own .npy file"""
+
+    def __init__(self, index: int):
+        self.index = index
+
+
+class _Frame:
+    def __init__(self, values: _Array, index, columns):
+        self.values, self.index, self.columns = values, index, columns
+
+
+class _Series:
+    def __init__(self, values: _Array, index, name):
+        self.values, self.index, self.name = values, index, name
+
+
+def _encode(obj, arrays: list):
+    if isinstance(obj, np.ndarray) and obj.dtype != object:
+        arrays.append(obj)
+        return _Array(len(arrays) - 1)
+    if isinstance(obj, pd.DataFrame) and len(set(obj.dtypes)) == 1 and obj.values.dtype != object:
+        return _Frame(_encode(obj.values, arrays), obj.index, obj.columns)
+    if isinstance(obj, pd.Series) and obj.dtype != object:
+        return _Series(_encode(obj.values, arrays), obj.index, obj.name)
+    if isinstance(obj, dict):
+        return type(obj)((k, _encode(v, arrays)) for k, v in obj.items())
+    if isinstance(obj, (list, tuple)) and type(obj) in (list, tuple):
+        return type(obj)(_encode(i, arrays) for i in obj)
+    return obj
+
+
+def _decode(obj, arrays: list):
+    if isinstance(obj, _Array):
+        return arrays[obj.index]
+    if isinstance(obj, _Frame):
+        values = _decode(obj.values, arrays)
+        return pd.DataFrame(values, index=obj.index, columns=obj.columns, copy=False)
+    if isinstance(obj, _Series):
+        return pd.Series(_decode(obj.values, arrays), index=obj.index, name=obj.name, copy=False)
+    if isinstance(obj, dict):
+        return type(obj)((k, _decode(v, arrays)) for k, v in obj.items())
+    if isinstance(obj, (list, tuple)) and type(obj) in (list, tuple):
+        return type(obj)(_decode(i, arrays) for i in obj)
+    return obj
+
+
+class DiskCache:
+    r"""
+    On-disk cache of function results
+
+    Each entry is a directory of \code{directory}: arrays of the result (ndarray, and the values
+    of single-dtype DataFrame/Series) are stored as \code{.npy} files and reloaded memory-mapped
+    read-only when larger than \code{mmap_min_bytes}, so reloading a large matrix is zero-copy.
+    Entries are written to a temporary directory and renamed into place, and eviction takes a
+    file lock, so several local processes can share one directory.
+    @param directory path of the cache directory (created if missing).
+    @param max_bytes integer; size limit of the directory, least recently used entries are evicted.
+    @param ttl numeric; seconds after which an entry expires, \code{None} (default) never.
+    @param mmap_min_bytes integer; arrays at least this large are memory-mapped on load.
+    """
+
+    # every get() loads fresh (read-only) objects, nothing is shared between callers
+    shared_results = False
+
+    def __init__(
+        self,
+        directory: str,
+        max_bytes: int = 4 * 1024 ** 3,
+        ttl: [float, int, None] = None,
+        mmap_min_bytes: int = 1024 ** 2,
+    ):
+        self.directory = os.path.abspath(directory)
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.mmap_min_bytes = mmap_min_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, key: tuple) -> str:
+        name, digest = key
+        return os.path.join(self.directory, f"{re.sub(r'[^A-Za-z0-9_.]', '_', name)}-{digest}")
+
+    @contextlib.contextmanager
+    def _lock(self):
+        with open(os.path.join(self.directory, ".lock"), "a") as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _expired(self, path: str) -> bool:
+        if self.ttl is None:
+            return False
+        try:
+            with open(os.path.join(path, "created"), "r") as f:
+                return time.time() - float(f.read()) > self.ttl
+        except (FileNotFoundError, NotADirectoryError):
+            return True
+
+    def _remove(self, path: str) -> None:
+        # rename first: other processes see the entry disappear at once, never half deleted
+        trash = os.path.join(self.directory, f".trash-{uuid.uuid4().hex}")
+        try:
+            os.rename(path, trash)
+        except OSError:
+            return  # already removed by someone else
+        shutil.rmtree(trash, ignore_errors=True)
+
+    def get(self, key: tuple) -> tuple:
+        """Returns (True, value) on a hit, (False, None) on a miss"""
+        path = self._path(key)
+        try:
+            if self._expired(path) and os.path.isdir(path):
+                self._remove(path)
+                raise FileNotFoundError(path)
+            with open(os.path.join(path, "result.pkl"), "rb") as f:
+                tree, n_arrays = pickle.load(f)
+            arrays = []
+            for i in range(n_arrays):
+                file = os.path.join(path, f"{i}.npy")
+                mmap = os.path.getsize(file) >= self.mmap_min_bytes
+                arrays.append(np.load(file, mmap_mode="r" if mmap else None, allow_pickle=False))
+            os.utime(os.path.join(path, "result.pkl"))  # last access, for LRU eviction
+        except (FileNotFoundError, NotADirectoryError):
+            self.misses += 1
+            return False, None
+        self.hits += 1
+        return True, _decode(tree, arrays)
+
+    def put(self, key: tuple, value) -> None:
+        arrays = []
+        tree = _encode(value, arrays)
+        tmp = os.path.join(self.directory, f".tmp-{uuid.uuid4().hex}")
+        os.makedirs(tmp)
+        try:
+            for i, a in enumerate(arrays):
+                np.save(os.path.join(tmp, f"{i}.npy"), np.ascontiguousarray(a), allow_pickle=False)
+            with open(os.path.join(tmp, "result.pkl"), "wb") as f:
+                pickle.dump((tree, len(arrays)), f, protocol=pickle.HIGHEST_PROTOCOL)
+            with open(os.path.join(tmp, "created"), "w") as f:
+                f.write(repr(time.time()))
+            with self._lock():
+                path = self._path(key)
+                if os.path.exists(path):
+                    self._remove(path)
+                os.rename(tmp, path)
+                self._evict()
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+    def _entries(self) -> list:
+        """(last access, size, path) of every entry"""
+        entries = []
+        for entry in os.scandir(self.directory):
+            if not entry.is_dir() or entry.name.startswith("."):
+                continue
+            try:
+                size = sum(f.stat().st_size for f in os.scandir(entry.path))
+                atime = os.stat(os.path.join(entry.path, "result.pkl")).st_mtime
+            except FileNotFoundError:
+                continue
+            entries.append((atime, size, entry.path))
+        return sorted(entries)
+
+    def _evict(self) -> None:
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes and not self._expired(path):
+                continue
+            self._remove(path)
+            self.evictions += 1
+            total -= size
+
+    def invalidate(self, func: [callable, str, None] = None) -> int:
+        """Drops the entries of one function (name or callable), or all; returns the count"""
+        if callable(func):
+            func = _func_name(getattr(func, "__wrapped__", func))
+        prefix = None if func is None else re.sub(r"[^A-Za-z0-9_.]", "_", func) + "-"
+        count = 0
+        with self._lock():
+            for _, _, path in self._entries():
+                if prefix is None or os.path.basename(path).startswith(prefix):
+                    self._remove(path)
+                    count += 1
+        return count
+
+    def clear(self) -> None:
+        """Drops every entry and resets the statistics"""
+        self.invalidate()
+        self.hits = self.misses = self.evictions = 0
+
+    def stats(self) -> dict:
+        """Hit/miss statistics of this process, and current size of the directory"""
+        entries = self._entries()
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": len(entries),
+            "bytes": sum(size for _, size, _ in entries),
+            "max_bytes": self.max_bytes,
+        }
+
+    def __len__(self) -> int:
+        return len(self._entries())
+
+
+def cache_info() -> dict:
+    """Statistics of the shared default cache"""
+    return default_cache.stats()
+
+
+def cache_clear(func: [callable, str, None] = None) -> int:
+    """Invalidates one function's entries (or all entries) in the shared default cache"""
+    return default_cache.invalidate(func)
+
+
+__all__ = [
+    "fingerprint",
+    "ResultCache",
+    "DiskCache",
+    "memoize",
+    "cache_info",
+    "cache_clear",
+]
@@ -1,10 +1,12 @@
 # -*- coding: utf-8 -*-
 import pandas as pd
 import numpy as np
+import numba
 import matplotlib.pyplot as plt
 from mpl_toolkits.mplot3d import Axes3D
 from mpl_toolkits.mplot3d.art3d import Poly3DCollection
 from .Partial_Moments import PM_matrix
+from .Internal_Functions import _pairwise_sum
 
 _tmp = Axes3D, Poly3DCollection  # just o avoid import lint errors
 del _tmp
@@ -44,11 +46,175 @@ def plotCubeAt(pos=(0, 0, 0), size=(1, 1, 1), ax=None, **kwargs):
         ax.plot_surface(X, Y, Z, rstride=1, cstride=1, **kwargs)
 
 
+@numba.jit(nopython=True, nogil=True)
+def _copula_row(row: np.ndarray, target: np.ndarray, degree: int) -> tuple:
+    sl, sl2, su, su2 = 0.0, 0.0, 0.0, 0.0
+    for c in range(row.shape[0]):
+        d = row[c] - target[c]
+        if d < 0:
+            v = 1.0 if degree == 0 else -d
+            sl += v
+            sl2 += v * v
+        elif d > 0:
+            v = 1.0 if degree == 0 else d
+            su += v
+            su2 += v * v
+    return 0.5 * ((sl * sl - sl2) + (su * su - su2)), sl * su
+
+
+@numba.jit(parallel=True, nopython=True, nogil=True)
+def _copula_sums(x: np.ndarray, target: np.ndarray, degree: int) -> tuple:
+    """
+    Upper-triangle sums of the co- (CLPM + CUPM) and divergent (DLPM + DUPM) partial moment
+    matrices, without the matrices: per row, the sum over pairs i < j of L_i L_j is
+    ((sum L) ** 2 - sum L ** 2) / 2, and the divergent pairs sum to (sum L) (sum U).
+    Unscaled (no 1 / N, no population adjustment): only their ratio is used.
+    """
+    co = np.zeros(x.shape[0])
+    div = np.zeros(x.shape[0])
+    for r in numba.prange(x.shape[0]):
+        co[r], div[r] = _copula_row(x[r], target, degree)
+    return co.sum(), div.sum()
+
+
+def _copula_ratio(Co_pm: float, D_pm: float) -> [float, None]:
+    if np.any(np.isnan(Co_pm)) or Co_pm is None:
+        Co_pm = 0
+    if np.any(np.isnan(D_pm)) or D_pm is None:
+        D_pm = 0
+    if Co_pm == D_pm:
+        return 0
+    elif Co_pm == 0 or D_pm == 0:
+        return 1
+    elif Co_pm < D_pm:
+        return 1 - Co_pm / D_pm
+    elif Co_pm > D_pm:
+        return 1 - D_pm / Co_pm
+    return None
+
+
+def _copula_ratios(Co_pm: np.ndarray, D_pm: np.ndarray) -> np.ndarray:
+    """\\code{_copula_ratio} of each pair of sums"""
+    Co_pm = np.nan_to_num(Co_pm, nan=0.0)
+    D_pm = np.nan_to_num(D_pm, nan=0.0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ret = 1 - np.minimum(Co_pm, D_pm) / np.maximum(Co_pm, D_pm)
+    ret[(Co_pm == 0) | (D_pm == 0)] = 1
+    ret[Co_pm == D_pm] = 0
+    return ret
+
+
+def _copula_targets(values: np.ndarray) -> np.ndarray:
+    """Column means as \\link{PM_matrix} takes them (values equal to the mean are in no quadrant)"""
+    return np.array([np.mean(values[:, i]) for i in range(values.shape[1])])
+
+
+def _copula_factors(values: np.ndarray, degree: int) -> tuple:
+    """Clipped deviations from the column means, lower and upper (indicators for degree 0)"""
+    d = values - _copula_targets(values)
+    if degree == 0:
+        return (d < 0).astype(float), (d > 0).astype(float)
+    return np.maximum(-d, 0.0), np.maximum(d, 0.0)
+
+
+@numba.jit(parallel=True, nopython=True, nogil=True)
+def _copula_batch_sums(
+    lower: np.ndarray, upper: np.ndarray, members: np.ndarray, offsets: np.ndarray
+) -> tuple:
+    """
+    Co- and divergent sums of \\code{_copula_sums} for each subset of columns
+    \\code{members[offsets[s]:offsets[s + 1]]}, subsets in parallel.
+    """
+    m = offsets.shape[0] - 1
+    co = np.zeros(m)
+    div = np.zeros(m)
+    for s in numba.prange(m):
+        cols = members[offsets[s] : offsets[s + 1]]
+        co_s, div_s = 0.0, 0.0
+        for r in range(lower.shape[0]):
+            sl, sl2, su, su2 = 0.0, 0.0, 0.0, 0.0
+            for c in cols:
+                sl += lower[r, c]
+                sl2 += lower[r, c] * lower[r, c]
+                su += upper[r, c]
+                su2 += upper[r, c] * upper[r, c]
+            co_s += 0.5 * ((sl * sl - sl2) + (su * su - su2))
+            div_s += sl * su
+        co[s] = co_s
+        div[s] = div_s
+    return co, div
+
+
+@numba.jit(nopython=True, nogil=True)
+def _copula_window(
+    x: np.ndarray, columns: np.ndarray, start: int, window: int, degree: int
+) -> tuple:
+    """
+    \\code{_copula_sums} of the rows \\code{start} to \\code{start + window - 1}; targets are the
+    window means, summed as \\code{np.mean} does (\\code{columns}: x transposed, contiguous).
+    """
+    target = np.empty(columns.shape[0])
+    for c in range(columns.shape[0]):
+        target[c] = _pairwise_sum(columns[c], start, window) / window
+    co, div = 0.0, 0.0
+    for r in range(start, start + window):
+        co_r, div_r = _copula_row(x[r], target, degree)
+        co += co_r
+        div += div_r
+    return co, div
+
+
+@numba.jit(parallel=True, nopython=True, nogil=True)
+def _copula_rolling_sums(x: np.ndarray, window: int, step: int, degree: int) -> tuple:
+    """\\code{_copula_window} of every window, in parallel"""
+    m = (x.shape[0] - window) // step + 1
+    columns = np.ascontiguousarray(x.T)
+    co = np.zeros(m)
+    div = np.zeros(m)
+    for k in numba.prange(m):
+        co[k], div[k] = _copula_window(x, columns, k * step, window, degree)
+    return co, div
+
+
+@numba.jit(nopython=True, nogil=True)
+def _copula_resample(x: np.ndarray, seed: int, degree: int) -> tuple:
+    """
+    \\code{_copula_sums} of the rows drawn with replacement from the stream \\code{seed}; rows are
+    read through the index array, the data is not copied.
+    """
+    np.random.seed(seed)
+    index = np.random.randint(0, x.shape[0], x.shape[0])
+    target = np.zeros(x.shape[1])
+    for i in index:
+        target += x[i]
+    target /= x.shape[0]
+    co, div = 0.0, 0.0
+    for i in index:
+        co_r, div_r = _copula_row(x[i], target, degree)
+        co += co_r
+        div += div_r
+    return co, div
+
+
+@numba.jit(parallel=True, nopython=True, nogil=True)
+def _copula_boot_sums(x: np.ndarray, reps: int, seed: int, degree: int) -> tuple:
+    """
+    \\code{_copula_resample} of \\code{reps} replicates in parallel; replicate b draws from the
+    stream \\code{seed + b}, so results do not depend on the number of threads.
+    """
+    co = np.zeros(reps)
+    div = np.zeros(reps)
+    for b in numba.prange(reps):
+        co[b], div[b] = _copula_resample(x, seed + b, degree)
+    return co, div
+
+
 def NNS_copula(
     x: [pd.DataFrame, pd.Series, np.ndarray],
     continuous: bool = True,
     plot: bool = True,
     independence_overlay: bool = False,
+    pm_matrix: bool = False,
 ) -> [float, None]:
     r"""NNS Co-Partial Moments Higher Dimension Dependence
 
@@ -58,6 +224,9 @@ def NNS_copula(
     @param continuous logical; \code{TRUE} (default) Generates a continuous measure using degree 1 \link{PM.matrix}, while discrete \code{FALSE} uses degree 0 \link{PM.matrix}.
     @param plot logical; \code{FALSE} (default) Generates a 3d scatter plot with regression points using \link{plot3d}.
     @param independence_overlay logical; \code{FALSE} (default) Creates and overlays independent \link{Co.LPM} and \link{Co.UPM} regions to visually reference the difference in dependence from the data.frame of variables being analyzed.  Under independence, the light green and red shaded areas would be occupied by green and red data points respectively.
+    @param pm_matrix logical; \code{False} (default) sums the co-partial moments over the pairs of
+        variables row by row in O(N k), without the k x k matrices; \code{True} builds the full
+        \link{PM_matrix} (verification).
 
     @return Returns a multivariate dependence value [0,1].
 
@@ -94,13 +263,17 @@ def NNS_copula(
     # if(continuous) degree <- 1 else degree <- 0
     degree = 1 if continuous else 0
 
-    # Generate partial moment matrices
-    # pm_cov <- PM.matrix(degree, degree, variable = x, pop.adj = TRUE)
-    pm_cov = PM_matrix(degree, degree, variable=x, pop_adj=True)
+    if pm_matrix:
+        # Generate partial moment matrices
+        # pm_cov <- PM.matrix(degree, degree, variable = x, pop.adj = TRUE)
+        pm_cov = PM_matrix(degree, degree, variable=x, pop_adj=True)
 
-    # Isolate the upper triangles from each of the partial moment matrices
-    Co_pm = np.sum(np.triu(pm_cov["cupm"], 1)) + np.sum(np.triu(pm_cov["clpm"], 1))
-    D_pm = np.sum(np.triu(pm_cov["dupm"], 1)) + np.sum(np.triu(pm_cov["dlpm"], 1))
+        # Isolate the upper triangles from each of the partial moment matrices
+        Co_pm = np.sum(np.triu(pm_cov["cupm"], 1)) + np.sum(np.triu(pm_cov["clpm"], 1))
+        D_pm = np.sum(np.triu(pm_cov["dupm"], 1)) + np.sum(np.triu(pm_cov["dlpm"], 1))
+    else:
+        values = np.ascontiguousarray(x.values if isinstance(x, pd.DataFrame) else x, dtype=float)
+        Co_pm, D_pm = _copula_sums(values, _copula_targets(values), degree)
     if plot and n == 3:
         fig = plt.figure(figsize=(4, 4))
         ax = fig.add_subplot(111, projection="3d")
@@ -152,19 +325,147 @@ def NNS_copula(
             for p, s, c in zip(positions, sizes, colors):
                 plotCubeAt(pos=p, size=s, ax=ax, color=c, alpha=0.25)
 
-    if np.any(np.isnan(Co_pm)) or Co_pm is None:
-        Co_pm = 0
-    if np.any(np.isnan(D_pm)) or D_pm is None:
-        D_pm = 0
-    if Co_pm == D_pm:
-        return 0
-    elif Co_pm == 0 or D_pm == 0:
-        return 1
-    elif Co_pm < D_pm:
-        return 1 - Co_pm / D_pm
-    elif Co_pm > D_pm:
-        return 1 - D_pm / Co_pm
-    return None
+    return _copula_ratio(Co_pm, D_pm)
+
+
+def NNS_copula_batch(
+    x: [pd.DataFrame, np.ndarray],
+    subsets: list,
+    continuous: bool = True,
+) -> np.ndarray:
+    r"""NNS Copula Batch
+
+    \link{NNS_copula} of many subsets of the columns of \code{x} (e.g. baskets drawn from one
+    universe).  Targets and clipped deviations are computed once per column of \code{x}, then every
+    subset is evaluated from them, in parallel.
+
+    @param x a numeric matrix or data frame.
+    @param subsets list of subsets, each a list of column positions (or column names of a data
+        frame); subsets may have different sizes.
+    @param continuous logical; \code{TRUE} (default) Generates a continuous measure using degree 1
+        \link{PM.matrix}, while discrete \code{FALSE} uses degree 0 \link{PM.matrix}.
+    @return Returns a vector of multivariate dependence values [0,1], one per subset, equal to
+        \code{NNS_copula(x[subset], continuous, plot=False)}.
+    @examples
+    baskets = [list(np.random.choice(500, 4, replace=False)) for _ in range(10000)]
+    NNS_copula_batch(returns, baskets)
+    """
+    if np.any(np.isnan(x)):
+        raise Exception("You have some missing values, please address.")
+    if isinstance(x, pd.DataFrame):
+        positions = {c: i for i, c in enumerate(x.columns)}
+        subsets = [[positions[c] if c in positions else c for c in s] for s in subsets]
+    values = np.ascontiguousarray(x.values if isinstance(x, pd.DataFrame) else x, dtype=float)
+    if len(values.shape) == 1:
+        values = values.reshape(-1, 1)
+    members = np.array([c for s in subsets for c in s], dtype=np.int64)
+    if members.shape[0] > 0 and (members.min() < 0 or members.max() >= values.shape[1]):
+        raise Exception(f"subsets should hold columns of x (0 to {values.shape[1] - 1})")
+    offsets = np.zeros(len(subsets) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(s) for s in subsets])
+
+    lower, upper = _copula_factors(values, 1 if continuous else 0)
+    Co_pm, D_pm = _copula_batch_sums(lower, upper, members, offsets)
+    return _copula_ratios(Co_pm, D_pm)
+
+
+def NNS_copula_rolling(
+    x: [pd.DataFrame, np.ndarray],
+    window: int,
+    continuous: bool = True,
+    step: int = 1,
+) -> pd.Series:
+    r"""NNS Copula Rolling
+
+    \link{NNS_copula} on every rolling window of \code{window} observations, windows evaluated in
+    parallel in compiled code (no \link{PM_matrix}).
+
+    @param x a numeric matrix or data frame.
+    @param window integer; number of observations per window.
+    @param continuous logical; \code{TRUE} (default) Generates a continuous measure using degree 1
+        \link{PM.matrix}, while discrete \code{FALSE} uses degree 0 \link{PM.matrix}.
+    @param step integer; windows end every \code{step} observations (1, default: every one).
+    @return Returns a series of multivariate dependence values [0,1], indexed by the last
+        observation of each window.
+    @examples
+    NNS_copula_rolling(returns[["A", "B", "C"]], 252)
+    """
+    if np.any(np.isnan(x)):
+        raise Exception("You have some missing values, please address.")
+    values = np.ascontiguousarray(x.values if isinstance(x, pd.DataFrame) else x, dtype=float)
+    if len(values.shape) == 1:
+        values = values.reshape(-1, 1)
+    if window < 1 or window > values.shape[0]:
+        raise Exception(f"window needs to be between 1 and {values.shape[0]}")
+    if step < 1:
+        raise Exception("step needs to be a positive integer")
+    if isinstance(x, pd.DataFrame):
+        index = x.index[window - 1 :: step]
+    else:
+        index = np.arange(window - 1, values.shape[0], step)
+
+    Co_pm, D_pm = _copula_rolling_sums(values, window, step, 1 if continuous else 0)
+    return pd.Series(_copula_ratios(Co_pm, D_pm), index=index)
+
+
+def NNS_copula_boot(
+    x: [pd.DataFrame, np.ndarray],
+    reps: int = 1000,
+    continuous: bool = True,
+    confidence: float = 0.95,
+    seed: [int, None] = None,
+) -> dict:
+    r"""NNS Copula Bootstrap
+
+    Bootstrap distribution of \link{NNS_copula}: \code{reps} resamples of the rows with
+    replacement, drawn and evaluated in parallel in compiled code on index arrays (the data is not
+    copied).  Replicate b uses the random stream \code{seed + b}: results are reproducible for a
+    given \code{seed}, whatever the number of threads.
+
+    @param x a numeric matrix or data frame.
+    @param reps integer; number of bootstrap replicates (1000, default).
+    @param continuous logical; \code{TRUE} (default) Generates a continuous measure using degree 1
+        \link{PM.matrix}, while discrete \code{FALSE} uses degree 0 \link{PM.matrix}.
+    @param confidence numeric [0, 1]; level of the percentile confidence interval (0.95, default).
+    @param seed integer; seed of the replicates (\code{None}, default: drawn from
+        \code{np.random}).
+    @return Returns a dict:
+        \code{"estimate"}: \link{NNS_copula} of \code{x},
+        \code{"replicates"}: the \code{reps} bootstrap values,
+        \code{"lower.CI"}, \code{"upper.CI"}: percentile confidence interval.
+    @examples
+    ret = NNS_copula_boot(returns[["A", "B", "C"]], reps=10000, seed=123)
+    ret["lower.CI"], ret["upper.CI"]
+    """
+    if np.any(np.isnan(x)):
+        raise Exception("You have some missing values, please address.")
+    if reps < 1:
+        raise Exception("reps needs to be a positive integer")
+    if not 0 <= confidence <= 1:
+        raise Exception("confidence needs to be between 0 and 1")
+    values = np.ascontiguousarray(x.values if isinstance(x, pd.DataFrame) else x, dtype=float)
+    if len(values.shape) == 1:
+        values = values.reshape(-1, 1)
+    if seed is None:
+        seed = np.random.randint(0, 2 ** 31 - reps)
+    degree = 1 if continuous else 0
+
+    Co_pm, D_pm = _copula_boot_sums(values, reps, seed, degree)
+    replicates = _copula_ratios(Co_pm, D_pm)
+    lower, upper = np.quantile(replicates, [(1 - confidence) / 2, (1 + confidence) / 2])
+    return {
+        "estimate": _copula_ratio(*_copula_sums(values, _copula_targets(values), degree)),
+        "replicates": replicates,
+        "lower.CI": lower,
+        "upper.CI": upper,
+    }
 
 
-__all__ = ["cuboid_data", "plotCubeAt", "NNS_copula"]
+__all__ = [
+    "cuboid_data",
+    "plotCubeAt",
+    "NNS_copula",
+    "NNS_copula_batch",
+    "NNS_copula_rolling",
+    "NNS_copula_boot",
+]
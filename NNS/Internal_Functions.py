@@ -1,24 +1,77 @@
 # -*- coding: utf-8 -*-
+import sys
+
 import pandas as pd
 import numpy as np
 import scipy
+import scipy.optimize
+import scipy.signal
 import scipy.stats
-import KDEpy
+import functools
+import numba
+
+try:
+    import KDEpy
+except ImportError:  # optional: mode(engine="kdepy") only
+    KDEpy = None
+
+from .Sort_Cache import sorted_values
+
+
+def _plot_enabled(use_plot: [bool, None]) -> bool:
+    """
+    Resolves a \\code{plot} / \\code{use_plot} argument: \\code{None} plots only when pyplot is
+    already in use on an interactive (or notebook inline) backend, never in headless batch jobs
+    """
+    if use_plot is not None:
+        return bool(use_plot)
+    if "matplotlib.pyplot" not in sys.modules:
+        return False
+    import matplotlib
+
+    backend = matplotlib.get_backend().lower()
+    non_interactive = [b.lower() for b in matplotlib.rcsetup.non_interactive_bk]
+    return "inline" in backend or backend not in non_interactive
+
+
+_SPREAD_FIELDS = ["sd", "IQR", "min", "lower.hinge", "median", "upper.hinge", "max"]
+# above this size numpy's vectorized sort (shared through the sort cache) beats the selection
+_SELECT_MAX = 1 << 15
+
+
+def spread_summary(v: [pd.Series, np.ndarray, list]) -> np.ndarray:
+    """Standard deviation, IQR and Tukey Five-Number Summary
+
+    Returns sd, IQR (as \\code{np.percentile}), minimum, lower-hinge, median, upper-hinge and
+    maximum of the input data (NaN dropped) from one partition, without a full sort."""
+    x = np.asarray(v.values if isinstance(v, pd.Series) else v, dtype=float).ravel()
+    if x.shape[0] > _SELECT_MAX:
+        x = sorted_values(x)
+        if np.isnan(x[-1]):
+            x = x[: np.searchsorted(np.isnan(x), True)]  # NaN sort last
+        is_sorted = True
+    else:
+        nan = np.isnan(x)
+        x = np.ascontiguousarray(x[~nan] if nan.any() else x)
+        is_sorted = False
+    if x.shape[0] == 0:
+        return np.full(7, np.nan)
+    return _spread(x, is_sorted)
+
+
+def spread_summary_columns(x: [pd.DataFrame, np.ndarray]) -> [pd.DataFrame, np.ndarray]:
+    """\\code{spread_summary} of every column (NaN dropped), in parallel: one row per column"""
+    ret = _spread_columns(np.asarray(x, dtype=float))
+    if isinstance(x, pd.DataFrame):
+        return pd.DataFrame(ret, index=x.columns, columns=_SPREAD_FIELDS)
+    return ret
 
 
 def fivenum(v: [pd.Series, np.ndarray]) -> list:
     """Tukey Five-Number Summaries
 
     Returns Tukey's five number summary (minimum, lower-hinge, median, upper-hinge, maximum) for the input data."""
-    x = v[~np.isnan(v)]
-    x = np.sort(x)
-    n = x.shape[0]
-    if n == 0:
-        return [np.nan, np.nan, np.nan, np.nan, np.nan]
-
-    n4 = np.floor((n + 3) / 2) / 2
-    d = np.array([1, n4, (n + 1) / 2, n + 1 - n4, n])
-    return list(0.5 * (x[np.floor(d).astype(int) - 1] + x[np.ceil(d).astype(int) - 1]))
+    return list(spread_summary(v)[2:])
 
 
 def bw_nrd0(x: [scipy.stats.kde.gaussian_kde, np.ndarray, pd.Series]):
@@ -32,23 +85,24 @@ def bw_nrd0(x: [scipy.stats.kde.gaussian_kde, np.ndarray, pd.Series]):
         tmpx = x.dataset if len(x.dataset.shape) == 1 else x.dataset[0, :]
     if len(tmpx) < 2:
         raise (Exception("need at least 2 data points"))
-    hi = np.std(tmpx, ddof=1)
-    q75, q25 = np.percentile(tmpx, [75, 25])
-    iqr = q75 - q25
-    lo = min(hi, iqr / 1.34)
-    if not (lo != 0):
-        if hi != 0:
-            lo = hi
-        elif abs(x[0]) != 0:
-            lo = abs(x[0])
-        else:
-            lo = 1
-    bw = 0.9 * lo * len(tmpx) ** -0.2
-    return bw
+    tmpx = np.asarray(tmpx, dtype=float)
+    if np.isnan(tmpx).any():
+        return np.nan
+    # sd and IQR from one partition (sort for large samples)
+    s = spread_summary(tmpx)
+    return _nrd0(s[0], s[1], len(tmpx), tmpx[0])
 
 
-def mode(x: [pd.Series, np.ndarray]) -> float:
-    """Continuous Mode of a distribution"""
+def mode(x: [pd.Series, np.ndarray], grid_size: int = 1024, engine: str = "numba") -> float:
+    """Continuous Mode of a distribution
+
+    Argmax of a Gaussian KDE with the bandwidth \\code{bw_nrd0} on \\code{grid_size} grid points.
+    \\code{engine}: "numba" (default) compiled linear binning and convolution on the grid of
+    KDEpy, same value as "kdepy" (\\code{KDEpy.FFTKDE}, optional dependency) to rounding, ties
+    of symmetric data resolved to the same grid point (its convolution is redone on a tie);
+    "fft": linear binning and the FFT of a Gaussian kernel cached per grid size and bandwidth
+    bucket (1 / 64 octave of bandwidth over grid step), within a fraction of a grid step.
+    """
 
     #    d = tryCatch(
     #        density(
@@ -66,25 +120,19 @@ def mode(x: [pd.Series, np.ndarray]) -> float:
     #        error = function(e) d
     #    )
 
-    if x.shape[0] == 2:
-        return np.median(x)
-
-    if (
-        True
-    ):  # TODO Check if KDEpy exists, if not use the old scipy.stats.gaussian_kde (with bad outputs btw)
-        if isinstance(x, pd.Series):
-            a, b = KDEpy.FFTKDE(kernel="gaussian", bw=bw_nrd0(x.values)).fit(x.values).evaluate()
-        else:
-            a, b = KDEpy.FFTKDE(kernel="gaussian", bw=bw_nrd0(x)).fit(x).evaluate()
-        mode_value = a[np.argmax(b)]
-    elif (
-        False
-    ):  # TODO Check if KDEpy exists, if not use the old scipy.stats.gaussian_kde (with bad outputs btw)
-        # https://rmflight.github.io/post/finding-modes-using-kernel-density-estimates/
-        kernel = scipy.stats.gaussian_kde(x, bw_method=bw_nrd0)
-        height = kernel.pdf(x)
-        mode_value = x[np.argmax(height)]
-    return mode_value
+    values = np.ascontiguousarray(x, dtype=float).ravel()
+    if values.shape[0] == 2:
+        return np.median(values)
+    if engine == "numba":
+        return _kde_mode(values, grid_size)
+    if engine == "fft":
+        return _fft_mode(values, grid_size)
+    if engine != "kdepy":
+        raise Exception("engine needs to be 'numba', 'fft' or 'kdepy'")
+    if KDEpy is None:
+        raise Exception("KDEpy is needed for mode(engine='kdepy')")
+    a, b = KDEpy.FFTKDE(kernel="gaussian", bw=bw_nrd0(values)).fit(values).evaluate(grid_size)
+    return a[np.argmax(b)]
 
 
 def mode_class(x: [np.ndarray, pd.Series]) -> float:
@@ -106,6 +154,496 @@ def gravity_class(x: [pd.Series, np.ndarray]) -> float:
     return (np.mean(x) + np.mean(fivenum(x)[1:4])) / 2.0
 
 
+@numba.jit(nopython=True, nogil=True)
+def _group_segments(values: np.ndarray, group: np.ndarray, k: int) -> tuple:
+    """Values grouped by \\code{group} (counting sort, original order within a group), offsets"""
+    offsets = np.zeros(k + 1, dtype=np.int64)
+    for g in group:
+        offsets[g + 1] += 1
+    offsets = np.cumsum(offsets)
+    pos = offsets[:-1].copy()
+    ret = np.empty(values.shape[0])
+    for i in range(values.shape[0]):
+        ret[pos[group[i]]] = values[i]
+        pos[group[i]] += 1
+    return ret, offsets
+
+
+@numba.jit(nopython=True, nogil=True)
+def _partition(a: np.ndarray, kth: np.ndarray) -> None:
+    """
+    In place, as \\code{np.partition}: \\code{a[k]} is the k-th smallest value for every k of the
+    sorted positions \\code{kth}, smaller values on its left.  Multiple quickselect (median of
+    three): a range is partitioned once and only the sides holding positions are followed; short
+    ranges, and ranges deeper than 2 log2(n) + 8 partitions, are sorted.
+    """
+    n = a.shape[0]
+    max_depth = 2 * np.int64(np.log2(n + 1)) + 8
+    # ranges to select in: bounds of a, bounds of kth, depth
+    stack = np.empty((max_depth + 2, 5), dtype=np.int64)
+    stack[0] = (0, n - 1, 0, kth.shape[0], 0)
+    top = 1
+    while top > 0:
+        top -= 1
+        lo, hi, ka, kb, depth = stack[top]
+        if ka >= kb or lo >= hi:
+            continue
+        if hi - lo < 16 or depth > max_depth:
+            a[lo : hi + 1] = np.sort(a[lo : hi + 1])
+            continue
+        mid = (lo + hi) // 2
+        if a[mid] < a[lo]:
+            a[mid], a[lo] = a[lo], a[mid]
+        if a[hi] < a[lo]:
+            a[hi], a[lo] = a[lo], a[hi]
+        if a[hi] < a[mid]:
+            a[hi], a[mid] = a[mid], a[hi]
+        pivot = a[mid]
+        i, j = lo, hi
+        while i <= j:
+            while a[i] < pivot:
+                i += 1
+            while a[j] > pivot:
+                j -= 1
+            if i <= j:
+                a[i], a[j] = a[j], a[i]
+                i += 1
+                j -= 1
+        # a[lo:j + 1] <= pivot <= a[i:hi + 1], pivot in between
+        kl = ka + np.searchsorted(kth[ka:kb], j, side="right")
+        kr = ka + np.searchsorted(kth[ka:kb], i, side="left")
+        # larger side first, so that the stack holds at most one range per depth
+        if j - lo > hi - i:
+            stack[top] = (lo, j, ka, kl, depth + 1)
+            stack[top + 1] = (i, hi, kr, kb, depth + 1)
+        else:
+            stack[top] = (i, hi, kr, kb, depth + 1)
+            stack[top + 1] = (lo, j, ka, kl, depth + 1)
+        top += 2
+
+
+@numba.jit(nopython=True, nogil=True)
+def _select(x: np.ndarray, positions: np.ndarray) -> np.ndarray:
+    """Order statistics of \\code{x} at \\code{positions} (0-based, fractional: midpoint of the
+    floor and ceiling ones, as fivenum), from one partition of a copy instead of a sort"""
+    lo = np.floor(positions).astype(np.int64)
+    hi = np.ceil(positions).astype(np.int64)
+    a = x.copy()
+    _partition(a, np.unique(np.concatenate((lo, hi))))
+    return 0.5 * (a[lo] + a[hi])
+
+
+@numba.jit(nopython=True, nogil=True)
+def _fivenum_positions(n: int) -> np.ndarray:
+    n4 = np.floor((n + 3) / 2) / 2
+    return np.array([1.0, n4, (n + 1) / 2, n + 1 - n4, n]) - 1.0
+
+
+@numba.jit(nopython=True, nogil=True)
+def _lerp(a: float, b: float, t: float) -> float:
+    """Linear interpolation as \\code{np.percentile}"""
+    return b - (b - a) * (1 - t) if t >= 0.5 else a + (b - a) * t
+
+
+@numba.jit(nopython=True, nogil=True)
+def _pairwise_sum(a: np.ndarray, lo: int, n: int) -> float:
+    """Sum of \\code{a[lo:lo + n]} in the order of numpy's pairwise summation: same rounding as
+    \\code{np.mean}, so that means in compiled code compare (and tie) as numpy's do"""
+    if n < 8:
+        ret = 0.0
+        for i in range(lo, lo + n):
+            ret += a[i]
+        return ret
+    if n <= 128:
+        r = a[lo : lo + 8].copy()
+        i = 8
+        while i < n - n % 8:
+            for j in range(8):
+                r[j] += a[lo + i + j]
+            i += 8
+        ret = ((r[0] + r[1]) + (r[2] + r[3])) + ((r[4] + r[5]) + (r[6] + r[7]))
+        for k in range(i, n):
+            ret += a[lo + k]
+        return ret
+    n2 = n // 2
+    n2 -= n2 % 8
+    return _pairwise_sum(a, lo, n2) + _pairwise_sum(a, lo + n2, n - n2)
+
+
+@numba.jit(nopython=True, nogil=True)
+def _spread(x: np.ndarray, is_sorted: bool = False) -> np.ndarray:
+    """
+    Fused kernel of \\code{spread_summary}: sd, IQR (\\code{np.percentile}) and the Tukey summary
+    of \\code{x} (no NaN, 1 value or more), from one partition of a copy (none if sorted)
+    """
+    n = x.shape[0]
+    ret = np.empty(7)
+    mean = 0.0
+    for v in x:
+        mean += v
+    mean /= n
+    ss = 0.0
+    for v in x:
+        ss += (v - mean) ** 2
+    ret[0] = np.sqrt(ss / (n - 1)) if n > 1 else np.nan
+
+    positions = _fivenum_positions(n)
+    lo = np.floor(positions).astype(np.int64)
+    hi = np.ceil(positions).astype(np.int64)
+    h25, h75 = 0.25 * (n - 1), 0.75 * (n - 1)
+    i25, i75 = np.int64(h25), np.int64(h75)
+    quartiles = np.array([i25, min(i25 + 1, n - 1), i75, min(i75 + 1, n - 1)])
+    if is_sorted:
+        a = x
+    else:
+        a = x.copy()
+        _partition(a, np.unique(np.concatenate((lo, hi, quartiles))))
+    ret[2:] = 0.5 * (a[lo] + a[hi])
+    ret[1] = _lerp(a[i75], a[quartiles[3]], h75 - i75) - _lerp(a[i25], a[quartiles[1]], h25 - i25)
+    return ret
+
+
+@numba.jit(nopython=True, nogil=True)
+def _nrd0(sd: float, iqr: float, n: int, first: float) -> float:
+    """\\code{bw_nrd0} from the sd and IQR of \\code{n} values, the first one \\code{first}"""
+    lo = min(sd, iqr / 1.34)
+    if not (lo != 0):
+        if sd != 0:
+            lo = sd
+        elif abs(first) != 0:
+            lo = abs(first)
+        else:
+            lo = 1.0
+    return 0.9 * lo * n**-0.2
+
+
+@numba.jit(nopython=True, nogil=True)
+def _bw_nrd0_select(x: np.ndarray) -> float:
+    """\\code{bw_nrd0} of \\code{x} (2 values or more), from the fused kernel"""
+    s = _spread(x)
+    return _nrd0(s[0], s[1], x.shape[0], x[0])
+
+
+@numba.jit(parallel=True, nopython=True, nogil=True)
+def _spread_columns(x: np.ndarray) -> np.ndarray:
+    """\\code{_spread} of every column of \\code{x}, NaN dropped, in parallel"""
+    ret = np.full((x.shape[1], 7), np.nan)
+    for c in numba.prange(x.shape[1]):
+        column = x[:, c]
+        column = column[~np.isnan(column)]
+        if column.shape[0] > 0:
+            ret[c] = _spread(column)
+    return ret
+
+
+# KDEpy: kernel support where the Gaussian density falls to 1e-4 (brentq, xtol 1e-3)
+_KDE_ATOL = 10e-5
+_KDE_XTOL = 1e-3
+_KDE_RTOL = 4 * np.finfo(float).eps
+_KDE_NORM = np.sqrt(np.pi / 2)  # KDEpy gauss_integral(0)
+_KDE_VOLUME = 2.0  # KDEpy volume_unit_ball(1)
+
+
+@numba.jit(nopython=True, nogil=True)
+def _gaussian_excess(x: float, bw: float) -> float:
+    return np.exp(-((x / bw) ** 2) / 2) / _KDE_NORM / (bw * _KDE_VOLUME) - _KDE_ATOL
+
+
+@numba.jit(nopython=True, nogil=True)
+def _gaussian_support(bw: float) -> float:
+    """
+    Practical support of the Gaussian kernel of bandwidth \\code{bw}: the steps of scipy's
+    brentq on [0, 8 bw], as \\code{KDEpy.Kernel.practical_support}, for the same grid
+    """
+    x_pre, x_cur = 0.0, 8 * bw
+    f_pre, f_cur = _gaussian_excess(x_pre, bw), _gaussian_excess(x_cur, bw)
+    if f_pre == 0:
+        return x_pre + _KDE_XTOL
+    if f_cur == 0:
+        return x_cur + _KDE_XTOL
+    if (f_pre < 0) == (f_cur < 0):
+        # density below the tolerance everywhere (KDEpy fails): support of a unit bandwidth
+        return bw * _gaussian_support(1.0)
+    x_blk, f_blk, s_pre, s_cur = 0.0, 0.0, 0.0, 0.0
+    for _ in range(100):
+        if f_pre != 0 and f_cur != 0 and (f_pre < 0) != (f_cur < 0):
+            x_blk, f_blk = x_pre, f_pre
+            s_pre = s_cur = x_cur - x_pre
+        if abs(f_blk) < abs(f_cur):
+            x_pre, x_cur, x_blk = x_cur, x_blk, x_cur
+            f_pre, f_cur, f_blk = f_cur, f_blk, f_cur
+        delta = (_KDE_XTOL + _KDE_RTOL * abs(x_cur)) / 2
+        s_bis = (x_blk - x_cur) / 2
+        if f_cur == 0 or abs(s_bis) < delta:
+            break
+        if abs(s_pre) > delta and abs(f_cur) < abs(f_pre):
+            if x_pre == x_blk:  # interpolate
+                s_try = -f_cur * (x_cur - x_pre) / (f_cur - f_pre)
+            else:  # extrapolate
+                d_pre = (f_pre - f_cur) / (x_pre - x_cur)
+                d_blk = (f_blk - f_cur) / (x_blk - x_cur)
+                s_try = -f_cur * (f_blk * d_blk - f_pre * d_pre) / (d_blk * d_pre * (f_blk - f_pre))
+            if 2 * abs(s_try) < min(abs(s_pre), 3 * abs(s_bis) - delta):
+                s_pre, s_cur = s_cur, s_try
+            else:
+                s_pre = s_cur = s_bis
+        else:
+            s_pre = s_cur = s_bis
+        x_pre, f_pre = x_cur, f_cur
+        x_cur += s_cur if abs(s_cur) > delta else (delta if s_bis > 0 else -delta)
+        f_cur = _gaussian_excess(x_cur, bw)
+    return x_cur + _KDE_XTOL
+
+
+@numba.jit(nopython=True, nogil=True)
+def _linear_binning(x: np.ndarray, g_min: float, dx: float, grid_size: int) -> np.ndarray:
+    """Linear binning of \\code{x} on the grid g_min + i dx, in the arithmetic of KDEpy's
+    \\code{linbin_cython}"""
+    binned = np.zeros(grid_size + 1)
+    for v in x:
+        t = (v - g_min) / dx
+        i = np.int64(np.floor(t))
+        fractional = t - i
+        binned[i] += 1 - fractional
+        binned[i + 1] += fractional
+    return binned[:grid_size] / x.shape[0]
+
+
+# grid points with a density this close to the maximum are ties, broken by KDEpy's rounding
+_MODE_TIE_RTOL = 1e-9
+
+
+@numba.jit(nopython=True, nogil=True, error_model="numpy")
+def _binned_mode(x: np.ndarray, grid_size: int) -> tuple:
+    """
+    Mode of a Gaussian KDE of \\code{x} with the bandwidth \\code{bw_nrd0}, on the grid of
+    \\code{KDEpy.FFTKDE}: data linearly binned, kernel scattered from the non-empty bins only.
+    Also returns whether another grid point ties with the mode (\\code{_convolved_mode})
+    """
+    n = x.shape[0]
+    if n == 1:
+        return x[0], False
+    if n == 2:
+        return 0.5 * (x[0] + x[1]), False
+    bw = _bw_nrd0_select(x)
+    support = _gaussian_support(bw)
+    x_min, x_max = np.min(x), np.max(x)
+    outside = max(0.05 * (x_max - x_min), support)
+    g_min = x_min - outside
+    dx = (x_max + outside - g_min) / (grid_size - 1)
+    binned = _linear_binning(x, g_min, dx, grid_size)
+
+    m = min(np.int64(np.floor(support / dx)), grid_size)
+    kernel = np.exp(-0.5 * (np.arange(-m, m + 1) * dx / bw) ** 2) / (bw * np.sqrt(2 * np.pi))
+    density = np.zeros(grid_size)
+    for i in range(grid_size):
+        if binned[i] != 0:
+            for j in range(max(i - m, 0), min(i + m + 1, grid_size)):
+                density[j] += binned[i] * kernel[j - i + m]
+    top = np.argmax(density)
+    ties = np.sum(density >= density[top] * (1 - _MODE_TIE_RTOL))
+    return g_min + top * dx, ties > 1
+
+
+def _convolved_mode(x: np.ndarray, grid_size: int) -> float:
+    """
+    Mode of \\code{KDEpy.FFTKDE} computed as it does (kernel weights on a linspace grid, convolved
+    with \\code{scipy.signal.convolve}), so that ties of \\code{_binned_mode} (symmetric data)
+    resolve to the same grid point
+    """
+    bw = _bw_nrd0_select(x)
+
+    def excess(t: float) -> float:
+        # KDEpy.Kernel.evaluate in numpy: its exp can differ from the compiled one in the last bit
+        distances = np.abs(np.array([t]))
+        density = np.exp(-((distances / bw) ** 2) / 2) / _KDE_NORM / (bw * _KDE_VOLUME)
+        return density[0] - _KDE_ATOL
+
+    try:
+        support = scipy.optimize.brentq(excess, 0, 8 * bw, xtol=_KDE_XTOL) + _KDE_XTOL
+    except ValueError:
+        support = _gaussian_support(bw)
+    x_min, x_max = np.min(x), np.max(x)
+    outside = max(0.05 * (x_max - x_min), support)
+    grid = np.linspace(x_min - outside, x_max + outside, grid_size)
+    dx = (grid[-1] - grid[0]) / (grid_size - 1)
+    binned = _linear_binning(x, grid[0], dx, grid_size)
+    m = min(np.floor(support / dx), grid_size)
+    distances = np.abs(np.linspace(-dx * m, dx * m, int(m * 2 + 1)))
+    kernel = np.exp(-((distances / bw) ** 2) / 2) / _KDE_NORM / (bw * _KDE_VOLUME)
+    return grid[np.argmax(scipy.signal.convolve(binned, kernel, mode="same"))]
+
+
+def _kde_mode(x: np.ndarray, grid_size: int) -> float:
+    """\\code{mode(engine="numba")}: \\code{_binned_mode}, ties as KDEpy"""
+    ret, tie = _binned_mode(x, grid_size)
+    return _convolved_mode(x, grid_size) if tie else ret
+
+
+_MODE_BW_BUCKETS = 64  # per octave
+
+
+@functools.lru_cache(maxsize=256)
+def _gaussian_kernel_fft(grid_size: int, bucket: int) -> tuple:
+    """rfft of the Gaussian kernel of \\code{bucket} (sd 2 ** (bucket / 64) grid steps), cut at 5
+    sd, wrapped for a linear convolution of \\code{grid_size} points, and its FFT length"""
+    sd = 2.0 ** (bucket / _MODE_BW_BUCKETS)
+    m = min(int(np.ceil(5 * sd)), grid_size - 1)
+    n_fft = 1 << int(np.ceil(np.log2(grid_size + m)))
+    kernel = np.zeros(n_fft)
+    kernel[: m + 1] = np.exp(-0.5 * (np.arange(m + 1) / sd) ** 2)
+    kernel[n_fft - m :] = kernel[m:0:-1]
+    return np.fft.rfft(kernel), n_fft
+
+
+def _fft_mode(x: np.ndarray, grid_size: int) -> float:
+    """\\code{mode(engine="fft")}: binned data convolved with a cached kernel FFT"""
+    n = x.shape[0]
+    if n == 1:
+        return x[0]
+    bw = _bw_nrd0_select(x)
+    support = _gaussian_support(bw)
+    x_min, x_max = np.min(x), np.max(x)
+    outside = max(0.05 * (x_max - x_min), support)
+    g_min = x_min - outside
+    dx = (x_max + outside - g_min) / (grid_size - 1)
+    t = (x - g_min) / dx
+    i = np.minimum(t.astype(np.int64), grid_size - 2)
+    binned = np.bincount(i, i + 1 - t, grid_size) + np.bincount(i + 1, t - i, grid_size)
+    kernel, n_fft = _gaussian_kernel_fft(
+        grid_size, int(np.round(np.log2(bw / dx) * _MODE_BW_BUCKETS))
+    )
+    density = np.fft.irfft(np.fft.rfft(binned, n_fft) * kernel, n_fft)[:grid_size]
+    return g_min + np.argmax(density) * dx
+
+
+@numba.jit(parallel=True, nopython=True, nogil=True)
+def _group_kernel(seg: np.ndarray, offsets: np.ndarray, stat: int, grid_size: int) -> tuple:
+    """
+    Statistics of every group, in parallel; \\code{stat}: 0 fivenum (k x 5), 1 median, 2 mode,
+    3 gravity (mean, median and mode), 4 mean of the hinges and median, 5 spread summary (k x 7),
+    6 bw_nrd0.  Also returns the groups whose mode is a tie, left out of their statistic
+    """
+    k = offsets.shape[0] - 1
+    ret = np.full((k, 5 if stat == 0 else 7 if stat == 5 else 1), np.nan)
+    ties = np.zeros(k, dtype=np.bool_)
+    for g in numba.prange(k):
+        x = seg[offsets[g] : offsets[g + 1]]
+        n = x.shape[0]
+        if n == 0:
+            continue
+        if stat == 0:
+            ret[g] = _select(x, _fivenum_positions(n))
+        elif stat == 1:
+            ret[g, 0] = _select(x, np.array([(n - 1) / 2.0]))[0]
+        elif stat == 2:
+            ret[g, 0], ties[g] = _binned_mode(x, grid_size)
+        elif stat == 3:
+            if n == 1:
+                ret[g, 0] = x[0]
+            else:
+                median = _select(x, np.array([(n - 1) / 2.0]))[0]
+                mode, ties[g] = _binned_mode(x, grid_size)
+                # a tie keeps mean + median, completed by _group_stat
+                ret[g, 0] = np.mean(x) + median if ties[g] else (np.mean(x) + median + mode) / 3.0
+        elif stat == 4:
+            ret[g, 0] = np.mean(_select(x, _fivenum_positions(n))[1:4])
+        elif stat == 5:
+            ret[g] = _spread(x)
+        elif n > 1:
+            ret[g, 0] = _bw_nrd0_select(x)
+    return ret, ties
+
+
+def _group_input(values: [np.ndarray, pd.Series], group: [np.ndarray, pd.Series]) -> tuple:
+    values = np.asarray(values, dtype=float).ravel()
+    group = np.asarray(group).ravel()
+    if values.shape[0] != group.shape[0]:
+        raise Exception(
+            f"values and group should have the same length: {values.shape[0]}, {group.shape[0]}"
+        )
+    if group.shape[0] > 0 and group.min() < 0:
+        raise Exception("group ids should be non-negative integers")
+    k = int(group.max()) + 1 if group.shape[0] > 0 else 0
+    # NaN dropped, as in fivenum: an all-NaN group is an empty one
+    nan = np.isnan(values)
+    if nan.any():
+        values, group = values[~nan], group[~nan]
+    return values, group.astype(np.int64), k
+
+
+def _group_stat(
+    values: [np.ndarray, pd.Series],
+    group: [np.ndarray, pd.Series],
+    stat: int,
+    grid_size: int = 1024,
+) -> np.ndarray:
+    values, group, k = _group_input(values, group)
+    seg, offsets = _group_segments(values, group, k)
+    ret, ties = _group_kernel(seg, offsets, stat, grid_size)
+    for g in np.flatnonzero(ties):
+        # ties of the mode broken as KDEpy (symmetric groups)
+        mode = _convolved_mode(seg[offsets[g] : offsets[g + 1]], grid_size)
+        ret[g, 0] = mode if stat == 2 else (ret[g, 0] + mode) / 3.0
+    return ret
+
+
+def group_mean(values: [np.ndarray, pd.Series], group: [np.ndarray, pd.Series]) -> np.ndarray:
+    """
+    Mean of every group of a flat vector of \\code{values} with integer \\code{group} ids
+    (0 to k - 1, e.g. the inverse of np.unique; NaN values dropped, NaN for an empty id)
+    """
+    values, group, k = _group_input(values, group)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.bincount(group, weights=values, minlength=k) / np.bincount(group, minlength=k)
+
+
+def group_median(values: [np.ndarray, pd.Series], group: [np.ndarray, pd.Series]) -> np.ndarray:
+    """Median of every group (see \\code{group_mean}), by selection"""
+    return _group_stat(values, group, 1)[:, 0]
+
+
+def group_fivenum(values: [np.ndarray, pd.Series], group: [np.ndarray, pd.Series]) -> np.ndarray:
+    """\\code{fivenum} of every group (see \\code{group_mean}), by selection: k x 5 array"""
+    return _group_stat(values, group, 0)
+
+
+def group_spread_summary(
+    values: [np.ndarray, pd.Series], group: [np.ndarray, pd.Series]
+) -> np.ndarray:
+    """\\code{spread_summary} of every group (see \\code{group_mean}): k x 7 array"""
+    return _group_stat(values, group, 5)
+
+
+def group_bw_nrd0(values: [np.ndarray, pd.Series], group: [np.ndarray, pd.Series]) -> np.ndarray:
+    """\\code{bw_nrd0} of every group (see \\code{group_mean}; NaN below 2 observations)"""
+    return _group_stat(values, group, 6)[:, 0]
+
+
+def group_mode(
+    values: [np.ndarray, pd.Series], group: [np.ndarray, pd.Series], grid_size: int = 1024
+) -> np.ndarray:
+    """
+    \\code{mode} of every group (see \\code{group_mean}): binned Gaussian KDE on the grid of
+    \\code{mode}, in compiled code; the value itself for a single observation
+    """
+    return _group_stat(values, group, 2, grid_size)[:, 0]
+
+
+def group_gravity(
+    values: [np.ndarray, pd.Series], group: [np.ndarray, pd.Series], grid_size: int = 1024
+) -> np.ndarray:
+    """\\code{gravity} of every group (see \\code{group_mean} and \\code{group_mode})"""
+    return _group_stat(values, group, 3, grid_size)[:, 0]
+
+
+def group_gravity_class(
+    values: [np.ndarray, pd.Series], group: [np.ndarray, pd.Series]
+) -> np.ndarray:
+    """\\code{gravity_class} of every group (see \\code{group_mean})"""
+    return (group_mean(values, group) + _group_stat(values, group, 4)[:, 0]) / 2.0
+
+
 def alt_cbind(
     x: [pd.Series, np.ndarray], y: [pd.Series, np.ndarray], first: bool = False
 ) -> pd.DataFrame:
@@ -364,10 +902,20 @@ def NNS_meboot_expand_sd(x: pd.Series, ensemble, fiv=5):
 
 
 __all__ = [
+    "spread_summary",
+    "spread_summary_columns",
     "bw_nrd0",
     "mode",
     "mode_class",
     "gravity",
+    "group_mean",
+    "group_median",
+    "group_fivenum",
+    "group_spread_summary",
+    "group_bw_nrd0",
+    "group_mode",
+    "group_gravity",
+    "group_gravity_class",
     "alt_cbind",
     "factor_2_dummy",
     "factor_2_dummy_FR",
@@ -2,14 +2,32 @@
 import pandas as pd
 import numpy as np
 from .Partial_Moments import LPM_ratio
+from .Sort_Cache import sorted_values
 import scipy.optimize
 
 
+def _quantile_sorted(x_sort: np.ndarray, q: float) -> float:
+    """np.quantile(x, q, interpolation="linear") on an already sorted x"""
+    h = (x_sort.shape[0] - 1) * q
+    lo = int(np.floor(h))
+    hi = min(lo + 1, x_sort.shape[0] - 1)
+    a, b, t = x_sort[lo], x_sort[hi], h - lo
+    diff = b - a
+    # same lerp as numpy, exact at both ends
+    return b - diff * (1 - t) if t >= 0.5 else a + diff * t
+
+
 def _LPM_VaR(
     percentile: [float, int], degree: [float, int, str, None], x: [pd.Series, np.ndarray, list]
 ) -> float:
-    x_min = np.min(x)
-    x_max = np.max(x)
+    if degree == 0:
+        x_sort = sorted_values(x)
+        x_min, x_max = x_sort[0], x_sort[-1]
+        if np.isnan(x_max):
+            return x_max  # NaN propagates, as np.quantile does
+    else:
+        x_min = np.min(x)
+        x_max = np.max(x)
     if x_min == x_max:
         return x_min
 
@@ -23,7 +41,7 @@ def _LPM_VaR(
         # td = tdigest.TDigest()
         # td.batch_update(x)
         # return td.percentile(percentile)
-        return np.quantile(x, percentile, interpolation="linear")
+        return _quantile_sorted(x_sort, percentile)
     # degree > 0
     x = np.array(x, dtype=float)
     x_max = float(x_max)
@@ -86,8 +104,14 @@ def _UPM_VaR(
     degree: [float, int, str, None],
     x: [pd.Series, np.array],
 ) -> float:
-    x_min = np.min(x)
-    x_max = np.max(x)
+    if degree == 0:
+        x_sort = sorted_values(x)
+        x_min, x_max = x_sort[0], x_sort[-1]
+        if np.isnan(x_max):
+            return x_max  # NaN propagates, as np.quantile does
+    else:
+        x_min = np.min(x)
+        x_max = np.max(x)
     if x_min == x_max:
         return x_min
 
@@ -101,7 +125,7 @@ def _UPM_VaR(
         # td = tdigest.TDigest()
         # td.batch_update(x)
         # return td.percentile(percentile)
-        return np.quantile(x, 1 - percentile, interpolation="linear")
+        return _quantile_sorted(x_sort, 1 - percentile)
 
     # degree > 0
     x = np.array(x, dtype=float)
@@ -1,4 +1,6 @@
 # -*- coding: utf-8 -*-
+from concurrent.futures import ThreadPoolExecutor
+
 import numpy as np
 import pandas as pd
 import numba
@@ -9,7 +11,7 @@ def pd_fill_diagonal(df_matrix: pd.DataFrame, value) -> None:
     df_matrix.values[tuple([np.arange(n)] * 2)] = value
 
 
-@numba.jit(parallel=True, nopython=True)
+@numba.jit(parallel=True, nopython=True, nogil=True)
 def numba_LPM(degree: [int, float], target: np.ndarray, variable: np.ndarray) -> np.ndarray:
     ret = np.zeros(shape=(target.shape[0]), dtype=np.float32)
     for i in numba.prange(target.shape[0]):
@@ -48,7 +50,10 @@ def LPM(
     LPM(0, mean(x), x)
     @export
     """
+    return _LPM(degree, target, variable, numba_LPM)
+
 
+def _LPM(degree, target, variable, kernel) -> [float, np.ndarray]:
     if target is None:
         target = np.mean(variable)
     if isinstance(target, str):  # "mean"
@@ -62,25 +67,25 @@ def LPM(
             return np.array([np.mean(variable <= i) for i in target])
         return np.mean(variable <= target)
     if isinstance(target, (np.ndarray, list)):
-        return numba_LPM(
+        return kernel(
             degree=degree,
             target=target,
             variable=variable if not hasattr(variable, "values") else variable.values,
         )
     elif isinstance(target, pd.Series):
-        return numba_LPM(
+        return kernel(
             degree=degree,
             target=target.values,
             variable=variable if not hasattr(variable, "values") else variable.values,
         )
-    return numba_LPM(
+    return kernel(
         degree=degree,
         target=np.array([target]),
         variable=variable if not hasattr(variable, "values") else variable.values,
     )[0]
 
 
-@numba.jit(parallel=True, nopython=True)
+@numba.jit(parallel=True, nopython=True, nogil=True)
 def numba_UPM(degree: [int, float], target: np.ndarray, variable: np.ndarray) -> np.ndarray:
     ret = np.zeros(shape=(target.shape[0]), dtype=np.float32)
     for i in numba.prange(target.shape[0]):
@@ -118,6 +123,10 @@ def UPM(
     UPM(0, mean(x), x)
     @export
     """
+    return _UPM(degree, target, variable, numba_UPM)
+
+
+def _UPM(degree, target, variable, kernel) -> [float, np.ndarray]:
     if target is None:
         target = np.mean(variable)
     if isinstance(target, str):  # "mean"
@@ -131,24 +140,76 @@ def UPM(
             return np.array([np.mean(variable > i) for i in target])
         return np.mean(variable > target)
     if isinstance(target, (np.ndarray, list)):
-        return numba_UPM(
+        return kernel(
             degree=degree,
             target=target,
             variable=variable if not hasattr(variable, "values") else variable.values,
         )
     elif isinstance(target, pd.Series):
-        return numba_UPM(
+        return kernel(
             degree=degree,
             target=target.values,
             variable=variable if not hasattr(variable, "values") else variable.values,
         )
-    return numba_UPM(
+    return kernel(
         degree=degree,
         target=np.array([target]),
         variable=variable if not hasattr(variable, "values") else variable.values,
     )[0]
 
 
+# Serial (non-prange) builds of the kernels above, for callers that already run on their own
+# threads: they release the GIL as well, but don't nest numba's thread pool inside ours.
+_nogil_LPM = numba.jit(nopython=True, nogil=True)(numba_LPM.py_func)
+_nogil_UPM = numba.jit(nopython=True, nogil=True)(numba_UPM.py_func)
+
+
+def _map_PM(func, kernel, jobs, max_workers) -> list:
+    jobs = list(jobs)
+    if len(jobs) == 0:
+        return []
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [
+            executor.submit(func, degree, target, variable, kernel)
+            for degree, target, variable in jobs
+        ]
+        return [f.result() for f in futures]
+
+
+def map_LPM(jobs: list, max_workers: [int, None] = None) -> list:
+    r"""
+    Batch Lower Partial Moments
+
+    Runs many independent \link{LPM} jobs on a thread pool.  The compiled kernels release the GIL,
+    so jobs run in parallel.
+    @param jobs iterable of \code{(degree, target, variable)} tuples, same arguments as \link{LPM}.
+    @param max_workers integer; number of threads, \code{None} (default) uses the
+        \code{concurrent.futures} default.
+    @return list of LPM results, in the same order as \code{jobs}.
+    @examples
+    x = np.random.randn(100000)
+    map_LPM([(1, t, x) for t in np.linspace(-1, 1, 64)], max_workers=8)
+    """
+    return _map_PM(_LPM, _nogil_LPM, jobs, max_workers)
+
+
+def map_UPM(jobs: list, max_workers: [int, None] = None) -> list:
+    r"""
+    Batch Upper Partial Moments
+
+    Runs many independent \link{UPM} jobs on a thread pool.  The compiled kernels release the GIL,
+    so jobs run in parallel.
+    @param jobs iterable of \code{(degree, target, variable)} tuples, same arguments as \link{UPM}.
+    @param max_workers integer; number of threads, \code{None} (default) uses the
+        \code{concurrent.futures} default.
+    @return list of UPM results, in the same order as \code{jobs}.
+    @examples
+    x = np.random.randn(100000)
+    map_UPM([(1, t, x) for t in np.linspace(-1, 1, 64)], max_workers=8)
+    """
+    return _map_PM(_UPM, _nogil_UPM, jobs, max_workers)
+
+
 def _Co_UPM(
     degree_x: [float, int],
     degree_y: [float, int],
@@ -527,6 +588,15 @@ def PM_matrix(
             "clpm": None,
             "cov.matrix": None,
         }
+    variable, variable_columns, target = _PM_matrix_prepare(target, variable)
+    if LPM_degree == 0 and UPM_degree == 0:
+        pms = _PM_matrix_degree0(target, variable)
+    else:
+        pms = _PM_matrix_rows(LPM_degree, UPM_degree, target, variable, range(variable.shape[1]))
+    return _PM_matrix_assemble(pms, variable_columns, variable.shape, pop_adj)
+
+
+def _PM_matrix_prepare(target, variable) -> tuple:
     if isinstance(variable, list):
         variable = np.array(variable)
     if isinstance(target, list):
@@ -543,21 +613,31 @@ def PM_matrix(
     variable_columns = (
         variable.columns if isinstance(variable, pd.DataFrame) else list(range(variable.shape[1]))
     )
+    if isinstance(variable, pd.DataFrame):
+        variable = variable.values
 
     # target dict
     if isinstance(target, (list, pd.Series, np.ndarray)):
         target = {i: v for i, v in enumerate(target)}
     elif isinstance(target, str):
         # mean / median / mode
-        if isinstance(variable, pd.DataFrame):
-            target = {i: getattr(np, target)(variable.values[:, i]) for i in range(n)}
-        else:
-            target = {i: getattr(np, target)(variable[:, i]) for i in range(n)}
+        target = {i: getattr(np, target)(variable[:, i]) for i in range(n)}
     elif isinstance(target, (int, float)):
         target = {i: target for i in range(n)}
-    # Partial moments lists
+    return variable, variable_columns, target
+
+
+def _PM_matrix_rows(
+    LPM_degree: [int, float],
+    UPM_degree: [int, float],
+    target: dict,
+    variable: np.ndarray,
+    rows,
+) -> dict:
+    # Partial moments lists, one entry per row in rows
     clpms, cupms, dlpms, dupms = [], [], [], []
-    for cur_var in range(n):
+    n = variable.shape[1]
+    for cur_var in rows:
         clpms.append([])
         cupms.append([])
         dlpms.append([])
@@ -565,13 +645,9 @@ def PM_matrix(
         # sapply(X, FUN, ..., simplify = TRUE, USE.NAMES = TRUE)
         # clpms[[i]] <- sapply(1 : n, function(b) Co.LPM(x = variable[ , i], y = variable[ , b], degree.x = LPM.degree, degree.y = LPM.degree, target.x = target[i], target.y = target[b]))
         for cur_var2 in range(n):
-            if isinstance(variable, pd.DataFrame):
-                x = variable.values[:, cur_var]
-                y = variable.values[:, cur_var2]
-            else:
-                x = variable[:, cur_var]
-                y = variable[:, cur_var2]
-            clpms[cur_var].append(
+            x = variable[:, cur_var]
+            y = variable[:, cur_var2]
+            clpms[-1].append(
                 Co_LPM(
                     x=x,
                     y=y,
@@ -581,7 +657,7 @@ def PM_matrix(
                     target_y=target[cur_var2],
                 )
             )
-            cupms[cur_var].append(
+            cupms[-1].append(
                 Co_UPM(
                     x=x,
                     y=y,
@@ -594,10 +670,10 @@ def PM_matrix(
             #            dlpms[[i]] <- sapply(1 : n, function(b)
             #            D.LPM(x = variable[ , i], y = variable[ , b], degree.x = UPM.degree, degree.y = LPM.degree, target.x = target[i], target.y = target[b]))
             if cur_var == cur_var2:
-                dlpms[cur_var].append(0.0)
-                dupms[cur_var].append(0.0)
+                dlpms[-1].append(0.0)
+                dupms[-1].append(0.0)
             else:
-                dlpms[cur_var].append(
+                dlpms[-1].append(
                     D_LPM(
                         x=x,
                         y=y,
@@ -607,7 +683,7 @@ def PM_matrix(
                         target_y=target[cur_var2],
                     )
                 )
-                dupms[cur_var].append(
+                dupms[-1].append(
                     D_UPM(
                         x=x,
                         y=y,
@@ -617,34 +693,96 @@ def PM_matrix(
                         target_y=target[cur_var2],
                     )
                 )
+    return {"clpms": clpms, "cupms": cupms, "dlpms": dlpms, "dupms": dupms}
+
+
+_M1, _M2, _M4, _H01 = (
+    np.uint64(0x5555555555555555),
+    np.uint64(0x3333333333333333),
+    np.uint64(0x0F0F0F0F0F0F0F0F),
+    np.uint64(0x0101010101010101),
+)
+
+
+@numba.jit(nopython=True, nogil=True)
+def _popcount(v: np.uint64) -> np.uint64:
+    # SWAR bit count (compiled to a single popcnt where available)
+    v = v - ((v >> np.uint64(1)) & _M1)
+    v = (v & _M2) + ((v >> np.uint64(2)) & _M2)
+    v = (v + (v >> np.uint64(4))) & _M4
+    return (v * _H01) >> np.uint64(56)
+
+
+@numba.jit(parallel=True, nopython=True, nogil=True)
+def _and_counts(a: np.ndarray, b: np.ndarray, symmetric: bool) -> np.ndarray:
+    """Set bits of \\code{a[i] & b[j]} for every pair of bitset rows (upper triangle mirrored if
+    \\code{symmetric})"""
+    ret = np.zeros((a.shape[0], b.shape[0]), dtype=np.int64)
+    for i in numba.prange(a.shape[0]):
+        for j in range(i if symmetric else 0, b.shape[0]):
+            c = np.uint64(0)
+            for w in range(a.shape[1]):
+                c += _popcount(a[i, w] & b[j, w])
+            ret[i, j] = c
+            if symmetric:
+                ret[j, i] = c
+    return ret
+
 
+def _pack_bits(mask: np.ndarray) -> np.ndarray:
+    """Columns of a boolean matrix as rows of uint64 bitsets"""
+    packed = np.packbits(mask.T, axis=1)
+    pad = -packed.shape[1] % 8
+    if pad:
+        packed = np.pad(packed, ((0, 0), (0, pad)))
+    return np.ascontiguousarray(packed).view(np.uint64)
+
+
+def _PM_matrix_degree0(target: dict, variable: np.ndarray) -> dict:
+    """
+    Partial moments lists of \\code{_PM_matrix_rows} for \\code{LPM_degree = UPM_degree = 0}:
+    frequencies of joint below / above target events, as popcounts of AND of bitsets
+    """
+    t = np.array([target[i] for i in range(variable.shape[1])], dtype=float)
+    with np.errstate(invalid="ignore"):
+        lower = _pack_bits(variable < t)
+        upper = _pack_bits(variable > t)
+    n = variable.shape[0]
+    clpm = _and_counts(lower, lower, True) / n
+    cupm = _and_counts(upper, upper, True) / n
+    # [i, j]: i below, j above; D_LPM(x = i, y = j) has x above and y below
+    lower_upper = _and_counts(lower, upper, False) / n
+    return {"clpms": clpm, "cupms": cupm, "dlpms": lower_upper.T, "dupms": lower_upper}
+
+
+def _PM_matrix_assemble(pms: dict, variable_columns, shape: tuple, pop_adj: bool) -> dict:
     # clpm.matrix <- matrix(unlist(clpms), n, n)
     # colnames(clpm.matrix) <- colnames(variable)
     # rownames(clpm.matrix) <- colnames(variable)
-    clpm_matrix = pd.DataFrame(clpms, index=variable_columns, columns=variable_columns).T
+    clpm_matrix = pd.DataFrame(pms["clpms"], index=variable_columns, columns=variable_columns).T
 
     # cupm.matrix <- matrix(unlist(cupms), n, n)
     # colnames(cupm.matrix) <- colnames(variable)
     # rownames(cupm.matrix) <- colnames(variable)
-    cupm_matrix = pd.DataFrame(cupms, index=variable_columns, columns=variable_columns).T
+    cupm_matrix = pd.DataFrame(pms["cupms"], index=variable_columns, columns=variable_columns).T
 
     # dlpm.matrix <- matrix(unlist(dlpms), n, n)
     # diag(dlpm.matrix) <- 0
     # colnames(dlpm.matrix) <- colnames(variable)
     # rownames(dlpm.matrix) <- colnames(variable)
-    dlpm_matrix = pd.DataFrame(dlpms, index=variable_columns, columns=variable_columns).T
+    dlpm_matrix = pd.DataFrame(pms["dlpms"], index=variable_columns, columns=variable_columns).T
     # pd_fill_diagonal(dlpm_matrix, 0.0)
 
     # dupm.matrix <- matrix(unlist(dupms), n, n)
     # diag(dupm.matrix) <- 0
     # colnames(dupm.matrix) <- colnames(variable)
     # rownames(dupm.matrix) <- colnames(variable)
-    dupm_matrix = pd.DataFrame(dupms, index=variable_columns, columns=variable_columns).T
+    dupm_matrix = pd.DataFrame(pms["dupms"], index=variable_columns, columns=variable_columns).T
     # pd_fill_diagonal(dupm_matrix, 0.0)
 
     if pop_adj:
         # adjustment <- length(variable[ , 1]) / (length(variable[ , 1]) - 1)
-        adjustment = variable.shape[1] / (variable.shape[1] - 1)
+        adjustment = shape[1] / (shape[1] - 1)
         clpm_matrix *= adjustment
         cupm_matrix *= adjustment
         dlpm_matrix *= adjustment
@@ -1060,6 +1198,8 @@ __all__ = [
     "pd_fill_diagonal",
     "LPM",
     "UPM",
+    "map_LPM",
+    "map_UPM",
     "Co_UPM",
     "Co_LPM",
     "D_LPM",
@@ -1,21 +1,232 @@
 # -*- coding: utf-8 -*-
 import numpy as np
 import pandas as pd
+import numba
+from .Internal_Functions import (
+    _plot_enabled,
+    group_gravity,
+    group_gravity_class,
+    group_mean,
+    group_median,
+    group_mode,
+    mode_class,
+)
+
+# Quadrants are packed integers: the root "q" is 1 and every split appends the new quadrant digit
+# (1 to 4 for X and Y, 1 to 2 for XONLY) in 2 bits (1 bit), child = parent << bits | (digit - 1).
+# Quadrants of the same depth sort as their labels; "pq", the prior quadrant of the root, is 0.
+_ROOT = 1
+_NO_PRIOR = 0
+_MAX_BITS = 62
+
+
+@numba.jit(nopython=True, nogil=True)
+def _part_split(
+    x: np.ndarray,
+    y: np.ndarray,
+    quadrant: np.ndarray,
+    rows: np.ndarray,
+    group: np.ndarray,
+    rp_x: np.ndarray,
+    rp_y: np.ndarray,
+    xonly: bool,
+) -> None:
+    """
+    Splits the quadrant of each row of \\code{rows} around the regression point of its group, in
+    place: digit 1 + (x <= rp x) + 2 (y <= rp y), or 1 + (x > rp x) for XONLY
+    """
+    for i in range(rows.shape[0]):
+        r = rows[i]
+        g = group[i]
+        if xonly:
+            quadrant[r] = (quadrant[r] << 1) | (x[r] > rp_x[g])
+        else:
+            quadrant[r] = (quadrant[r] << 2) | ((x[r] <= rp_x[g]) + 2 * (y[r] <= rp_y[g]))
+
+
+def _group_counts(labels: np.ndarray, rows: np.ndarray) -> np.ndarray:
+    """Number of rows of \\code{rows} (mask) with the same label, for each of these rows"""
+    _, inverse, counts = np.unique(labels[rows], return_inverse=True, return_counts=True)
+    return counts[inverse]
+
+
+def _group_mode_class(values: np.ndarray, group: np.ndarray) -> np.ndarray:
+    """\\code{mode_class} by group: first modal value in the order of the observations"""
+    order = np.argsort(group, kind="stable")
+    offsets = np.r_[0, np.cumsum(np.bincount(group))]
+    return np.array([mode_class(values[order[a:b]]) for a, b in zip(offsets[:-1], offsets[1:])])
+
+
+_GROUP_STATS = {
+    "gravity": group_gravity,
+    "gravity_class": group_gravity_class,
+    "mean": group_mean,
+    "median": group_median,
+    "mode": group_mode,
+    "mode_class": _group_mode_class,
+}
+
+
+def _quadrant_labels(quadrant: np.ndarray, bits: int) -> np.ndarray:
+    """String labels ("q", "q1", "q14", ..., "pq") of packed quadrants"""
+    unique, inverse = np.unique(quadrant, return_inverse=True)
+    labels = []
+    for q in unique:
+        digits = []
+        while q > _ROOT:
+            digits.append(str((q & ((1 << bits) - 1)) + 1))
+            q >>= bits
+        labels.append("pq" if q == _NO_PRIOR else "q" + "".join(reversed(digits)))
+    return np.array(labels, dtype=object)[inverse]
+
+
+@numba.jit(parallel=True, nopython=True, nogil=True)
+def _tree_assign(
+    x: np.ndarray,
+    y: np.ndarray,
+    rp_x: np.ndarray,
+    rp_y: np.ndarray,
+    children: np.ndarray,
+    xonly: bool,
+) -> np.ndarray:
+    """Packed quadrant of every point: the splits from the root down to a leaf, in parallel"""
+    bits = 1 if xonly else 2
+    ret = np.empty(x.shape[0], dtype=np.int64)
+    for p in numba.prange(x.shape[0]):
+        q = np.int64(_ROOT)
+        node = 0 if children.shape[0] > 0 else -1
+        while node >= 0:
+            if xonly:
+                digit = np.int64(x[p] > rp_x[node])
+            else:
+                digit = np.int64(x[p] <= rp_x[node]) + 2 * np.int64(y[p] <= rp_y[node])
+            q = (q << bits) | digit
+            node = children[node, digit]
+        ret[p] = q
+    return ret
+
+
+class PartitionTree:
+    r"""
+    Split thresholds of a partition map
+
+    Every quadrant split by \link{NNS_part}, with the regression point it was split around, as
+    flat arrays: packed \code{quadrant} ids (see \code{labels}), thresholds \code{x} and \code{y},
+    and \code{children}, the row of each sub-quadrant (-1 for a final quadrant).  New points are
+    assigned to the quadrants of the partition in O(depth) each, in compiled code; the arrays
+    (\code{to_dict}) can be saved with \code{np.savez} and loaded with \code{from_dict}.
+
+    @param quadrant packed ids of the split quadrants, parents before children.
+    @param x,y regression points of the splits.
+    @param children integer matrix; one column per quadrant digit (4, 2 for \code{"XONLY"}).
+    @examples
+    part = NNS_part(x, y, tree=True)
+    part["tree"].assign(x_new, y_new, labels=True)
+    np.savez("tree.npz", **part["tree"].to_dict())
+    PartitionTree.from_dict(np.load("tree.npz")).assign(x_new, y_new)
+    """
+
+    def __init__(self, quadrant: np.ndarray, x: np.ndarray, y: np.ndarray, children: np.ndarray):
+        self.quadrant = np.asarray(quadrant, dtype=np.int64)
+        self.x = np.asarray(x, dtype=float)
+        self.y = np.asarray(y, dtype=float)
+        self.children = np.asarray(children, dtype=np.int64)
+        if self.children.shape[1] not in [2, 4]:
+            raise Exception("children needs 2 (XONLY) or 4 columns")
+
+    @classmethod
+    def of(cls, quadrant: np.ndarray, x: np.ndarray, y: np.ndarray, bits: int) -> "PartitionTree":
+        """Tree of the splits of \\code{quadrant} (packed ids) around \\code{x}, \\code{y}"""
+        quadrant = np.asarray(quadrant, dtype=np.int64)
+        child = (quadrant[:, None] << bits) | np.arange(1 << bits)
+        children = np.full(child.shape, -1, dtype=np.int64)
+        if quadrant.shape[0] > 0:
+            order = np.argsort(quadrant)
+            pos = order[np.minimum(np.searchsorted(quadrant, child, sorter=order), len(order) - 1)]
+            children = np.where(quadrant[pos] == child, pos, -1)
+        return cls(quadrant, x, y, children)
+
+    @property
+    def xonly(self) -> bool:
+        return self.children.shape[1] == 2
+
+    @property
+    def bits(self) -> int:
+        return 1 if self.xonly else 2
+
+    @property
+    def depth(self) -> int:
+        """Number of splits from the root to the deepest quadrant"""
+        if self.quadrant.shape[0] == 0:
+            return 0
+        return int(np.floor(np.log2(self.quadrant.max()))) // self.bits + 1
+
+    def assign(
+        self,
+        x_new: [pd.Series, np.ndarray],
+        y_new: [pd.Series, np.ndarray, None] = None,
+        labels: bool = False,
+    ) -> np.ndarray:
+        """
+        Quadrants of new points: packed ids, or their labels (\\code{labels=True}) as in the
+        \\code{"quadrant"} column of \\code{NNS_part}'s \\code{dt}; \\code{y_new} unused for XONLY
+        """
+        x_new = np.ascontiguousarray(x_new, dtype=float).ravel()
+        if y_new is None:
+            if not self.xonly:
+                raise Exception("y_new is needed for an X and Y partition")
+            y_new = x_new
+        y_new = np.ascontiguousarray(y_new, dtype=float).ravel()
+        if x_new.shape[0] != y_new.shape[0]:
+            raise Exception(
+                f"x_new and y_new should have the same length: {x_new.shape[0]}, {y_new.shape[0]}"
+            )
+        ret = _tree_assign(x_new, y_new, self.x, self.y, self.children, self.xonly)
+        return self.labels(ret) if labels else ret
+
+    def labels(self, quadrant: np.ndarray) -> np.ndarray:
+        """String labels ("q", "q1", "q14", ...) of packed quadrant ids"""
+        return _quadrant_labels(np.asarray(quadrant, dtype=np.int64), self.bits)
+
+    def to_dict(self) -> dict:
+        return {"quadrant": self.quadrant, "x": self.x, "y": self.y, "children": self.children}
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "PartitionTree":
+        return cls(d["quadrant"], d["x"], d["y"], d["children"])
+
+
+_STATS = {
+    # noise_reduction: (x, y) central tendencies of the regression points
+    "off": ("gravity", "gravity"),
+    "mean": ("gravity", "mean"),
+    "median": ("gravity", "median"),
+    "mode": ("gravity", "mode"),
+    "mode_class": ("gravity_class", "mode_class"),
+}
+
 
 def NNS_part(
-    x: [np.ndarray, pd.Series], y: [np.ndarray, pd.Series],
-    Voronoi: bool=False,
+    x: [np.ndarray, pd.Series],
+    y: [np.ndarray, pd.Series],
+    Voronoi: bool = False,
     _type=None,
     order=None,
     obs_req: int = 8,
     min_obs_stop: bool = True,
-    noise_reduction: str = "off"
-):
-    """
+    noise_reduction: str = "off",
+    tree: bool = False,
+) -> dict:
+    r"""
     NNS Partition Map
 
     Creates partitions based on partial moment quadrant centroids, iteratively assigning identifications to observations based on those quadrants (unsupervised partitional and hierarchial clustering method).  Basis for correlation, dependence \link{NNS.dep}, regression \link{NNS.reg} routines.
 
+    Quadrants are coded as packed integers (2 bits per level, 1 bit for \code{"XONLY"}); the
+    central tendencies of all the quadrants are computed at once by the compiled group kernels
+    (\code{group_gravity}, ...), as are the splits.  Partitions are limited to 31 levels (62 for
+    \code{"XONLY"}); \code{x} and \code{y} should not be empty or contain NaN.
+
     @param x a numeric vector.
     @param y a numeric vector with compatible dimensions to \code{x}.
     @param Voronoi logical; \code{FALSE} (default) Displays a Voronoi type diagram using partial moment quadrants.
@@ -24,11 +235,14 @@ def NNS_part(
     @param obs_req integer; (8 default) Required observations per cluster where quadrants will not be further partitioned if observations are not greater than the entered value.  Reduces minimum number of necessary observations in a quadrant to 1 when \code{(obs.req = 1)}.
     @param min_obs_stop logical; \code{TRUE} (default) Stopping condition where quadrants will not be further partitioned if a single cluster contains less than the entered value of \code{obs.req}.
     @param noise_reduction the method of determining regression points options for the dependent variable \code{y}: ("mean", "median", "mode", "off"); \code{(noise.reduction = "mean")} uses means for partitions.  \code{(noise.reduction = "median")} uses medians instead of means for partitions, while \code{(noise.reduction = "mode")} uses modes instead of means for partitions.  Defaults to \code{(noise.reduction = "off")} where an overall central tendency measure is used, which is the default for the independent variable \code{x}.
+    @param tree logical; \code{FALSE} (default).  \code{TRUE} adds the split thresholds as a
+        \link{PartitionTree}, to assign new points to the quadrants.
     @return Returns:
      \itemize{
-      \item{\code{"dt"}} a \link{data.table} of \code{x} and \code{y} observations with their partition assignment \code{"quadrant"} in the 3rd column and their prior partition assignment \code{"prior.quadrant"} in the 4th column.
-      \item{\code{"regression.points"}} the \link{data.table} of regression points for that given \code{(order = ...)}.
+      \item{\code{"dt"}} a data frame of \code{x} and \code{y} observations with their partition assignment \code{"quadrant"} in the 3rd column and their prior partition assignment \code{"prior.quadrant"} in the 4th column.
+      \item{\code{"regression.points"}} the data frame of regression points for that given \code{(order = ...)}.
       \item{\code{"order"}}  the \code{order} of the final partition given \code{"min.obs.stop"} stopping condition.
+      \item{\code{"tree"}} with \code{tree = TRUE}, the \link{PartitionTree} of the splits.
      }
 
     @note \code{min.obs.stop = FALSE} will not generate regression points due to unequal partitioning of quadrants from individual cluster observations.
@@ -56,305 +270,140 @@ def NNS_part(
     DT
     @export
     """
-
-
     noise_reduction = noise_reduction.lower()
-    if noise_reduction not in ["mean", "median", "mode", "off", "mode_class"]:
-        raise Exception("Please ensure noise_reduction is from  [mean, median, mode, off, mode_class]")
-
-    if isinstance(x, pd.Series):
-        x = x.values
-    if isinstance(y, pd.Series):
-        y = y.values
+    if noise_reduction not in _STATS:
+        raise Exception(
+            "Please ensure noise_reduction is from  [mean, median, mode, off, mode_class]"
+        )
+    x_stat, y_stat = _STATS[noise_reduction]
+
+    x = np.asarray(x, dtype=float).ravel()
+    y = np.asarray(y, dtype=float).ravel()
+    if x.shape[0] != y.shape[0]:
+        raise Exception(f"x and y should have the same length: {x.shape[0]}, {y.shape[0]}")
+    n = x.shape[0]
+    if n == 0:
+        raise Exception("x and y should not be empty")
+    if np.isnan(x).any() or np.isnan(y).any():
+        raise Exception("x and y should not contain NaN")
+    xonly = _type is not None
+    bits = 1 if xonly else 2
 
     if obs_req is None:
         obs_req = 8
-
-    if not order is None and order == 0:
+    if order is not None and order == 0:
         order = 1
-    if Voronoi:
-        # TODO
-        x.label = deparse(substitute(x))
-        y.label = deparse(substitute(y))
-
-    # TODO
-    PART = data.table::data.table(
-        x, y,
-        quadrant = "q",
-        prior.quadrant = "pq"
-    )[, `:=`(counts, .N), by = "quadrant"][, `:=`(old.counts, .N), by = "prior.quadrant"]
-
-    if Voronoi:
-        # TODO: matplotlib
-        plot(x, y, col = "steelblue", cex.lab = 1.5, xlab = x.label, ylab = y.label)
-
-    if x.shape[0] <= 8:
+    numeric_order = order is None or not isinstance(order, str)
+
+    levels = max(np.ceil(np.log2(n)), 1)
+    if n <= 8:
         if order is None:
             order = 1
-            hard_stop = max(np.ceil(np.log(x.shape[0], 2)), 1)
         else:
             obs_req = 0
-            hard_stop = x.shape[0]
-
     if order is None:
-        order = np.max(np.ceil(np.log(x.shape[0], 2)), 1)
-
-    # TODO is numeric?
-    #if(!is.numeric(order)):
-    if False:
+        order = levels
+    if not numeric_order:
         obs_req = 0
-        hard_stop = np.max(np.ceil(np.log(x.shape[0], 2)), 1) + 2
+        hard_stop = levels + 2
     else:
-        #obs_req = obs_req
-        hard_stop = 2*np.max(np.ceil(np.log(x.shape[0], 2)), 1) + 2
-
-    RP = None
-    if _type is None:
-        i = 0
-        while (i >= 0):
-            if i == order or i == hard_stop:
-                break
-            # TODO
-            PART[counts >= obs_req, `:=`(counts, .N), by = quadrant]
-            PART[old_counts >= obs_req, `:=`(old_counts, .N), by = prior_quadrant]
-            l_PART = max(PART$counts)
-
-            obs_req_rows = PART[counts >= obs_req, which = TRUE]
-            old_obs_req_rows = PART[old_counts >= obs_req, which = TRUE]
-
-            if len(obs_req_rows)==0:
-                break
-            if min_obs_stop and obs_req > 0 and (len(obs_req_rows) < len(old_obs_req_rows)):
-                break
-
-            if noise_reduction == "off":
-                if Voronoi:
-                    if l_PART > obs_req:
-                        PART[obs_req_rows, {
-                                segments(min(x), gravity(y), max(x), gravity(y), lty = 3)
-                                segments(gravity(x), min(y), gravity(x), max(y), lty = 3)
-                        }, by = quadrant]
-                 RP = PART[
-                    obs.req.rows,
-                    mapply(function(f,z) as.list(f(z)), list(x = gravity, y = gravity), .SD),
-                    by = quadrant,
-                    .SDcols = x:y
-                ]
-
-            if noise.reduction == "mean":
-                if Voronoi:
-                    if l_PART > obs_req:
-                        PART[
-                            obs.req.rows, {
-                            segments(min(x), mean(y), max(x), mean(y), lty = 3)
-                            segments(gravity(x), min(y), gravity(x), max(y), lty = 3)
-                        }, by = quadrant]
-                RP = PART[
-                    obs.req.rows,
-                    mapply(function(f,z) as.list(f(z)), list(x = gravity, y = mean), .SD),
-                    by = quadrant,
-                    .SDcols = x:y
-                ]
-
-            if noise_reduction == "median":
-                if Voronoi:
-                    if l_PART > obs_req:
-                        PART[
-                            obs.req.rows, {
-                                segments(min(x), median(y), max(x), median(y), lty = 3)
-                                segments(gravity(x), min(y), gravity(x), max(y), lty = 3)
-                            },
-                            by = quadrant
-                        ]
-                RP = PART[
-                    obs.req.rows,
-                    mapply(function(f,z) as.list(f(z)), list(x = gravity, y = median), .SD),
-                    by = quadrant,
-                    .SDcols = x:y
-                ]
-
-            if noise_reduction == "mode":
-                if Voronoi:
-                    if l_PART > obs_req:
-                        PART[
-                            obs.req.rows, {
-                                segments(min(x), mode(y), max(x), mode(y), lty = 3)
-                                segments(gravity(x), min(y), gravity(x), max(y), lty = 3)
-                            },
-                            by = quadrant
-                        ]
-                RP = PART[
-                    obs.req.rows,
-                    mapply(function(f,z) as.list(f(z)), list(x = gravity, y = mode), .SD),
-                    by = quadrant,
-                    .SDcols = x:y
-                ]
-
-            if noise_reduction == "mode_class":
-                if Voronoi:
-                    if l_PART > obs_req:
-                        PART[
-                            obs.req.rows, {
-                                segments(min(x), mode_class(y), max(x), mode_class(y), lty = 3)
-                                segments(gravity_class(x), min(y), gravity_class(x), max(y), lty = 3)
-                            },
-                            by = quadrant
-                        ]
-                RP = PART[
-                    obs.req.rows,
-                    mapply(function(f,z) as.list(f(z)), list(x = gravity_class, y = mode_class), .SD),
-                    by = quadrant,
-                    .SDcols = x:y
-                ]
-
-            RP[, `:=`(prior.quadrant, (quadrant))]
-            PART[obs.req.rows, `:=`(prior.quadrant, (quadrant))]
-            old_parts = length(unique(PART$quadrant))
-
-            PART[
-                RP,
-                on = .(quadrant), `:=`(
-                    q_new, {
-                        lox = x.x <= i.x
-                        loy = x.y <= i.y
-                        1L + lox + loy * 2L
-                    }
-               )
-            ]
-            PART[
-                obs.req.rows,
-                `:=`(quadrant, paste0(quadrant, q_new))
-            ]
-            new_parts = len(np.unique(PART$quadrant))
-            if min(PART$counts) <= obs_req) and i >= 1:
-                break
-            i += 1
-
-        if RP is None:
-            RP = PART[, c("quadrant", "x", "y")]
-        # TODO: is.numeric(order) ?
-        if (!is.numeric(order) || is.null(dim(RP))):
-            RP = PART[, c("quadrant", "x", "y")]
-        else:
-            RP[, `:=`(prior.quadrant = NULL)]
-
-        PART[, `:=`(counts = NULL, old.counts = NULL, q_new = NULL)]
-        RP = data.table::setorder(RP[], quadrant)[]
-        if Voronoi:
-            # TODO: Matplotlib
-            title(main = paste0("NNS Order = ", i), cex.main = 2)
-            if min_obs_stop:
-                points(RP$x, RP$y, pch = 15, lwd = 2, col = "red")
-        if min_obs_stop == False:
-            RP = None
-        return{
-            "order": i,
-            "dt": PART[],
-            "regression.points": RP
+        hard_stop = 2 * levels + 2
+    hard_stop = min(hard_stop, _MAX_BITS // bits)
+
+    quadrant = np.full(n, _ROOT, dtype=np.int64)
+    prior = np.full(n, _NO_PRIOR, dtype=np.int64)
+    counts = np.full(n, n, dtype=np.int64)
+    old_counts = np.full(n, n, dtype=np.int64)
+
+    use_plot = _plot_enabled(Voronoi) if Voronoi else False
+    if use_plot:
+        import matplotlib.pyplot as plt
+
+        plt.scatter(x, y, color="steelblue", s=10)
+        plt.xlabel("x")
+        plt.ylabel("y")
+
+    # XONLY: quadrants with more than obs_req / 2 observations are partitioned
+    def selected(c: np.ndarray) -> np.ndarray:
+        return c > obs_req / 2 if xonly else c >= obs_req
+
+    rp = None
+    splits = []
+    i = 0
+    while True:
+        if i == order or i == hard_stop:
+            break
+        rows = selected(counts)
+        counts[rows] = _group_counts(quadrant, rows)
+        old_rows = selected(old_counts)
+        old_counts[old_rows] = _group_counts(prior, old_rows)
+        l_part = np.max(counts)
+
+        rows = np.flatnonzero(selected(counts))
+        n_old_rows = np.count_nonzero(selected(old_counts))
+        if rows.shape[0] == 0:
+            break
+        if (min_obs_stop or xonly) and obs_req > 0 and rows.shape[0] < n_old_rows:
+            break
+
+        quadrants, group = np.unique(quadrant[rows], return_inverse=True)
+        rp_x = _GROUP_STATS[x_stat](x[rows], group)
+        rp_y = _GROUP_STATS[y_stat](y[rows], group)
+        rp = (quadrants, rp_x, rp_y)
+        splits.append(rp)
+
+        if use_plot and l_part > obs_req:
+            x_min = np.full(quadrants.shape[0], np.inf)
+            x_max = np.full(quadrants.shape[0], -np.inf)
+            y_min, y_max = x_min.copy(), x_max.copy()
+            np.minimum.at(x_min, group, x[rows])
+            np.maximum.at(x_max, group, x[rows])
+            np.minimum.at(y_min, group, y[rows])
+            np.maximum.at(y_max, group, y[rows])
+            if not xonly:
+                plt.hlines(rp_y, x_min, x_max, linestyles=":", colors="black")
+            plt.vlines(rp_x, y_min, y_max, linestyles=":", colors="black")
+
+        prior[rows] = quadrant[rows]
+        _part_split(x, y, quadrant, rows, group, rp_x, rp_y, xonly)
+        if np.min(counts) <= obs_req and i >= 1:
+            break
+        i += 1
+
+    dt = pd.DataFrame(
+        {
+            "x": x,
+            "y": y,
+            "quadrant": _quadrant_labels(quadrant, bits),
+            "prior.quadrant": _quadrant_labels(prior, bits),
         }
-
-    if not _type is None:
-        i = 0
-        while i >= 0:
-            if i == order or i == hard_stop:
-                break
-            PART[counts > obs.req/2, `:=`(counts, .N), by = quadrant]
-            PART[old.counts > obs.req/2, `:=`(old.counts, .N), by = prior.quadrant]
-            obs_req_rows = PART[counts > obs.req/2, which = TRUE]
-            old_obs_req_rows = PART[old.counts > obs.req/2, which = TRUE]
-
-            if len(obs_req_rows) == 0:
-                break
-            if obs_req > 0 and (len(obs_req_rows) < len(old_obs_req_rows)):
-                break
-            if noise_reduction == "off":
-                RP = PART[
-                    obs.req.rows,
-                    mapply(function(f,z) as.list(f(z)), list(x = gravity, y = gravity), .SD),
-                    by = quadrant,
-                   .SDcols = x:y
-                ]
-
-            if noise_reduction == "mean":
-                RP = PART[
-                    obs.req.rows,
-                    mapply(function(f,z) as.list(f(z)), list(x = gravity, y = mean), .SD),
-                    by = quadrant,
-                    .SDcols = x:y
-                ]
-
-            if noise_reduction == "mode":
-                RP = PART[
-                    obs.req.rows,
-                    mapply(function(f,z) as.list(f(z)), list(x = gravity, y = mode), .SD),
-                    by = quadrant,
-                    .SDcols = x:y
-                ]
-
-            if noise_reduction == "mode_class":
-                RP = PART[
-                    obs.req.rows,
-                    mapply(function(f,z) as.list(f(z)), list(x = gravity_class, y = mode_class), .SD),
-                    by = quadrant,
-                    .SDcols=x:y
-                ]
-
-            if noise_reduction == "median":
-                RP = PART[
-                    obs.req.rows,
-                    mapply(function(f,z) as.list(f(z)), list(x = gravity, y = median), .SD),
-                    by = quadrant,
-                    .SDcols = x:y
-                ]
-
-            RP[, `:=`(prior.quadrant, (quadrant))]
-            PART[obs.req.rows, `:=`(prior.quadrant, (quadrant))]
-            old_parts = len(np.unique(PART$quadrant))
-            PART[
-                RP,
-                on = .(quadrant), `:=`(q_new, {
-                    lox = x.x > i.x
-                    1L + lox
-                })
-            ]
-            PART[
-                obs_req_rows,
-                `:=`(quadrant, paste0(quadrant, q_new))
-            ]
-            new_parts = len(np.unique(PART$quadrant))
-            if min(PART$counts) <= obs_req and i >= 1:
-                break
-            i += 1
-
-        if RP is None:
-            RP = PART[, c("quadrant", "x", "y")]
-        # TODO is.numeric(order)?
-        if not is_numeric(order) or is_null(dim(RP)):
-            RP = PART[, c("quadrant", "x", "y")]
-        else:
-            RP[, `:=`(prior.quadrant = NULL)]
-
-        PART[, `:=`(counts = NULL, old.counts = NULL, q_new = NULL)]
-        RP = data.table::setorder(RP[], quadrant)[]
-        if np.mean([
-                len(np.unique(np.diff(x))),
-                len(np.unique(x))
-            ]) < .33 * len(x):
-            RP$x = ifelse(RP$x%%1 < .5, floor(RP$x), ceiling(RP$x))
-
-        if Voronoi:
-            abline(v = c(PART[ ,min(x), by=prior.quadrant]$V1,max(x)), lty = 3)
-            if min_obs_stop:
-                points(RP$x, RP$y, pch = 15, lwd = 2, col = "red")
-            title(main = paste0("NNS Order = ", i), cex.main = 2)
-        if min_obs_stop is False:
-            RP = None
-        return {
-            "order": i,
-            "dt": PART[],
-            "regression.points": RP
-        }
-    return {}
-
-
-__all__ = ["NNS_part"]
+    )
+    if rp is None or not numeric_order:
+        # quadrants of different depths: order of the labels, stable as setorder
+        RP = dt.sort_values("quadrant", kind="stable")[["quadrant", "x", "y"]]
+        RP = RP.reset_index(drop=True)
+    else:
+        quadrants, rp_x, rp_y = rp
+        RP = pd.DataFrame({"quadrant": _quadrant_labels(quadrants, bits), "x": rp_x, "y": rp_y})
+    if xonly and np.mean([len(np.unique(np.diff(x))), len(np.unique(x))]) < 0.33 * n:
+        # discrete x: regression points on integers
+        RP["x"] = np.where(RP["x"] % 1 < 0.5, np.floor(RP["x"]), np.ceil(RP["x"]))
+
+    if use_plot:
+        if xonly:
+            starts = dt.groupby("prior.quadrant")["x"].min().values
+            plt.vlines(np.r_[starts, np.max(x)], np.min(y), np.max(y), linestyles=":")
+        if min_obs_stop:
+            plt.scatter(RP["x"], RP["y"], marker="s", color="red")
+        plt.title(f"NNS Order = {i}")
+    if not min_obs_stop:
+        RP = None
+    ret = {"order": i, "dt": dt, "regression.points": RP}
+    if tree:
+        ret["tree"] = PartitionTree.of(
+            *[np.concatenate([s[f] for s in splits] or [np.empty(0)]) for f in range(3)], bits
+        )
+    return ret
+
+
+__all__ = ["NNS_part", "PartitionTree"]
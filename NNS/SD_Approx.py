@@ -0,0 +1,493 @@
+# -*- coding: utf-8 -*-
+r"""
+Approximate stochastic dominance on a histogram grid
+
+A sample is summarized in one streaming pass by an \code{SDSketch}: for every bin of a fixed
+grid, the count and the first two moments of the distances to the bin's right edge.  These give
+LPM of degree 0, 1 and 2 exactly at every grid edge.  Between two edges the curves are monotone,
+so a pair of curves can only cross inside a bin where the upper curve at the right edge exceeds
+the lower curve at the left edge: the largest such gap is the error bound of the decision, and
+only those bins are re-tested exactly (escalation) from the raw sample values.
+"""
+import pandas as pd
+import numpy as np
+import numba
+from .SD_Core import _SD_NAMES
+
+
+@numba.jit(nopython=True, nogil=True)
+def _sketch_update(
+    edges: np.ndarray, counts: np.ndarray, m1: np.ndarray, m2: np.ndarray, values: np.ndarray
+) -> None:
+    # bins: 0 = (-inf, lo], b = (edges[b - 1], edges[b]], G + 1 = (hi, inf)
+    G = edges.shape[0] - 1
+    lo, hi = edges[0], edges[G]
+    w = (hi - lo) / G
+    for v in values:
+        if v <= lo:
+            b = 0
+        elif v > hi:
+            b = G + 1
+        else:
+            b = min(max(int(np.ceil((v - lo) / w)), 1), G)
+            while v > edges[b]:
+                b += 1
+            while v <= edges[b - 1]:
+                b -= 1
+        counts[b] += 1
+        # distance to the right edge (to hi, above it, for the last bin)
+        d = edges[b] - v if b <= G else v - hi
+        m1[b] += d
+        m2[b] += d * d
+
+
+@numba.jit(nopython=True, nogil=True)
+def _sketch_states(
+    edges: np.ndarray, counts: np.ndarray, m1: np.ndarray, m2: np.ndarray, T: float
+) -> np.ndarray:
+    """
+    Rows: support (lo, edges, T), count <= t, sum (t - v), sum (t - v) ** 2 over v <= t, and
+    sum (v - t) over v > t; every term non-negative, shifted between edges
+    """
+    G = edges.shape[0] - 1
+    n = counts.sum()
+    ret = np.zeros((5, G + 2))
+    a0, a1, a2 = float(counts[0]), m1[0], m2[0]
+    for b in range(G + 1):
+        if b > 0:
+            d = edges[b] - edges[b - 1]
+            a2 += 2.0 * d * a1 + d * d * a0
+            a1 += d * a0
+            a0 += counts[b]
+            a1 += m1[b]
+            a2 += m2[b]
+        ret[0, b], ret[1, b], ret[2, b], ret[3, b] = edges[b], a0, a1, a2
+    # above hi, up to T
+    d = T - edges[G]
+    c, p1, p2 = counts[G + 1], m1[G + 1], m2[G + 1]
+    ret[0, G + 1] = T
+    ret[1, G + 1] = a0 + c
+    ret[2, G + 1] = a1 + d * a0 + c * d - p1
+    ret[3, G + 1] = a2 + 2.0 * d * a1 + d * d * a0 + c * d * d - 2.0 * d * p1 + p2
+    # upper moment, from the top
+    u = p1
+    ret[4, G] = u
+    for b in range(G, 0, -1):
+        w = edges[b] - edges[b - 1]
+        u += (n - ret[1, b]) * w + counts[b] * w - m1[b]
+        ret[4, b - 1] = u
+    return ret
+
+
+@numba.jit(nopython=True, nogil=True)
+def _select_bins(edges: np.ndarray, values: np.ndarray, mask: np.ndarray) -> np.ndarray:
+    """Values in the bins flagged by \\code{mask} (bins numbered as in \\code{_sketch_update})"""
+    G = edges.shape[0] - 1
+    lo, hi = edges[0], edges[G]
+    w = (hi - lo) / G
+    keep = np.zeros(values.shape[0], dtype=np.bool_)
+    for i in range(values.shape[0]):
+        v = values[i]
+        if v <= lo:
+            b = 0
+        elif v > hi:
+            b = G + 1
+        else:
+            b = min(max(int(np.ceil((v - lo) / w)), 1), G)
+            while v > edges[b]:
+                b += 1
+            while v <= edges[b - 1]:
+                b -= 1
+        keep[i] = mask[b]
+    return values[keep]
+
+
+# error_model="numpy": 0 / 0 is NaN (never a violation), as in the exact sweep
+@numba.jit(nopython=True, nogil=True, error_model="numpy")
+def _escalate(
+    xs: np.ndarray,
+    ys: np.ndarray,
+    support: np.ndarray,
+    bins: np.ndarray,
+    state_x: np.ndarray,
+    state_y: np.ndarray,
+    nx: int,
+    ny: int,
+    degree: int,
+    ratio: bool,
+    tol: float,
+) -> tuple:
+    """
+    Exact test at the sample points of \\code{bins} (sorted), starting from the edge states;
+    differences within \\code{tol} are rounding (ties of the exact sweep)
+    Returns (first violation point or NaN, curves differ at some point)
+    """
+    i = j = 0
+    not_equal = False
+    for b in bins:
+        right = support[b]
+        if b == 0:
+            # below lo: empty curves before the first point, upper moment of every value
+            lo = support[0]
+            t = min(xs[0] if xs.shape[0] > 0 else lo, ys[0] if ys.shape[0] > 0 else lo)
+            cx = cy = a1x = a1y = a2x = a2y = 0.0
+            u1x = state_x[4, 0] + (nx - state_x[1, 0]) * (lo - t)
+            u1y = state_y[4, 0] + (ny - state_y[1, 0]) * (lo - t)
+            for k in range(xs.shape[0]):
+                if xs[k] > lo:
+                    break
+                u1x += xs[k] - t
+            for k in range(ys.shape[0]):
+                if ys[k] > lo:
+                    break
+                u1y += ys[k] - t
+        else:
+            t = support[b - 1]
+            sx, sy = state_x[:, b - 1], state_y[:, b - 1]
+            cx, a1x, a2x, u1x = sx[1], sx[2], sx[3], sx[4]
+            cy, a1y, a2y, u1y = sy[1], sy[2], sy[3], sy[4]
+            while i < xs.shape[0] and xs[i] <= t:
+                i += 1
+            while j < ys.shape[0] and ys[j] <= t:
+                j += 1
+        while (i < xs.shape[0] and xs[i] <= right) or (j < ys.shape[0] and ys[j] <= right):
+            if i < xs.shape[0] and xs[i] <= right and j < ys.shape[0] and ys[j] <= right:
+                t_next = min(xs[i], ys[j])
+            elif i < xs.shape[0] and xs[i] <= right:
+                t_next = xs[i]
+            else:
+                t_next = ys[j]
+            d = t_next - t
+            if d > 0:
+                a2x += 2.0 * d * a1x + d * d * cx
+                a2y += 2.0 * d * a1y + d * d * cy
+                a1x += d * cx
+                a1y += d * cy
+                u1x -= d * (nx - cx)
+                u1y -= d * (ny - cy)
+            t = t_next
+            while i < xs.shape[0] and xs[i] == t:
+                i += 1
+                cx += 1
+            while j < ys.shape[0] and ys[j] == t:
+                j += 1
+                cy += 1
+            if cx == nx:
+                u1x = 0.0
+            if cy == ny:
+                u1y = 0.0
+            if degree == 0:
+                lx, ly = cx / nx, cy / ny
+            elif degree == 1:
+                lx, ly = a1x / nx, a1y / ny
+                if ratio:
+                    lx = lx / (u1x / nx + lx)
+                    ly = ly / (u1y / ny + ly)
+            else:
+                lx, ly = a2x / nx, a2y / ny
+            if lx > ly + tol:
+                return t, True
+            if not abs(lx - ly) <= tol:
+                not_equal = True
+    return np.nan, not_equal
+
+
+def _grid(lo: float, hi: float, bins: int) -> np.ndarray:
+    """Edges of \\code{bins} equal bins over [lo, hi] (one unit wide bins for a constant sample)"""
+    if bins < 1:
+        raise Exception("bins needs to be a positive integer")
+    if not hi > lo:
+        hi = lo + 1.0
+    return np.linspace(lo, hi, int(bins) + 1)
+
+
+class SDSketch:
+    r"""
+    Streaming histogram sketch of a sample
+
+    Count and first two moments per bin of a fixed grid of \code{bins} equal bins over
+    \code{[lo, hi]} (values outside go to two open-ended bins), updated chunk by chunk.  Sketches
+    on the same grid are compared by \link{NNS_SD_approx}.
+
+    @param lo numeric; lower end of the grid.
+    @param hi numeric; upper end of the grid.
+    @param bins integer; number of bins.
+    @examples
+    sk_x, sk_y = SDSketch(-5, 5), SDSketch(-5, 5)
+    for chunk in range(100):
+        sk_x.update(np.random.randn(10 ** 6) + 0.1)
+        sk_y.update(np.random.randn(10 ** 6))
+    NNS_SD_approx(sk_x, sk_y, 2)["result"]
+    """
+
+    def __init__(self, lo: float, hi: float, bins: int = 4096):
+        self.edges = _grid(lo, hi, bins)
+        self.counts = np.zeros(self.edges.shape[0] + 1, dtype=np.int64)
+        self.m1 = np.zeros(self.edges.shape[0] + 1)
+        self.m2 = np.zeros(self.edges.shape[0] + 1)
+        self.min = np.inf
+        self.max = -np.inf
+        self.total = 0.0
+
+    @classmethod
+    def of(cls, x: [pd.Series, np.ndarray], lo: float, hi: float, bins: int) -> "SDSketch":
+        """Sketch of a whole sample"""
+        return cls(lo, hi, bins).update(x)
+
+    def update(self, x: [pd.Series, np.ndarray]) -> "SDSketch":
+        """Adds the values of \\code{x}"""
+        values = np.ascontiguousarray(x, dtype=float).ravel()
+        if values.shape[0] == 0:
+            return self
+        if np.isnan(values).any():
+            raise Exception("x contains NaN")
+        _sketch_update(self.edges, self.counts, self.m1, self.m2, values)
+        self.min = min(self.min, values.min())
+        self.max = max(self.max, values.max())
+        self.total += values.sum()
+        return self
+
+    @property
+    def n(self) -> int:
+        return int(self.counts.sum())
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.n
+
+    def states(self, T: float) -> np.ndarray:
+        """Moments at the edges and at \\code{T} (>= every value), see \\code{_sketch_states}"""
+        return _sketch_states(self.edges, self.counts, self.m1, self.m2, T)
+
+
+def _curve(states: np.ndarray, n: int, degree: int, ratio: bool) -> np.ndarray:
+    """LPM (ratio) curve at the support points of \\code{states}"""
+    if degree == 0:
+        return states[1] / n
+    if degree == 2:
+        return states[3] / n
+    lpm = states[2] / n
+    if ratio:
+        with np.errstate(invalid="ignore", divide="ignore"):
+            lpm = lpm / (np.maximum(states[4], 0.0) / n + lpm)
+    return lpm
+
+
+def _direction(
+    edges: np.ndarray,
+    states: tuple,
+    curves: tuple,
+    sizes: tuple,
+    below: bool,
+    degree: int,
+    ratio: bool,
+    raw: [tuple, None],
+) -> tuple:
+    """
+    Does the x curve stay below the y curve?  Decided at the grid points, and within the bins
+    where the bounds cannot tell from the raw samples \\code{raw} (\\code{None}: no escalation)
+
+    Returns (first violation point or NaN, curves differ, error bound, bins tested exactly)
+    """
+    (lx, ly), support = curves, states[0][0]
+    diff = lx - ly
+    # relative tolerance: a difference within rounding at an edge decides nothing
+    tol = 1e-12 * max(1.0, np.nanmax(np.abs(lx)), np.nanmax(np.abs(ly)))
+    violation = diff > tol
+    not_equal = bool((diff != 0).any())
+    escalated = 0
+    if violation.any():
+        # CDF and LPM 1 are linear between sample points: a violation at an edge is one at the
+        # sample point below it.  Not so for LPM 2 and the LPM ratio: the bins around the
+        # violating edges are tested exactly, a few edges first, or without the raw samples
+        # left to the bounds below
+        if degree == 0 or (degree == 1 and not ratio):
+            return support[np.argmax(violation)], True, 0.0, 0
+        edges_violated = np.nonzero(violation)[0]
+        start, count = 0, 1
+        while raw is not None and start < edges_violated.shape[0]:
+            bins = np.zeros(support.shape[0], dtype=bool)
+            around = edges_violated[start : start + count]
+            bins[around] = True
+            bins[np.minimum(around + 1, support.shape[0] - 1)] = True
+            point, _ = _test_bins(edges, states, sizes, degree, ratio, tol, raw, bins)
+            escalated += int(bins.sum())
+            if not np.isnan(point):
+                return point, True, 0.0, escalated
+            start, count = start + count, 4 * count
+    # monotone curves: within bin b, x <= x(right edge) and y >= y(left edge)
+    gap = np.empty(support.shape[0])
+    gap[1:] = lx[1:] - ly[:-1]
+    gap[0] = lx[0] if below else -np.inf
+    ambiguous = gap > 0
+    near = diff > 0
+    ambiguous |= near
+    ambiguous[1:] |= near[:-1]
+    if not ambiguous.any():
+        return np.nan, not_equal, 0.0, escalated
+    if raw is None:
+        return np.nan, not_equal, float(np.nanmax(gap[ambiguous])), 0
+    point, differ = _test_bins(edges, states, sizes, degree, ratio, tol, raw, ambiguous)
+    return point, not_equal or differ, 0.0, escalated + int(ambiguous.sum())
+
+
+def _test_bins(
+    edges: np.ndarray,
+    states: tuple,
+    sizes: tuple,
+    degree: int,
+    ratio: bool,
+    tol: float,
+    raw: tuple,
+    bins: np.ndarray,
+) -> tuple:
+    """Exact test within the flagged bins, from the raw samples"""
+    xs = np.sort(_select_bins(edges, raw[0], bins))
+    ys = np.sort(_select_bins(edges, raw[1], bins))
+    support, bins = states[0][0], np.nonzero(bins)[0]
+    return _escalate(xs, ys, support, bins, states[0], states[1], *sizes, degree, ratio, tol)
+
+
+def NNS_SD_approx(
+    x: [pd.Series, np.ndarray, SDSketch],
+    y: [pd.Series, np.ndarray, SDSketch],
+    degree: int,
+    type_cdf: str = "discrete",
+    bins: int = 4096,
+    escalate: bool = True,
+) -> dict:
+    r"""
+    NNS SD Test on a histogram grid
+
+    Approximate \link{NNS_SD} for very large samples: LPM curves are computed at the edges of a
+    grid of \code{bins} equal bins from one streaming pass per sample (\link{SDSketch}).  A curve
+    above the other at an edge is a violation; otherwise the curves can only cross inside a bin
+    where one curve at its right edge is above the other at its left edge.  The largest such gap
+    is the error bound of the decision; with \code{escalate = True} those bins (near ties) are
+    tested exactly from the samples, and the decision is the one of \link{NNS_SD}.
+
+    @param x a numeric vector, or an \link{SDSketch}.
+    @param y a numeric vector, or an \link{SDSketch} on the grid of \code{x}.
+    @param degree integer; 1, 2 or 3 (FSD, SSD, TSD).
+    @param type_cdf options: ("discrete", "continuous"); \code{"discrete"} (default) selects the type
+        of CDF for \code{degree = 1}.
+    @param bins integer; number of bins of the grid, over the range of \code{x} and \code{y}
+        (ignored for sketches).
+    @param escalate logical; \code{True} (default) tests the ambiguous bins exactly (vectors
+        only).
+    @return Returns the dict of \link{NNS_SD} (curves at the grid points), plus
+        \code{"x.error.bound"}: largest excess of the x curve over the y curve the grid cannot
+        exclude (0 when the decision is exact), \code{"y.error.bound"} conversely, and
+        \code{"escalated"}: number of bins tested exactly.
+    @examples
+    x = np.random.randn(10 ** 7) + 0.05 ; y = np.random.randn(10 ** 7)
+    ret = NNS_SD_approx(x, y, 2)
+    ret["result"], ret["x.error.bound"], ret["escalated"]
+    """
+    type_cdf = type_cdf.lower()
+    if type_cdf not in ["discrete", "continuous"]:
+        raise Exception("type needs to be either 'discrete' or 'continuous'")
+    if degree not in [1, 2, 3]:
+        raise Exception("degree needs to be 1, 2, or 3")
+    lpm_degree = (0 if type_cdf == "discrete" else 1) if degree == 1 else degree - 1
+    ratio = degree == 1
+
+    if isinstance(x, SDSketch) or isinstance(y, SDSketch):
+        if not (isinstance(x, SDSketch) and isinstance(y, SDSketch)):
+            raise Exception("x and y need to be both vectors or both sketches")
+        if not np.array_equal(x.edges, y.edges):
+            raise Exception("x and y sketches need to share the same grid")
+        sx, sy, raw = x, y, None
+        x_mean, y_mean = sx.mean, sy.mean
+    else:
+        x = np.ascontiguousarray(x, dtype=float).ravel()
+        y = np.ascontiguousarray(y, dtype=float).ravel()
+        if x.shape[0] == 0 or y.shape[0] == 0:
+            raise Exception("x and y need at least one value")
+        lo, hi = min(np.min(x), np.min(y)), max(np.max(x), np.max(y))
+        if np.isnan(lo) or np.isnan(hi):
+            raise Exception("x and y contain NaN")
+        edges = _grid(lo, hi, bins)
+        sx = SDSketch.of(x, edges[0], edges[-1], bins)
+        sy = SDSketch.of(y, edges[0], edges[-1], bins)
+        raw = (x, y) if escalate else None
+        x_mean, y_mean = np.mean(x), np.mean(y)
+
+    T = max(sx.edges[-1], sx.max, sy.max)
+    states = (sx.states(T), sy.states(T))
+    x_curve = _curve(states[0], sx.n, lpm_degree, ratio)
+    y_curve = _curve(states[1], sy.n, lpm_degree, ratio)
+    below = min(sx.min, sy.min) < sx.edges[0]
+    sizes = (sx.n, sy.n)
+    x_point, x_differ, x_bound, x_escalated = _direction(
+        sx.edges, states, (x_curve, y_curve), sizes, below, lpm_degree, ratio, raw
+    )
+    y_point, y_differ, y_bound, y_escalated = _direction(
+        sx.edges,
+        states[::-1],
+        (y_curve, x_curve),
+        sizes[::-1],
+        below,
+        lpm_degree,
+        ratio,
+        raw[::-1] if raw is not None else None,
+    )
+    not_equal = x_differ or y_differ
+    x_dominates = np.isnan(x_point) and sx.min >= sy.min and not_equal
+    y_dominates = np.isnan(y_point) and sy.min >= sx.min and not_equal
+    if degree > 1:
+        x_dominates = x_dominates and x_mean >= y_mean
+        y_dominates = y_dominates and y_mean >= x_mean
+    name = _SD_NAMES[degree]
+    if x_dominates:
+        result = f"X {name} Y"
+    elif y_dominates:
+        result = f"Y {name} X"
+    else:
+        result = f"NO {name} EXISTS"
+    return {
+        "result": result,
+        "x.dominates": bool(x_dominates),
+        "y.dominates": bool(y_dominates),
+        "degree": degree,
+        "support": states[0][0],
+        "x.curve": x_curve,
+        "y.curve": y_curve,
+        "x.violation": x_point,
+        "y.violation": y_point,
+        "x.error.bound": x_bound,
+        "y.error.bound": y_bound,
+        "escalated": x_escalated + y_escalated,
+    }
+
+
+def _grid_columns(values: np.ndarray, bins: int, degree: int, ratio: bool) -> tuple:
+    """(edges, sketches, curves) of the columns of \\code{values} on one grid over their range"""
+    edges = _grid(np.min(values), np.max(values), bins)
+    sketches = [
+        SDSketch.of(values[:, c], edges[0], edges[-1], bins) for c in range(values.shape[1])
+    ]
+    curves = np.array([_curve(sk.states(edges[-1]), sk.n, degree, ratio) for sk in sketches])
+    return edges, sketches, curves
+
+
+def _grid_dominates(
+    grid: tuple, values: np.ndarray, i: int, j: int, degree: int, ratio: bool
+) -> bool:
+    """Column \\code{i} curve below column \\code{j} curve, and different (exact near ties)"""
+    edges, sketches, curves = grid
+    if degree == 0 or (degree == 1 and not ratio):
+        # violations at the edges are final: cheap rejection before the states
+        scale = max(1.0, np.abs(curves[i]).max(), np.abs(curves[j]).max())
+        if (curves[i] - curves[j] > 1e-12 * scale).any():
+            return False
+    states = (sketches[i].states(edges[-1]), sketches[j].states(edges[-1]))
+    sizes = (sketches[i].n, sketches[j].n)
+    raw = (np.ascontiguousarray(values[:, i]), np.ascontiguousarray(values[:, j]))
+    point, differ, _, _ = _direction(
+        edges, states, (curves[i], curves[j]), sizes, False, degree, ratio, raw
+    )
+    return bool(np.isnan(point) and differ)
+
+
+__all__ = ["NNS_SD_approx", "SDSketch"]
@@ -0,0 +1,228 @@
+# -*- coding: utf-8 -*-
+import pandas as pd
+import numpy as np
+import numba
+from .Internal_Functions import _plot_enabled
+from .Partial_Moments import LPM, LPM_ratio
+from .Sort_Cache import sorted_union, sorted_values
+
+_SD_NAMES = {1: "FSD", 2: "SSD", 3: "TSD"}
+
+
+# error_model="numpy": 0 / 0 is NaN, as with the numpy arrays of the LPM path
+@numba.jit(nopython=True, nogil=True, error_model="numpy")
+def _sd_curves(x_sort: np.ndarray, y_sort: np.ndarray, degree: int, ratio: bool) -> tuple:
+    """
+    LPM curves of two sorted samples over their combined support, in one merge sweep
+
+    Same moment updates as the uni-directional sweep (\\code{_sd_sweep}), without early exit.
+    Returns (support, curve x, curve y, first index with x > y, first index with y > x,
+    curves all equal); indices are -1 when there is no violation.
+    """
+    nx, ny = x_sort.shape[0], y_sort.shape[0]
+    support = np.empty(nx + ny)
+    lx_curve = np.empty(nx + ny)
+    ly_curve = np.empty(nx + ny)
+    x_first = y_first = -1
+    all_equal = True
+    i = j = k = 0
+    cx = cy = 0
+    a1x = a1y = a2x = a2y = 0.0
+    t = min(x_sort[0], y_sort[0])
+    u1x = u1y = 0.0
+    if ratio and degree == 1:
+        for m in range(nx):
+            u1x += x_sort[m] - t
+        for m in range(ny):
+            u1y += y_sort[m] - t
+    while i < nx or j < ny:
+        if i < nx and j < ny:
+            t_next = min(x_sort[i], y_sort[j])
+        elif i < nx:
+            t_next = x_sort[i]
+        else:
+            t_next = y_sort[j]
+        d = t_next - t
+        if d > 0:
+            a2x += 2.0 * d * a1x + d * d * cx
+            a2y += 2.0 * d * a1y + d * d * cy
+            a1x += d * cx
+            a1y += d * cy
+            u1x -= d * (nx - cx)
+            u1y -= d * (ny - cy)
+        t = t_next
+        while i < nx and x_sort[i] == t:
+            i += 1
+        while j < ny and y_sort[j] == t:
+            j += 1
+        cx, cy = i, j
+        if cx == nx:
+            u1x = 0.0
+        if cy == ny:
+            u1y = 0.0
+
+        if degree == 0:
+            lx, ly = cx / nx, cy / ny
+        elif degree == 1:
+            lx, ly = a1x / nx, a1y / ny
+            if ratio:
+                lx = lx / (u1x / nx + lx)
+                ly = ly / (u1y / ny + ly)
+        else:
+            lx, ly = a2x / nx, a2y / ny
+        if lx > ly and x_first < 0:
+            x_first = k
+        if ly > lx and y_first < 0:
+            y_first = k
+        if not lx == ly:
+            all_equal = False
+        support[k], lx_curve[k], ly_curve[k] = t, lx, ly
+        k += 1
+    return support[:k], lx_curve[:k], ly_curve[:k], x_first, y_first, all_equal
+
+
+def _first(mask: np.ndarray) -> int:
+    return int(np.argmax(mask)) if mask.any() else -1
+
+
+def NNS_SD(
+    x: [pd.Series, np.ndarray],
+    y: [pd.Series, np.ndarray],
+    degree: int,
+    type_cdf: str = "discrete",
+    bins: [int, None] = None,
+) -> dict:
+    r"""
+    NNS SD Test (compute only)
+
+    Bi-directional test of first, second or third degree stochastic dominance using lower partial
+    moments, both directions from one pass over the combined support.  Same results as
+    \link{NNS_FSD}, \link{NNS_SSD} and \link{NNS_TSD}, without plotting (see \link{plot_SD}).
+
+    @param x a numeric vector.
+    @param y a numeric vector.
+    @param degree integer; 1, 2 or 3 (FSD, SSD, TSD).
+    @param type_cdf options: ("discrete", "continuous"); \code{"discrete"} (default) selects the type
+        of CDF for \code{degree = 1}.
+    @param bins integer; \code{None} (default) tests exactly, else on a grid of \code{bins} bins
+        with exact tests near ties only, see \link{NNS_SD_approx}.
+    @return Returns a dict:
+        \code{"result"}: \code{"X FSD Y"}, \code{"Y FSD X"} or \code{"NO FSD EXISTS"} (SSD, TSD),
+        \code{"x.dominates"}, \code{"y.dominates"}: logical,
+        \code{"support"}: combined sorted support of \code{x} and \code{y},
+        \code{"x.curve"}, \code{"y.curve"}: CDF (\code{degree = 1}) or LPM of degree 1, 2,
+        \code{"x.violation"}: first support point where the x curve is above the y curve
+        (\code{NaN} if none), \code{"y.violation"} conversely.
+    @examples
+    x = np.random.randn(100) ; y = np.random.randn(100)
+    ret = NNS_SD(x, y, 2)
+    ret["result"], ret["x.violation"]
+    plot_SD(ret)
+    """
+    type_cdf = type_cdf.lower()
+    if type_cdf not in ["discrete", "continuous"]:
+        raise Exception("type needs to be either 'discrete' or 'continuous'")
+    if degree not in [1, 2, 3]:
+        raise Exception("degree needs to be 1, 2, or 3")
+    if bins is not None:
+        from .SD_Approx import NNS_SD_approx
+
+        return NNS_SD_approx(x, y, degree, type_cdf, bins)
+    lpm_degree = (0 if type_cdf == "discrete" else 1) if degree == 1 else degree - 1
+    ratio = degree == 1
+
+    x_sort = sorted_values(np.asarray(x, dtype=float))
+    y_sort = sorted_values(np.asarray(y, dtype=float))
+    if min(x_sort.shape[0], y_sort.shape[0]) > 0 and not np.isnan(x_sort[-1] + y_sort[-1]):
+        support, x_curve, y_curve, x_first, y_first, all_equal = _sd_curves(
+            x_sort, y_sort, lpm_degree, ratio
+        )
+    else:
+        # NaN: LPM evaluated at every point of the combined support
+        support = sorted_union(x, y)
+        if ratio:
+            x_curve, y_curve = LPM_ratio(lpm_degree, support, x), LPM_ratio(lpm_degree, support, y)
+        else:
+            x_curve, y_curve = LPM(lpm_degree, support, x), LPM(lpm_degree, support, y)
+        x_first, y_first = _first(x_curve > y_curve), _first(y_curve > x_curve)
+        all_equal = np.equal(x_curve, y_curve).all()
+
+    x_dominates = x_first < 0 and x_sort[0] >= y_sort[0] and not all_equal
+    y_dominates = y_first < 0 and y_sort[0] >= x_sort[0] and not all_equal
+    if degree > 1:
+        x_mean, y_mean = np.mean(x), np.mean(y)
+        x_dominates = x_dominates and x_mean >= y_mean
+        y_dominates = y_dominates and y_mean >= x_mean
+    name = _SD_NAMES[degree]
+    if x_dominates:
+        result = f"X {name} Y"
+    elif y_dominates:
+        result = f"Y {name} X"
+    else:
+        result = f"NO {name} EXISTS"
+    return {
+        "result": result,
+        "x.dominates": bool(x_dominates),
+        "y.dominates": bool(y_dominates),
+        "degree": degree,
+        "support": support,
+        "x.curve": x_curve,
+        "y.curve": y_curve,
+        "x.violation": support[x_first] if x_first >= 0 else np.nan,
+        "y.violation": support[y_first] if y_first >= 0 else np.nan,
+    }
+
+
+def _downsample(n: int, max_points: int, keep: list) -> np.ndarray:
+    if n <= max_points:
+        return np.arange(n)
+    idx = np.round(np.linspace(0, n - 1, max_points)).astype(int)
+    return np.unique(np.concatenate([idx, [i for i in keep if i >= 0]]).astype(int))
+
+
+def plot_SD(sd: dict, max_points: int = 2000, ax=None):
+    r"""
+    Plot of a stochastic dominance test
+
+    Draws the curves of \link{NNS_SD}; large samples are downsampled to about \code{max_points}
+    points (the violation points are always kept).
+
+    @param sd dict returned by \link{NNS_SD}.
+    @param max_points integer; maximum number of points drawn per curve.
+    @param ax matplotlib axes; \code{None} (default) draws on the current axes.
+    @return Returns the matplotlib axes.
+    """
+    import matplotlib.pyplot as plt
+
+    if ax is None:
+        ax = plt.gca()
+    support = sd["support"]
+    keep = [
+        int(np.searchsorted(support, sd[k])) if not np.isnan(sd[k]) else -1
+        for k in ("x.violation", "y.violation")
+    ]
+    idx = _downsample(support.shape[0], max_points, keep)
+    ax.set_title(_SD_NAMES[sd["degree"]])
+    ax.set_ylabel("Area of Cumulative Distribution")
+    ax.plot(support[idx], sd["x.curve"][idx], label="<Combined Sort> vs <LPM X Sort>")
+    ax.plot(support[idx], sd["y.curve"][idx], label="<Combined Sort> vs <LPM Y Sort>")
+    ax.legend()
+    return ax
+
+
+def _NNS_SD_plot(
+    x: [pd.Series, np.ndarray],
+    y: [pd.Series, np.ndarray],
+    degree: int,
+    type_cdf: str,
+    use_plot: [bool, None],
+    bins: [int, None] = None,
+) -> str:
+    """NNS_FSD / NNS_SSD / NNS_TSD: result of \\code{NNS_SD}, plotted if requested"""
+    sd = NNS_SD(x, y, degree, type_cdf, bins)
+    if _plot_enabled(use_plot):
+        plot_SD(sd)
+    return sd["result"]
+
+
+__all__ = ["NNS_SD", "plot_SD"]
@@ -1,8 +1,81 @@
 # -*- coding: utf-8 -*-
 import pandas as pd
 import numpy as np
-from .Uni_SD_Routines import NNS_FSD_uni, NNS_SSD_uni, NNS_TSD_uni
+import numba
+from .Uni_SD_Routines import NNS_FSD_uni, NNS_SSD_uni, NNS_TSD_uni, _sd_sweep
 from .Partial_Moments import LPM
+from .SD_Matrix import _sd_kernel_args, _sort_columns
+from .SD_Approx import _grid_columns, _grid_dominates
+
+
+@numba.jit(parallel=True, nopython=True, nogil=True)
+def _sd_hits(
+    sorted_columns: np.ndarray,
+    bases: np.ndarray,
+    challenger: int,
+    degree: int,
+    ratio: bool,
+    chunk: int,
+) -> np.ndarray:
+    """
+    Tests of \\code{bases} against \\code{challenger}, in parallel chunks up to the first chunk
+    with a dominating base: 1 dominates, 0 does not, -1 not tested
+    """
+    hits = np.full(bases.shape[0], -1, dtype=np.int8)
+    for start in range(0, bases.shape[0], chunk):
+        stop = min(start + chunk, bases.shape[0])
+        for p in numba.prange(start, stop):
+            hits[p] = _sd_sweep(sorted_columns[bases[p]], sorted_columns[challenger], degree, ratio)
+        for p in range(start, stop):
+            if hits[p] == 1:
+                return hits
+    return hits
+
+
+@numba.jit(parallel=True, nopython=True, nogil=True)
+def _update_sorted(
+    sorted_columns: np.ndarray, removed: np.ndarray, added: np.ndarray
+) -> np.ndarray:
+    """Sorted columns after removing the rows \\code{removed} and adding the rows \\code{added}"""
+    k, n = sorted_columns.shape
+    m, a = removed.shape[0], added.shape[0]
+    ret = np.empty((k, n - m + a))
+    for c in numba.prange(k):
+        rem = np.sort(removed[:, c])
+        add = np.sort(added[:, c])
+        r = q = o = 0
+        for i in range(n):
+            v = sorted_columns[c, i]
+            if r < m and v == rem[r]:
+                r += 1
+                continue
+            while q < a and add[q] < v:
+                ret[c, o] = add[q]
+                o += 1
+                q += 1
+            ret[c, o] = v
+            o += 1
+        while q < a:
+            ret[c, o] = add[q]
+            o += 1
+            q += 1
+    return ret
+
+
+def _screen(bases: np.ndarray, challenger: int, mins, maxs, means, degree: int) -> np.ndarray:
+    """Bases passing the necessary conditions to dominate the challenger"""
+    keep = mins[bases] >= mins[challenger]
+    if degree == 1:
+        keep &= maxs[bases] >= maxs[challenger]
+    else:
+        keep &= means[bases] >= means[challenger]
+    return np.ascontiguousarray(bases[keep])
+
+
+def _print_status(i: int, n: int) -> None:
+    print(f"Checking {i} of {n}\r", end="")
+    if i == n:
+        print("                                        ", end="\n")
 
 
 def NNS_SD_efficient_set(
@@ -10,7 +83,35 @@ def NNS_SD_efficient_set(
     degree: int,
     type_first_degree: str = "discrete",
     status: bool = True,
+    progress: [callable, None] = None,
+    bins: [int, None] = None,
 ) -> [list, np.ndarray]:
+    r"""
+    NNS SD Efficient Set
+
+    Determines the set of stochastic dominant variables for various degrees.
+
+    Columns are ranked by LPM(1, max(x)), then each challenger is tested against every member of
+    the current efficient set.  Sorted columns (and minimums, maximums, means) are computed once up
+    front; the tests against the set run in parallel.
+    @param x a numeric matrix or data frame.
+    @param degree numeric options: (1, 2, 3); Degree of stochastic dominance test from (1, 2 or 3).
+    @param type_first_degree options: ("discrete", "continuous"); \code{"discrete"} (default) for
+        discrete CDF of first degree test.
+    @param status logical; \code{True} (default) prints the current challenger.
+    @param progress callable \code{progress(i, n)} called before challenger \code{i} of \code{n}
+        is tested (replaces the \code{status} print); raising from it stops the computation.
+    @param bins integer; \code{None} (default) tests exactly, else columns are summarized on a
+        common grid of \code{bins} bins (no sort) and tested as \link{NNS_SD_approx} (exact near
+        ties, same result).
+    @return Returns set of stochastic dominant variable names (column indices for arrays).
+    @author Fred Viole, OVVO Financial Systems
+    @references Viole, F. and Nawrocki, D. (2016) "LPM Density Functions for the Computation of the
+        SD Efficient Set." Journal of Mathematical Finance, 6, 105-126.
+    @examples
+    x = pd.DataFrame(np.random.rand(100, 5))
+    NNS_SD_efficient_set(x, 1, status=False, progress=lambda i, n: None)
+    """
     type_first_degree = type_first_degree.lower()
 
     if len(x.shape) != 2:
@@ -22,72 +123,249 @@ def NNS_SD_efficient_set(
     if degree not in [1, 2, 3]:
         raise Exception("degree needs to be 1, 2, or 3")
 
+    if progress is None and status:
+        progress = _print_status
+
     n = x.shape[1]
     max_target = np.max(np.max(x))
+    values = x.values if isinstance(x, pd.DataFrame) else x
+    LPM_order = [LPM(1, max_target, values[:, i]) for i in range(n)]
+    LPM_order_argsort = np.argsort(LPM_order)
+    final_ranked = values[:, LPM_order_argsort]
 
-    Dominated_set = []
-    current_base = []
-    if isinstance(x, pd.DataFrame):
-        LPM_order = [LPM(1, max_target, x.values[:, i]) for i in range(n)]
-        LPM_order_argsort = np.argsort(LPM_order)
-        final_ranked = x.values[:, LPM_order_argsort]
+    # once, up front: sorted columns (or grid curves) and the necessary conditions of the tests
+    # (the challenger can only be dominated by a base with min >= its min, and max >= (FSD) or
+    # mean >= (SSD, TSD))
+    final_ranked = np.asarray(final_ranked, dtype=float)
+    lpm_degree, ratio = _sd_kernel_args(degree, type_first_degree)
+    has_nan = np.isnan(final_ranked).any()
+    grid = None
+    if bins is not None and not has_nan:
+        grid = _grid_columns(final_ranked, bins, lpm_degree, ratio)
+        mins = np.array([sk.min for sk in grid[1]])
+        maxs = np.array([sk.max for sk in grid[1]])
     else:
-        LPM_order = [LPM(1, max_target, x[:, i]) for i in range(n)]
-        LPM_order_argsort = np.argsort(LPM_order)
-        final_ranked = x[:, LPM_order_argsort]
-    current_base.append(0)
-    for i in range(n - 1):
-        if status:
-            print(f"Checking {i+1} of {n-1}\r", end="")
-            if i == (n - 1):
-                print("                                        ", end="\n")
-        base, challenger = final_ranked[:, current_base[-1]], final_ranked[:, i + 1]
-        sd_test = 0
-        if degree == 1:
-            sd_test = NNS_FSD_uni(base, challenger, type_test=type_first_degree)
-        elif degree == 2:
-            sd_test = NNS_SSD_uni(base, challenger)
-        elif degree == 3:
-            sd_test = NNS_TSD_uni(base, challenger)
-        if sd_test == 1:
-            Dominated_set.append(i + 1)
-        elif sd_test == 0:
-            sd_found = False
-            for j in current_base:
-                base = final_ranked[:, j]
-                new_base_sd_test = 0
-                if degree == 1:
-                    new_base_sd_test = NNS_FSD_uni(base, challenger, type_test=type_first_degree)
-                elif degree == 2:
-                    new_base_sd_test = NNS_SSD_uni(base, challenger)
-                elif degree == 3:
-                    new_base_sd_test = NNS_TSD_uni(base, challenger)
-                if new_base_sd_test != 0:
-                    sd_found = True
-                    Dominated_set.append(i + 1)
-                    break
-            if not sd_found:
-                current_base.append(i + 1)
-
-    if len(Dominated_set) > 0:
-        if isinstance(x, pd.DataFrame):
-            return list(
-                x.columns[
-                    LPM_order_argsort[
-                        [i for i in range(len(LPM_order_argsort)) if i not in Dominated_set]
-                    ]
-                ]
+        sorted_columns = _sort_columns(final_ranked)
+        mins, maxs = sorted_columns[:, 0], sorted_columns[:, -1]
+    means = np.array([np.mean(final_ranked[:, i]) for i in range(n)]) if degree > 1 else None
+    chunk = 4 * numba.get_num_threads()
+
+    dominated = np.zeros(n, dtype=bool)
+    current_base = np.zeros(n, dtype=np.int64)  # current_base[0] = 0
+    n_base = 1
+    for i in range(1, n):
+        if progress is not None:
+            progress(i, n - 1)
+        # latest bases first: closest in LPM order, most likely to dominate
+        bases = current_base[:n_base][::-1]
+        if has_nan:
+            # NaN: uni-directional tests (LPM path)
+            sd_found = any(
+                _sd_uni(final_ranked[:, j], final_ranked[:, i], degree, type_first_degree)
+                for j in bases
+            )
+        elif grid is not None:
+            bases = _screen(bases, i, mins, maxs, means, degree)
+            sd_found = any(
+                _grid_dominates(grid, final_ranked, j, i, lpm_degree, ratio) for j in bases
             )
         else:
-            return LPM_order_argsort[
-                [i for i in range(len(LPM_order_argsort)) if i not in Dominated_set]
-            ]
-    elif isinstance(x, pd.DataFrame):
-        return list(x.columns[LPM_order_argsort])
-    else:
-        return LPM_order_argsort
+            bases = _screen(bases, i, mins, maxs, means, degree)
+            sd_found = (
+                bases.shape[0] > 0
+                and (_sd_hits(sorted_columns, bases, i, lpm_degree, ratio, chunk) == 1).any()
+            )
+        if sd_found:
+            dominated[i] = True
+        else:
+            current_base[n_base] = i
+            n_base += 1
+
+    efficient = LPM_order_argsort[~dominated]
+    if isinstance(x, pd.DataFrame):
+        return list(x.columns[efficient])
+    return efficient
+
+
+class SDEfficientSet:
+    r"""
+    Incremental NNS SD Efficient Set
+
+    Keeps the efficient set of \link{NNS_SD_efficient_set} up to date while columns are added or
+    removed and rows are appended or expire (rolling window).  The pairwise test results of the
+    sequential algorithm are remembered per column (the base that dominates it, the bases that do
+    not), so after a change only the pairs the algorithm had not tested yet are run.  Appending
+    or expiring rows changes every column: sorted columns are updated in place (merge, no
+    re-sort) and the remembered results are dropped.
+
+    @param x a numeric matrix or data frame, one variable per column.
+    @param degree numeric options: (1, 2, 3); Degree of stochastic dominance test.
+    @param type_first_degree options: ("discrete", "continuous"); \code{"discrete"} (default) for
+        discrete CDF of first degree test.
+    @param window integer; number of rows kept by \code{append_rows}, \code{None} (default) keeps
+        them all.
+    @examples
+    sd = SDEfficientSet(x, 2, window=250)
+    sd.efficient_set()  # same as NNS_SD_efficient_set(x, 2)
+    sd.append_rows(new_rows)
+    sd.add_columns(new_funds)
+    sd.efficient_set()
+    """
+
+    def __init__(
+        self,
+        x: [pd.DataFrame, np.ndarray],
+        degree: int,
+        type_first_degree: str = "discrete",
+        window: [int, None] = None,
+    ):
+        type_first_degree = type_first_degree.lower()
+        if len(x.shape) != 2:
+            raise Exception(f"x shape should contains 2 elements (dataframe like): {x.shape}")
+        if type_first_degree not in ["discrete", "continuous"]:
+            raise Exception("type_first_degree needs to be either 'discrete' or 'continuous'")
+        if degree not in [1, 2, 3]:
+            raise Exception("degree needs to be 1, 2, or 3")
+        self.degree = degree
+        self.type_first_degree = type_first_degree
+        self.window = window
+        self.tests = 0  # pairs run through the dominance test
+        self._frame = isinstance(x, pd.DataFrame)
+        self.columns = list(x.columns) if self._frame else list(range(x.shape[1]))
+        self._values = self._check(x.values if self._frame else x)
+        self._ids = np.arange(self._values.shape[1])
+        self._next_id = self._values.shape[1]
+        self._sorted = _sort_columns(self._values)
+        self._reset_results()
+        if window is not None and self._values.shape[0] > window:
+            self.expire_rows(self._values.shape[0] - window)
+
+    @staticmethod
+    def _check(values) -> np.ndarray:
+        values = np.asarray(values, dtype=float)
+        if np.isnan(values).any():
+            raise Exception("x contains NaN")
+        return values
+
+    def _reset_results(self) -> None:
+        self._dominated_by = {}  # column id -> id of a column dominating it
+        self._negatives = {}  # column id -> ids of columns known not to dominate it
+        self._result = None
+
+    @property
+    def data(self) -> [pd.DataFrame, np.ndarray]:
+        """Current data, as given to \\link{NNS_SD_efficient_set}"""
+        if self._frame:
+            return pd.DataFrame(self._values, columns=self.columns)
+        return self._values
+
+    def add_columns(self, x: [pd.DataFrame, np.ndarray]) -> None:
+        """Adds variables (same rows as the current data); nothing already tested is retested"""
+        if self._frame:
+            names, values = list(x.columns), x.values
+        else:
+            values = np.asarray(x).reshape(self._values.shape[0], -1)
+            names = list(range(len(self.columns), len(self.columns) + values.shape[1]))
+        values = self._check(values)
+        if values.shape[0] != self._values.shape[0]:
+            raise Exception(f"x should have {self._values.shape[0]} rows: {values.shape}")
+        self.columns += names
+        self._values = np.hstack([self._values, values])
+        self._sorted = np.vstack([self._sorted, _sort_columns(values)])
+        ids = np.arange(self._next_id, self._next_id + values.shape[1])
+        self._ids = np.concatenate([self._ids, ids])
+        self._next_id += values.shape[1]
+        self._result = None
+
+    def remove_columns(self, columns: list) -> None:
+        """Removes variables (names for data frames, positions for arrays)"""
+        if self._frame:
+            positions = [self.columns.index(c) for c in columns]
+        else:
+            positions = list(columns)
+        keep = np.ones(len(self.columns), dtype=bool)
+        keep[positions] = False
+        for i in self._ids[~keep]:
+            self._dominated_by.pop(i, None)
+            self._negatives.pop(i, None)
+        if self._frame:
+            self.columns = [c for c, k in zip(self.columns, keep) if k]
+        else:
+            self.columns = list(range(int(keep.sum())))
+        self._values = self._values[:, keep]
+        self._sorted = self._sorted[keep]
+        self._ids = self._ids[keep]
+        self._result = None
+
+    def append_rows(self, rows: [pd.DataFrame, np.ndarray], expire: int = 0) -> None:
+        """Appends observations of every variable, expiring the \\code{expire} oldest rows (and
+        rows beyond \\code{window})"""
+        rows = self._check(rows.values if isinstance(rows, pd.DataFrame) else rows)
+        rows = rows.reshape(-1, self._values.shape[1])
+        n = self._values.shape[0] + rows.shape[0]
+        if self.window is not None:
+            expire = max(expire, n - self.window)
+        expire = min(expire, self._values.shape[0])
+        self._sorted = _update_sorted(self._sorted, self._values[:expire], rows)
+        self._values = np.vstack([self._values[expire:], rows])
+        self._reset_results()
+
+    def expire_rows(self, n: int) -> None:
+        """Drops the \\code{n} oldest observations"""
+        self._sorted = _update_sorted(
+            self._sorted, self._values[:n], np.empty((0, self._values.shape[1]))
+        )
+        self._values = self._values[n:]
+        self._reset_results()
+
+    def efficient_set(self) -> [list, np.ndarray]:
+        """Same result as \\link{NNS_SD_efficient_set} on \\code{data}"""
+        if self._result is not None:
+            return list(self._result) if self._frame else self._result.copy()
+        values, ids, k = self._values, self._ids, self._values.shape[1]
+        max_target = np.max(values)
+        LPM_order_argsort = np.argsort([LPM(1, max_target, values[:, i]) for i in range(k)])
+        mins, maxs = self._sorted[:, 0], self._sorted[:, -1]
+        means = np.array([np.mean(values[:, i]) for i in range(k)]) if self.degree > 1 else None
+        lpm_degree, ratio = _sd_kernel_args(self.degree, self.type_first_degree)
+        chunk = 4 * numba.get_num_threads()
+
+        dominated = np.zeros(k, dtype=bool)  # in LPM order
+        current_base = [LPM_order_argsort[0]]  # column positions
+        base_ids = {ids[LPM_order_argsort[0]]}
+        for r in range(1, k):
+            c = LPM_order_argsort[r]
+            cid = ids[c]
+            if self._dominated_by.get(cid) in base_ids:
+                dominated[r] = True
+                continue
+            negatives = self._negatives.setdefault(cid, set())
+            bases = np.array([b for b in current_base[::-1] if ids[b] not in negatives], dtype=int)
+            bases = _screen(bases, c, mins, maxs, means, self.degree)
+            hits = _sd_hits(self._sorted, bases, c, lpm_degree, ratio, chunk)
+            self.tests += int((hits >= 0).sum())
+            negatives.update(ids[bases[hits == 0]])
+            if (hits == 1).any():
+                self._dominated_by[cid] = ids[bases[np.argmax(hits == 1)]]
+                dominated[r] = True
+            else:
+                current_base.append(c)
+                base_ids.add(cid)
+
+        efficient = LPM_order_argsort[~dominated]
+        self._result = [self.columns[i] for i in efficient] if self._frame else efficient
+        return list(self._result) if self._frame else self._result.copy()
+
+
+def _sd_uni(base, challenger, degree: int, type_first_degree: str) -> bool:
+    if degree == 1:
+        return NNS_FSD_uni(base, challenger, type_test=type_first_degree) == 1
+    if degree == 2:
+        return NNS_SSD_uni(base, challenger) == 1
+    return NNS_TSD_uni(base, challenger) == 1
 
 
 __all__ = [
     "NNS_SD_efficient_set",
+    "SDEfficientSet",
 ]
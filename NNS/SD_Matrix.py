@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+import pandas as pd
+import numpy as np
+import numba
+from .Uni_SD_Routines import _sd_sweep
+
+
+@numba.jit(parallel=True, nopython=True, nogil=True)
+def _sort_columns(values: np.ndarray) -> np.ndarray:
+    """Sorted columns of a matrix, one contiguous row per column"""
+    ret = np.empty((values.shape[1], values.shape[0]))
+    for c in numba.prange(values.shape[1]):
+        ret[c] = np.sort(values[:, c])
+    return ret
+
+
+def _sd_kernel_args(degree: int, type_first_degree: str) -> tuple:
+    """(LPM degree, ratio) of the merge sweep for an SD degree"""
+    if degree == 1:
+        return (0 if type_first_degree == "discrete" else 1), True
+    return degree - 1, False
+
+
+@numba.jit(parallel=True, nopython=True, nogil=True)
+def _sd_pairs(
+    sorted_columns: np.ndarray, i: np.ndarray, j: np.ndarray, degree: int, ratio: bool
+) -> np.ndarray:
+    ret = np.zeros(i.shape[0], dtype=np.bool_)
+    for p in numba.prange(i.shape[0]):
+        ret[p] = _sd_sweep(sorted_columns[i[p]], sorted_columns[j[p]], degree, ratio) == 1
+    return ret
+
+
+def NNS_SD_matrix(
+    x: [pd.DataFrame, np.ndarray],
+    degree: int,
+    type_first_degree: str = "discrete",
+) -> [pd.DataFrame, np.ndarray]:
+    r"""
+    NNS SD Matrix
+
+    All-pairs stochastic dominance relation between the columns of \code{x}: entry \code{[i, j]}
+    is \code{True} when column \code{i} dominates column \code{j}, same test as \link{NNS_FSD_uni},
+    \link{NNS_SSD_uni} and \link{NNS_TSD_uni}.
+
+    Columns are sorted once; pairs failing the necessary conditions (minimum, plus maximum for
+    \code{degree} 1 and mean for \code{degree} 2 and 3) are discarded for all pairs at once, the
+    remaining pairs are tested in parallel.
+    @param x a numeric matrix or data frame, one variable per column.
+    @param degree integer; 1, 2 or 3 (FSD, SSD, TSD).
+    @param type_first_degree options: ("discrete", "continuous"); \code{"discrete"} (default)
+        selects the type of CDF for \code{degree = 1}.
+    @return Returns a k x k logical matrix (data frame with the columns of \code{x} as index and
+        columns when \code{x} is a data frame).
+    @examples
+    x = pd.DataFrame(np.random.randn(100, 5))
+    NNS_SD_matrix(x, 2)
+    """
+    type_first_degree = type_first_degree.lower()
+    if len(x.shape) != 2:
+        raise Exception(f"x shape should contains 2 elements (dataframe like): {x.shape}")
+    if type_first_degree not in ["discrete", "continuous"]:
+        raise Exception("type_first_degree needs to be either 'discrete' or 'continuous'")
+    if degree not in [1, 2, 3]:
+        raise Exception("degree needs to be 1, 2, or 3")
+
+    values = np.asarray(x.values if isinstance(x, pd.DataFrame) else x, dtype=float)
+    if np.isnan(values).any():
+        raise Exception("x contains NaN")
+    k = values.shape[1]
+    sorted_columns = _sort_columns(values)
+    mins = sorted_columns[:, 0]
+    # necessary conditions, all pairs at once: i can only dominate j if min_i >= min_j, and
+    # max_i >= max_j for FSD (else the CDF of i reaches 1 first), mean_i >= mean_j for SSD / TSD
+    # (means per column, as the uni-directional tests take them)
+    candidates = mins[:, None] >= mins[None, :]
+    if degree == 1:
+        maxs = sorted_columns[:, -1]
+        candidates &= maxs[:, None] >= maxs[None, :]
+    else:
+        means = np.array([np.mean(values[:, c]) for c in range(k)])
+        candidates &= means[:, None] >= means[None, :]
+    np.fill_diagonal(candidates, False)
+    i, j = np.nonzero(candidates)
+
+    lpm_degree, ratio = _sd_kernel_args(degree, type_first_degree)
+    ret = np.zeros((k, k), dtype=bool)
+    if i.shape[0] > 0:
+        ret[i, j] = _sd_pairs(sorted_columns, i, j, lpm_degree, ratio)
+    if isinstance(x, pd.DataFrame):
+        return pd.DataFrame(ret, index=x.columns, columns=x.columns)
+    return ret
+
+
+__all__ = ["NNS_SD_matrix"]
@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+import pandas as pd
+import numpy as np
+import numba
+from .Internal_Functions import _pairwise_sum
+from .SD_Core import _sd_curves
+
+
+@numba.jit(nopython=True, nogil=True)
+def _replace_sorted(a: np.ndarray, old: float, new: float) -> None:
+    """Replaces one occurrence of \\code{old} by \\code{new} in the sorted array \\code{a}"""
+    i = np.searchsorted(a, old)
+    j = np.searchsorted(a, new)
+    if j > i:
+        for p in range(i, j - 1):
+            a[p] = a[p + 1]
+        a[j - 1] = new
+    else:
+        for p in range(i, j, -1):
+            a[p] = a[p - 1]
+        a[j] = new
+
+
+# error_model="numpy": 0 / 0 is NaN, as in the sweep of NNS_SD
+@numba.jit(nopython=True, nogil=True, error_model="numpy")
+def _sd_rolling(
+    x: np.ndarray, y: np.ndarray, window: int, step: int, degree: int, ratio: bool, means: bool
+) -> np.ndarray:
+    """
+    Rows: x dominates, y dominates, largest excess of the x curve over the y curve, conversely;
+    one column per window.  Sorted windows are updated in place (\\code{step} < \\code{window}).
+    """
+    m = (x.shape[0] - window) // step + 1
+    ret = np.empty((4, m))
+    xs = np.sort(x[:window])
+    ys = np.sort(y[:window])
+    for k in range(m):
+        start = k * step
+        if k > 0:
+            if step >= window:
+                xs = np.sort(x[start : start + window])
+                ys = np.sort(y[start : start + window])
+            else:
+                for o in range(step):
+                    _replace_sorted(xs, x[start - step + o], x[start + window - step + o])
+                    _replace_sorted(ys, y[start - step + o], y[start + window - step + o])
+        _, lx, ly, x_first, y_first, all_equal = _sd_curves(xs, ys, degree, ratio)
+        x_dominates = x_first < 0 and xs[0] >= ys[0] and not all_equal
+        y_dominates = y_first < 0 and ys[0] >= xs[0] and not all_equal
+        if means:
+            x_mean = _pairwise_sum(x, start, window) / window
+            y_mean = _pairwise_sum(y, start, window) / window
+            x_dominates = x_dominates and x_mean >= y_mean
+            y_dominates = y_dominates and y_mean >= x_mean
+        ret[0, k] = x_dominates
+        ret[1, k] = y_dominates
+        ret[2, k] = max(np.max(lx - ly), 0.0) if x_first >= 0 else 0.0
+        ret[3, k] = max(np.max(ly - lx), 0.0) if y_first >= 0 else 0.0
+    return ret
+
+
+@numba.jit(parallel=True, nopython=True, nogil=True, error_model="numpy")
+def _sd_rolling_panel(
+    x: np.ndarray, y: np.ndarray, window: int, step: int, degree: int, ratio: bool, means: bool
+) -> np.ndarray:
+    """\\code{_sd_rolling} of every column of \\code{x} against \\code{y}, in parallel"""
+    m = (x.shape[0] - window) // step + 1
+    ret = np.empty((x.shape[1], 4, m))
+    for c in numba.prange(x.shape[1]):
+        ret[c] = _sd_rolling(np.ascontiguousarray(x[:, c]), y, window, step, degree, ratio, means)
+    return ret
+
+
+_ROLLING_FIELDS = ["x.dominates", "y.dominates", "x.margin", "y.margin"]
+
+
+def NNS_SD_rolling(
+    x: [pd.Series, pd.DataFrame, np.ndarray],
+    y: [pd.Series, np.ndarray],
+    degree: int,
+    window: int,
+    type_cdf: str = "discrete",
+    step: int = 1,
+) -> [pd.DataFrame, dict]:
+    r"""
+    NNS SD Rolling
+
+    Stochastic dominance of \code{x} over \code{y}, and conversely, on every rolling window of
+    \code{window} observations: same decisions as \link{NNS_SD} (\link{NNS_FSD}, \link{NNS_SSD},
+    \link{NNS_TSD}) on each window.  Sorted windows are kept up to date as the window moves (one
+    value out, one value in) instead of being sorted again, in compiled code; columns of a panel
+    are tested against the benchmark \code{y} in parallel.
+
+    @param x a numeric vector, or a matrix / data frame with one variable per column (panel).
+    @param y a numeric vector (benchmark), same length as \code{x}.
+    @param degree integer; 1, 2 or 3 (FSD, SSD, TSD).
+    @param window integer; number of observations per window.
+    @param type_cdf options: ("discrete", "continuous"); \code{"discrete"} (default) selects the type
+        of CDF for \code{degree = 1}.
+    @param step integer; windows end every \code{step} observations (1, default: every one).
+    @return Returns, for a vector \code{x}, a data frame with one row per window (indexed by the last
+        observation of the window):
+        \code{"x.dominates"}, \code{"y.dominates"}: logical,
+        \code{"x.margin"}: largest excess of the x curve over the y curve (0 if the x curve is
+        never above, the size of the violation otherwise), \code{"y.margin"} conversely.
+        For a panel, a dict of data frames (windows x columns of \code{x}) with the same keys.
+    @examples
+    ret = NNS_SD_rolling(returns_a, returns_b, 2, 252)
+    ret["x.dominates"].mean()  # share of windows where A SSD B
+    NNS_SD_rolling(fund_returns, benchmark, 2, 252)["x.dominates"]
+    """
+    type_cdf = type_cdf.lower()
+    if type_cdf not in ["discrete", "continuous"]:
+        raise Exception("type needs to be either 'discrete' or 'continuous'")
+    if degree not in [1, 2, 3]:
+        raise Exception("degree needs to be 1, 2, or 3")
+    panel = len(np.shape(x)) == 2
+    x_values = np.asarray(x, dtype=float)
+    y_values = np.ascontiguousarray(y, dtype=float).ravel()
+    if x_values.shape[0] != y_values.shape[0]:
+        raise Exception(
+            f"x and y should have the same length: {x_values.shape[0]}, {y_values.shape[0]}"
+        )
+    if window < 1 or window > y_values.shape[0]:
+        raise Exception(f"window needs to be between 1 and {y_values.shape[0]}")
+    if step < 1:
+        raise Exception("step needs to be a positive integer")
+    if np.isnan(x_values).any() or np.isnan(y_values).any():
+        raise Exception("x and y should not contain NaN")
+    lpm_degree = (0 if type_cdf == "discrete" else 1) if degree == 1 else degree - 1
+    args = (window, step, lpm_degree, degree == 1, degree > 1)
+
+    if isinstance(x, (pd.Series, pd.DataFrame)):
+        index = x.index[window - 1 :: step]
+    elif isinstance(y, pd.Series):
+        index = y.index[window - 1 :: step]
+    else:
+        index = np.arange(window - 1, y_values.shape[0], step)
+    if not panel:
+        ret = _sd_rolling(np.ascontiguousarray(x_values.ravel()), y_values, *args)
+        frame = pd.DataFrame(ret.T, index=index, columns=_ROLLING_FIELDS)
+        return frame.astype({"x.dominates": bool, "y.dominates": bool})
+
+    ret = _sd_rolling_panel(x_values, y_values, *args)
+    columns = x.columns if isinstance(x, pd.DataFrame) else np.arange(x_values.shape[1])
+    out = {}
+    for f, field in enumerate(_ROLLING_FIELDS):
+        values = ret[:, f, :].T
+        values = values.astype(bool) if f < 2 else values
+        out[field] = pd.DataFrame(values, index=index, columns=columns)
+    return out
+
+
+__all__ = ["NNS_SD_rolling"]
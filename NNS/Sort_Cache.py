@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+r"""
+Shared cache of sorted representations
+
+Stochastic dominance tests, VaR quantiles and the Tukey summaries all sort the same vectors
+over and over (\code{NNS_SD_efficient_set} sorts each column once per pairwise comparison).
+Sorted copies are kept here, keyed by the identity of the input buffer (address, shape,
+strides, dtype) and validated by a blake2b digest of its content (as \code{fingerprint}), so
+that an array modified in place is sorted again.  Each lookup hashes the input, O(n) but much
+cheaper than the sort; strided views are hashed in chunks without a full copy.  Cached arrays are
+read-only.
+
+Use \code{set_sort_cache(False)} (or \code{with sort_cache(False):}) to opt out when memory is
+tight.
+"""
+
+import collections
+import contextlib
+import hashlib
+import threading
+
+import numpy as np
+import pandas as pd
+
+_lock = threading.Lock()
+_cache = collections.OrderedDict()  # key -> (version, sorted array)
+_state = {"enabled": True, "max_bytes": 64 * 1024**2, "bytes": 0, "hits": 0, "misses": 0}
+# sorting a handful of values is cheaper than looking them up
+_MIN_SIZE = 64
+# elements of a strided view copied at a time to be hashed
+_CHUNK = 1 << 16
+
+
+def set_sort_cache(enabled: bool = True, max_bytes: [int, None] = None) -> None:
+    r"""
+    Enable or disable the shared sort cache
+
+    @param enabled logical; \code{False} sorts on every call and drops the cached arrays.
+    @param max_bytes integer; memory limit of the cache, least recently used arrays are evicted.
+    """
+    with _lock:
+        _state["enabled"] = bool(enabled)
+        if max_bytes is not None:
+            _state["max_bytes"] = max_bytes
+        if not enabled:
+            _cache.clear()
+            _state["bytes"] = 0
+        _evict()
+
+
+@contextlib.contextmanager
+def sort_cache(enabled: bool = True, max_bytes: [int, None] = None):
+    """Context manager version of \\code{set_sort_cache}, restoring the previous settings"""
+    previous = _state["enabled"], _state["max_bytes"]
+    set_sort_cache(enabled, max_bytes)
+    try:
+        yield
+    finally:
+        set_sort_cache(*previous)
+
+
+def sort_cache_info() -> dict:
+    """Hit/miss statistics and memory use of the shared sort cache"""
+    with _lock:
+        return {
+            "enabled": _state["enabled"],
+            "hits": _state["hits"],
+            "misses": _state["misses"],
+            "entries": len(_cache),
+            "bytes": _state["bytes"],
+            "max_bytes": _state["max_bytes"],
+        }
+
+
+def sort_cache_clear() -> None:
+    """Drops every cached array and resets the statistics"""
+    with _lock:
+        _cache.clear()
+        _state.update(bytes=0, hits=0, misses=0)
+
+
+def _evict() -> None:
+    while _cache and _state["bytes"] > _state["max_bytes"]:
+        _, (_, a) = _cache.popitem(last=False)
+        _state["bytes"] -= a.nbytes
+
+
+def _as_array(x) -> np.ndarray:
+    if isinstance(x, (pd.Series, pd.DataFrame)):
+        x = x.values
+    return np.asarray(x)
+
+
+def _key(a: np.ndarray) -> tuple:
+    return a.__array_interface__["data"][0], a.shape, a.strides, a.dtype.str
+
+
+def _version(a: np.ndarray) -> bytes:
+    h = hashlib.blake2b(digest_size=20)
+    if a.flags.c_contiguous:
+        h.update(memoryview(a).cast("B"))
+    else:
+        for i in range(0, a.shape[0], _CHUNK):
+            h.update(memoryview(np.ascontiguousarray(a[i : i + _CHUNK])).cast("B"))
+    return h.digest()
+
+
+def _cached(key: tuple, version: [bytes, tuple], compute) -> np.ndarray:
+    with _lock:
+        entry = _cache.get(key)
+        if entry is not None and entry[0] == version:
+            _cache.move_to_end(key)
+            _state["hits"] += 1
+            return entry[1]
+        _state["misses"] += 1
+    ret = compute()
+    ret.setflags(write=False)
+    with _lock:
+        old = _cache.pop(key, None)
+        if old is not None:
+            _state["bytes"] -= old[1].nbytes
+        if ret.nbytes <= _state["max_bytes"]:
+            _cache[key] = (version, ret)
+            _state["bytes"] += ret.nbytes
+            _evict()
+    return ret
+
+
+def sorted_values(x: [pd.Series, np.ndarray, list]) -> np.ndarray:
+    r"""
+    Sorted copy of a vector (\code{np.sort}), shared through the cache
+
+    @param x a numeric vector.
+    @return Returns a read-only sorted array (NaN last).
+    """
+    a = _as_array(x)
+    if not _state["enabled"] or a.ndim != 1 or a.shape[0] < _MIN_SIZE:
+        return np.sort(a)
+    return _cached(("sort",) + _key(a), _version(a), lambda: np.sort(a))
+
+
+def _merge_unique(x_sort: np.ndarray, y_sort: np.ndarray) -> np.ndarray:
+    # a stable sort of two sorted runs is a linear merge
+    s = np.sort(np.concatenate((x_sort, y_sort)), kind="stable")
+    if s.shape[0] == 0:
+        return s
+    keep = np.empty(s.shape[0], dtype=bool)
+    keep[0] = True
+    np.not_equal(s[1:], s[:-1], out=keep[1:])
+    if s.dtype.kind in "fc" and np.isnan(s[-1]):
+        # like np.unique: a single NaN
+        first_nan = np.searchsorted(np.isnan(s), True)
+        keep[first_nan + 1 :] = False
+    return s[keep]
+
+
+def sorted_union(x: [pd.Series, np.ndarray, list], y: [pd.Series, np.ndarray, list]) -> np.ndarray:
+    r"""
+    Sorted unique values of two vectors, same as \code{np.unique(np.append(x, y))}
+
+    Merges the cached sorted copies of \code{x} and \code{y}; the union of a pair is cached too.
+    @param x a numeric vector.
+    @param y a numeric vector.
+    @return Returns a read-only sorted array without duplicates.
+    """
+    a, b = _as_array(x).ravel(), _as_array(y).ravel()
+    if not _state["enabled"] or a.shape[0] + b.shape[0] < _MIN_SIZE:
+        return np.unique(np.append(a, b))
+    va, vb = _version(a), _version(b)
+    return _cached(
+        ("union",) + _key(a) + _key(b),
+        (va, vb),
+        lambda: _merge_unique(sorted_values(a), sorted_values(b)),
+    )
+
+
+__all__ = ["set_sort_cache", "sort_cache", "sort_cache_info", "sort_cache_clear"]
@@ -1,17 +1,26 @@
 # -*- coding: utf-8 -*-
+from .ANOVA import *
 from .Binary_ANOVA import *
+from .Cache import *
 from .Copula import *
 
 # from .dy_dx import *
 from .FSD import *
 
 from . import Internal_Functions
+from . import aio
 from .LPM_UPM_VaR import *
 from .NNS_term_matrix import *
 from .Numerical_Differentiation import *
+from .Partition_Map import *
 from .Partial_Moments import *
+from .SD_Approx import *
+from .SD_Core import *
 from .SD_Efficient_Set import *
+from .SD_Matrix import *
+from .SD_Rolling import *
 from .SSD import *
+from .Sort_Cache import *
 from .TSD import *
 from .Uni_SD_Routines import *
 
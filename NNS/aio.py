@@ -0,0 +1,286 @@
+# -*- coding: utf-8 -*-
+r"""
+asyncio front-end for the long-running NNS entry points
+
+Every coroutine here runs its work off the event loop, on the executor given by ``executor=`` or
+on the module executor set with :func:`set_executor` (``None`` means the loop's default executor).
+Work is split in chunks, one executor job each, so cancelling the awaiting task stops the
+computation at the next chunk boundary.
+
+Concurrent requests on the same dataset share their work: identical calls are awaited once, and
+``LPM_VaR`` / ``UPM_VaR`` requests issued in the same loop iteration for the same ``x`` and
+``degree`` are merged into a single vectorized run over one shared precompute.
+
+    import NNS.aio
+    await NNS.aio.PM_matrix(1, 1, variable=df)
+    await asyncio.gather(NNS.aio.LPM_VaR(0.05, 0, x), NNS.aio.LPM_VaR([0.01, 0.1], 0, x))
+"""
+import asyncio
+import concurrent.futures
+import functools
+import threading
+
+import numpy as np
+import pandas as pd
+
+from .Cache import fingerprint
+from .Sort_Cache import sorted_values
+from . import LPM_UPM_VaR as _VaR
+from . import Partial_Moments as _PM
+from . import SD_Efficient_Set as _SD
+
+_executor = None
+# (event loop, key) -> _Shared / _VaRBatch
+_inflight = {}
+
+
+def set_executor(executor: [concurrent.futures.Executor, None]) -> None:
+    """Set the default executor used by the coroutines of this module (None: loop default)"""
+    global _executor
+    _executor = executor
+
+
+def get_executor() -> [concurrent.futures.Executor, None]:
+    """Current default executor of this module"""
+    return _executor
+
+
+async def _run(executor, func, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        executor if executor is not None else _executor, functools.partial(func, *args, **kwargs)
+    )
+
+
+class _Shared:
+    """One computation awaited by several callers; cancelled only when every caller is gone"""
+
+    def __init__(self, key, coro):
+        self.key = key
+        self.waiters = 0
+        self.task = asyncio.ensure_future(coro)
+        self.task.add_done_callback(self._done)
+
+    def _done(self, _):
+        if _inflight.get(self.key) is self:
+            del _inflight[self.key]
+
+    async def wait(self):
+        self.waiters += 1
+        try:
+            return await asyncio.shield(self.task)
+        except asyncio.CancelledError:
+            if self.task.cancelled():
+                raise
+            self.waiters -= 1
+            if self.waiters == 0:
+                self.task.cancel()
+            raise
+
+
+async def _single_flight(key: tuple, coro_func):
+    key = (asyncio.get_running_loop(),) + key
+    shared = _inflight.get(key)
+    if shared is None:
+        shared = _inflight[key] = _Shared(key, coro_func())
+    return await shared.wait()
+
+
+async def PM_matrix(
+    LPM_degree: [int, float],
+    UPM_degree: [int, float],
+    target: [str, dict, list, float, int, pd.Series, np.array] = "mean",
+    variable: [pd.Series, pd.DataFrame, np.ndarray, None, list] = None,
+    pop_adj: bool = False,
+    executor: [concurrent.futures.Executor, None] = None,
+    chunk_size: int = 8,
+) -> dict:
+    r"""
+    Awaitable \link{PM_matrix}
+
+    Same arguments and result as \link{PM_matrix}.  Rows of the co-partial moment matrices are
+    computed \code{chunk_size} at a time on \code{executor}.
+    """
+    if variable is None:
+        return _PM.PM_matrix(LPM_degree, UPM_degree, target, variable, pop_adj)
+
+    async def _compute():
+        values, columns, tgt = await _run(executor, _PM._PM_matrix_prepare, target, variable)
+        if LPM_degree == 0 and UPM_degree == 0:
+            pms = await _run(executor, _PM._PM_matrix_degree0, tgt, values)
+            return _PM._PM_matrix_assemble(pms, columns, values.shape, pop_adj)
+        n = values.shape[1]
+        pms = {"clpms": [], "cupms": [], "dlpms": [], "dupms": []}
+        for start in range(0, n, max(1, chunk_size)):
+            rows = range(start, min(n, start + max(1, chunk_size)))
+            chunk = await _run(
+                executor, _PM._PM_matrix_rows, LPM_degree, UPM_degree, tgt, values, rows
+            )
+            for k in pms:
+                pms[k].extend(chunk[k])
+        return _PM._PM_matrix_assemble(pms, columns, values.shape, pop_adj)
+
+    key = (
+        "PM_matrix",
+        fingerprint(variable),
+        fingerprint(target) if not isinstance(target, (str, int, float, dict)) else repr(target),
+        LPM_degree,
+        UPM_degree,
+        pop_adj,
+    )
+    return await _single_flight(key, _compute)
+
+
+async def NNS_SD_efficient_set(
+    x: [pd.DataFrame, np.ndarray],
+    degree: int,
+    type_first_degree: str = "discrete",
+    executor: [concurrent.futures.Executor, None] = None,
+) -> [list, np.ndarray]:
+    r"""
+    Awaitable \link{NNS_SD_efficient_set}
+
+    Same arguments and result as \link{NNS_SD_efficient_set} (without console status).  The set is
+    computed as a single executor job, which stops at the next challenger once cancelled.
+    """
+
+    async def _compute():
+        cancelled = threading.Event()
+
+        def progress(i, n):
+            if cancelled.is_set():
+                raise concurrent.futures.CancelledError()
+
+        try:
+            return await _run(
+                executor,
+                _SD.NNS_SD_efficient_set,
+                x,
+                degree,
+                type_first_degree,
+                status=False,
+                progress=progress,
+            )
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    key = ("NNS_SD_efficient_set", fingerprint(x), degree, type_first_degree)
+    return await _single_flight(key, _compute)
+
+
+class _VaRBatch:
+    """Percentile requests on one (function, degree, x) collected during one loop iteration"""
+
+    def __init__(self, key, func, degree, x, executor, chunk_size):
+        self.key = key
+        self.func = func
+        self.degree = degree
+        self.x = x
+        self.executor = executor
+        self.chunk_size = max(1, chunk_size)
+        self.requests = []  # (percentiles, future)
+        self.task = None
+        asyncio.get_running_loop().call_soon(self._start)
+
+    def _start(self):
+        self.task = asyncio.ensure_future(self._flush())
+
+    def add(self, percentiles: np.ndarray) -> asyncio.Future:
+        future = asyncio.get_running_loop().create_future()
+        self.requests.append((percentiles, future))
+        return future
+
+    @staticmethod
+    def _precompute(x, degree):
+        x = np.asarray(x.values if hasattr(x, "values") else x)
+        # degree 0 is a quantile: every percentile of the batch reuses one sorted copy
+        return sorted_values(x) if degree == 0 else x
+
+    async def _flush(self):
+        if _inflight.get(self.key) is self:
+            del _inflight[self.key]
+        requests = self.requests
+        try:
+            x = await _run(self.executor, self._precompute, self.x, self.degree)
+            percentiles = np.concatenate([p for p, _ in requests])
+            results = []
+            for start in range(0, len(percentiles), self.chunk_size):
+                if all(f.done() for _, f in requests):
+                    return  # every caller cancelled
+                results.append(
+                    await _run(
+                        self.executor,
+                        self.func,
+                        percentile=percentiles[start : start + self.chunk_size],
+                        degree=self.degree,
+                        x=x,
+                    )
+                )
+            results = np.concatenate(results)
+        except BaseException as e:  # propagated to every caller
+            for _, f in requests:
+                if not f.done():
+                    f.set_exception(e)
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            return
+        offset = 0
+        for p, f in requests:
+            if not f.done():
+                f.set_result(results[offset : offset + len(p)])
+            offset += len(p)
+
+
+async def _batched_VaR(name, func, percentile, degree, x, executor, chunk_size):
+    scalar = not isinstance(percentile, (np.ndarray, pd.Series, list))
+    percentiles = np.atleast_1d(np.asarray(percentile, dtype=float))
+    loop = asyncio.get_running_loop()
+    key = (loop, name, fingerprint(x), degree, executor)
+    batch = _inflight.get(key)
+    if batch is None:
+        batch = _inflight[key] = _VaRBatch(key, func, degree, x, executor, chunk_size)
+    ret = await batch.add(percentiles)
+    return ret[0] if scalar else ret
+
+
+async def LPM_VaR(
+    percentile: [float, int, np.array, pd.Series, list],
+    degree: [float, int, str, None],
+    x: [pd.Series, np.ndarray, list],
+    executor: [concurrent.futures.Executor, None] = None,
+    chunk_size: int = 32,
+) -> [float, np.array]:
+    r"""
+    Awaitable \link{LPM_VaR}
+
+    Same arguments and result as \link{LPM_VaR}.  Percentiles are evaluated \code{chunk_size} at a
+    time; concurrent requests on the same \code{x} and \code{degree} are evaluated together.
+    """
+    return await _batched_VaR("LPM_VaR", _VaR.LPM_VaR, percentile, degree, x, executor, chunk_size)
+
+
+async def UPM_VaR(
+    percentile: [float, int, np.array, pd.Series, list],
+    degree: [float, int, str, None],
+    x: [pd.Series, np.ndarray, list],
+    executor: [concurrent.futures.Executor, None] = None,
+    chunk_size: int = 32,
+) -> [float, np.array]:
+    r"""
+    Awaitable \link{UPM_VaR}
+
+    Same arguments and result as \link{UPM_VaR}.  Percentiles are evaluated \code{chunk_size} at a
+    time; concurrent requests on the same \code{x} and \code{degree} are evaluated together.
+    """
+    return await _batched_VaR("UPM_VaR", _VaR.UPM_VaR, percentile, degree, x, executor, chunk_size)
+
+
+__all__ = [
+    "set_executor",
+    "get_executor",
+    "PM_matrix",
+    "NNS_SD_efficient_set",
+    "LPM_VaR",
+    "UPM_VaR",
+]
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+"""Merge sweep against LPM evaluation at every combined point for NNS_*_uni
+
+The data is chosen so that x dominates y: no early exit, every point of the combined support is
+visited.  The legacy LPM path is quadratic, it is only timed up to max_legacy observations and
+extrapolated (n ** 2) beyond.
+
+    python benchmarks/bench_SD_uni.py [max_legacy] [n_obs ...]
+"""
+import sys
+import time
+
+import numpy as np
+
+import NNS
+from NNS.Partial_Moments import LPM, UPM
+
+
+def legacy_uni(x: np.ndarray, y: np.ndarray, degree: int, ratio: bool) -> int:
+    """NNS_*_uni before the merge sweep (checks on min / mean omitted)"""
+    Combined_sort = np.unique(np.append(x, y))
+    LPM_x_sort = LPM(degree, Combined_sort, x)
+    LPM_y_sort = LPM(degree, Combined_sort, y)
+    if ratio:
+        LPM_x_sort = LPM_x_sort / (UPM(degree, Combined_sort, x) + LPM_x_sort)
+        LPM_y_sort = LPM_y_sort / (UPM(degree, Combined_sort, y) + LPM_y_sort)
+    x_sd_y = np.any(LPM_x_sort > LPM_y_sort)
+    if (not x_sd_y) and (not np.equal(LPM_x_sort, LPM_y_sort).all()):
+        return 1
+    return 0
+
+
+TESTS = {
+    "FSD discrete": (lambda x, y: NNS.NNS_FSD_uni(x, y, "discrete"), 0, True),
+    "FSD continuous": (lambda x, y: NNS.NNS_FSD_uni(x, y, "continuous"), 1, True),
+    "SSD": (NNS.NNS_SSD_uni, 1, False),
+    "TSD": (NNS.NNS_TSD_uni, 2, False),
+}
+
+
+def timeit(func, repeat: int) -> float:
+    best = np.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run(max_legacy: int = 100_000, sizes: tuple = (10_000, 100_000, 1_000_000)) -> None:
+    rng = np.random.RandomState(123)
+    NNS.NNS_FSD_uni(rng.rand(100) + 1, rng.rand(100))  # compile
+    legacy_time = {}
+    for n in sizes:
+        y = rng.randn(n)
+        x = y + np.abs(rng.randn(n))  # x FSD y
+        print(f"n={n}")
+        for name, (func, degree, ratio) in TESTS.items():
+            with NNS.sort_cache(False):  # time the sorts too
+                new = timeit(lambda: func(x, y), 3)
+                result = func(x, y)
+            if n <= max_legacy:
+                old = timeit(lambda: legacy_uni(x, y, degree, ratio), 1)
+                assert legacy_uni(x, y, degree, ratio) == result
+                legacy_time[name] = (n, old)
+                mark = ""
+            else:
+                n0, t0 = legacy_time[name]
+                old = t0 * (n / n0) ** 2
+                mark = " (est.)"
+            print(
+                f"  {name:<15} sweep {new:9.4f}s  legacy {old:11.2f}s{mark:<7}"
+                f"  speedup {old / new:12.0f}x  result={result}"
+            )
+
+
+if __name__ == "__main__":
+    args = [int(i) for i in sys.argv[1:]]
+    if len(args) > 1:
+        run(args[0], tuple(args[1:]))
+    else:
+        run(*args)
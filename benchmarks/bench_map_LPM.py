@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+"""Thread scaling of NNS.map_LPM
+
+Runs the same batch of (degree, target, variable) jobs with an increasing number of threads and
+prints the wall time and speedup against a single thread.
+
+    python benchmarks/bench_map_LPM.py [n_obs] [n_jobs]
+"""
+import sys
+import time
+
+import numpy as np
+
+import NNS
+
+
+def run(n_obs: int = 200_000, n_jobs: int = 64, repeat: int = 3) -> None:
+    rng = np.random.RandomState(123)
+    variables = [rng.randn(n_obs) for _ in range(8)]
+    jobs = [
+        (1 + (i % 2), np.linspace(-2, 2, 16), variables[i % len(variables)]) for i in range(n_jobs)
+    ]
+    NNS.map_LPM(jobs[:2], max_workers=1)  # compile
+
+    base = None
+    print(f"n_obs={n_obs} n_jobs={n_jobs}")
+    for max_workers in [1, 2, 4, 8, 16]:
+        best = np.inf
+        for _ in range(repeat):
+            start = time.perf_counter()
+            NNS.map_LPM(jobs, max_workers=max_workers)
+            best = min(best, time.perf_counter() - start)
+        base = best if base is None else base
+        print(f"threads={max_workers:>3}  {best:8.4f}s  speedup={base / best:5.2f}x")
+
+
+if __name__ == "__main__":
+    run(*[int(i) for i in sys.argv[1:3]])
@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+import unittest
+import numpy as np
+import pandas as pd
+
+import NNS
+
+
+class TestNNS_ANOVA(unittest.TestCase):
+    COMPARISON_PRECISION = 7
+
+    def test_NNS_ANOVA(self):
+        rng = np.random.RandomState(123)
+        groups = {
+            "a": rng.randn(100),
+            "b": rng.randn(80) + 0.2,
+            "c": np.round(rng.randn(120) + 0.5, 1),
+            "d": rng.rand(60),
+        }
+        ret = NNS.NNS_ANOVA(groups, plot=False)
+        names = list(groups.keys())
+        matrix = ret["Certainty Matrix"]
+        self.assertEqual(list(matrix.index), names)
+        for i in names:
+            self.assertAlmostEqual(matrix.loc[i, i], 1)
+            self.assertAlmostEqual(ret["Group Means"][i], np.mean(groups[i]))
+            for j in names:
+                if i != j:
+                    self.assertAlmostEqual(
+                        matrix.loc[i, j],
+                        NNS.NNS_ANOVA_bin(groups[i], groups[j], plot=False)["Certainty"],
+                    )
+        self.assertAlmostEqual(ret["Grand Mean"], np.mean([np.mean(groups[i]) for i in names]))
+        for i in names:
+            self.assertAlmostEqual(
+                ret["Group CDF"][i], NNS.LPM_ratio(1, ret["Grand Mean"], groups[i]), 5
+            )
+        self.assertTrue(0 <= ret["Certainty"] <= 1)
+
+        # two groups: the binary certainty
+        two = NNS.NNS_ANOVA([groups["a"], groups["b"]], plot=False)
+        self.assertAlmostEqual(
+            two["Certainty"],
+            NNS.NNS_ANOVA_bin(groups["a"], groups["b"], plot=False)["Certainty"],
+        )
+        # data frame columns, NaN padded
+        frame = pd.DataFrame({"a": groups["a"], "b": np.r_[groups["b"], [np.nan] * 20]})
+        self.assertAlmostEqual(NNS.NNS_ANOVA(frame, plot=False)["Certainty"], two["Certainty"])
+        # control / treatment: NNS_ANOVA_bin
+        self.assertEqual(
+            NNS.NNS_ANOVA(groups["a"], groups["b"], plot=False),
+            NNS.NNS_ANOVA_bin(groups["a"], groups["b"], plot=False),
+        )
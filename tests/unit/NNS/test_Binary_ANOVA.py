@@ -121,6 +121,83 @@ class TestNNS_ANOVA_bin(unittest.TestCase):
                 plt.close()
         print("ok")
 
+    def test_NNS_ANOVA_bin_targets(self):
+        # O(log n) lookups on the sorted groups against the LPM_ratio / VaR definitions
+        z = self.load_default_data()
+        for v in [z["x"].values, np.round(z["y"].values, 1)]:
+            x_sort, center, prefix = NNS.Binary_ANOVA._sorted_prefix(v)
+            for q in [0.0, 0.125, 0.25, 0.5, 0.75, 0.875, 1.0]:
+                b = NNS.Binary_ANOVA._lpm_var_sorted(x_sort, center, prefix, q)
+                self.assertAlmostEqual(NNS.LPM_ratio(1, b, v), q, 5)
+                self.assertAlmostEqual(b, NNS.LPM_VaR(q, 1, v), 5)
+                self.assertAlmostEqual(
+                    NNS.Binary_ANOVA._lpm_ratio_sorted(x_sort, center, prefix, v[7] + q - 0.5),
+                    NNS.LPM_ratio(1, v[7] + q - 0.5, v),
+                    5,
+                )
+
+    def test_NNS_ANOVA_bin_batch(self):
+        z = self.load_default_data()
+        x, y, w = z["x"].values, z["y"].values, np.round(z["z"].values, 1)
+        cells = [(x, y), (y[:30], w[10:]), (w, x[:7])]
+        control = np.concatenate([c for c, _ in cells])
+        treatment = np.concatenate([t for _, t in cells])
+        control_offsets = np.cumsum([0] + [len(c) for c, _ in cells])
+        treatment_offsets = np.cumsum([0] + [len(t) for _, t in cells])
+        for tails in ["both", "left", "right"]:
+            ret = NNS.NNS_ANOVA_bin_batch(
+                control,
+                control_offsets,
+                treatment,
+                treatment_offsets,
+                confidence_interval=0.3,
+                tails=tails,
+            )
+            self.assertEqual(ret.shape, (3, 8))
+            for i, (c, t) in enumerate(cells):
+                self.assertAlmostEqualArray(
+                    ret.iloc[i].to_dict(),
+                    NNS.NNS_ANOVA_bin(c, t, confidence_interval=0.3, tails=tails, plot=False),
+                )
+        # long data frame, grouped into cells
+        frame = pd.DataFrame(
+            {
+                "metric": ["m1"] * 200 + ["m2"] * 200,
+                "arm": (["control"] * 100 + ["treatment"] * 100) * 2,
+                "value": np.concatenate([x, y, y, w]),
+            }
+        ).sample(frac=1, random_state=1)
+        ret = NNS.NNS_ANOVA_bin_batch(frame, by="metric", group="arm")
+        self.assertEqual(list(ret.index), ["m1", "m2"])
+        self.assertAlmostEqualArray(ret.loc["m1"].to_dict(), NNS.NNS_ANOVA_bin(x, y, plot=False))
+        self.assertAlmostEqualArray(ret.loc["m2"].to_dict(), NNS.NNS_ANOVA_bin(y, w, plot=False))
+
+    def test_NNS_ANOVA_bin_boot(self):
+        z = self.load_default_data()
+        x, y = z["x"], z["y"]
+        ret = NNS.NNS_ANOVA_bin_boot(x, y, reps=500, seed=123)
+        self.assertAlmostEqual(ret["Certainty"], 0.7776676, 5)
+        self.assertAlmostEqual(ret["Effect Size"], 0.5389327 - 0.5014289, 6)
+        self.assertLessEqual(ret["Lower Bound Certainty"], ret["Upper Bound Certainty"])
+        self.assertLessEqual(ret["Lower Bound Effect"], ret["Effect Size"])
+        self.assertLessEqual(ret["Effect Size"], ret["Upper Bound Effect"])
+        for k in ["Certainty p-value", "Effect p-value"]:
+            self.assertTrue(0 < ret[k] <= 1)
+        # reproducible for a seed
+        self.assertEqual(ret, NNS.NNS_ANOVA_bin_boot(x, y, reps=500, seed=123))
+        # shifted treatment: the permutations rarely reach its certainty or effect
+        shifted = NNS.NNS_ANOVA_bin_boot(x, y + 0.5, reps=500, seed=1)
+        self.assertLess(shifted["Certainty p-value"], 0.01)
+        self.assertLess(shifted["Effect p-value"], 0.01)
+
+    def test_NNS_ANOVA_bin_headless(self):
+        z = self.load_default_data()
+        plt.close("all")
+        NNS.NNS_ANOVA_bin(z["x"], z["y"], confidence_interval=0.3)
+        if not NNS.Internal_Functions._plot_enabled(None):
+            self.assertEqual(plt.get_fignums(), [])
+        plt.close("all")
+
     def load_default_data(self):
         # R Code:
         # x <- c(0.6964691855978616, 0.28613933495037946, 0.2268514535642031, 0.5513147690828912, 0.7194689697855631, 0.42310646012446096, 0.9807641983846155, 0.6848297385848633, 0.48093190148436094, 0.3921175181941505, 0.3431780161508694, 0.7290497073840416, 0.4385722446796244, 0.05967789660956835, 0.3980442553304314, 0.7379954057320357, 0.18249173045349998, 0.17545175614749253, 0.5315513738418384, 0.5318275870968661, 0.6344009585513211, 0.8494317940777896, 0.7244553248606352, 0.6110235106775829, 0.7224433825702216, 0.3229589138531782, 0.3617886556223141, 0.22826323087895561, 0.29371404638882936, 0.6309761238544878, 0.09210493994507518, 0.43370117267952824, 0.4308627633296438, 0.4936850976503062, 0.425830290295828, 0.3122612229724653, 0.4263513069628082, 0.8933891631171348, 0.9441600182038796, 0.5018366758843366, 0.6239529517921112, 0.11561839507929572, 0.3172854818203209, 0.4148262119536318, 0.8663091578833659, 0.2504553653965067, 0.48303426426270435, 0.985559785610705, 0.5194851192598093, 0.6128945257629677, 0.12062866599032374, 0.8263408005068332, 0.6030601284109274, 0.5450680064664649, 0.3427638337743084, 0.3041207890271841, 0.4170222110247016, 0.6813007657927966, 0.8754568417951749, 0.5104223374780111, 0.6693137829622723, 0.5859365525622129, 0.6249035020955999, 0.6746890509878248, 0.8423424376202573, 0.08319498833243877, 0.7636828414433382, 0.243666374536874, 0.19422296057877086, 0.5724569574914731, 0.09571251661238711, 0.8853268262751396, 0.6272489720512687, 0.7234163581899548, 0.01612920669501683, 0.5944318794450425, 0.5567851923942887, 0.15895964414472274, 0.1530705151247731, 0.6955295287709109, 0.31876642638187636, 0.6919702955318197, 0.5543832497177721, 0.3889505741231446, 0.9251324896139861, 0.8416699969127163, 0.35739756668317624, 0.04359146379904055, 0.30476807341109746, 0.398185681917981, 0.7049588304513622, 0.9953584820340174, 0.35591486571745956, 0.7625478137854338, 0.5931769165622212, 0.6917017987001771, 0.15112745234808023, 0.39887629272615654, 0.24085589772362448, 0.34345601404832493)
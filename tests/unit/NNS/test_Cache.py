@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+import os
+import tempfile
+import time
+import unittest
+
+import numpy as np
+import pandas as pd
+
+import NNS
+
+
+class TestCache(unittest.TestCase):
+    COMPARISON_PRECISION = 7
+
+    def test_fingerprint(self):
+        z = self.load_default_data()
+        self.assertEqual(NNS.fingerprint(z), NNS.fingerprint(z.copy()))
+        self.assertEqual(NNS.fingerprint(z.values), NNS.fingerprint(z.values.copy(order="F")))
+        self.assertNotEqual(NNS.fingerprint(z), NNS.fingerprint(z.values))
+        self.assertNotEqual(NNS.fingerprint(z), NNS.fingerprint(z.rename(columns={"x": "a"})))
+        z2 = z.copy()
+        z2.iloc[3, 1] += 1e-12
+        self.assertNotEqual(NNS.fingerprint(z), NNS.fingerprint(z2))
+        self.assertNotEqual(NNS.fingerprint(1), NNS.fingerprint(1.0))
+        self.assertNotEqual(NNS.fingerprint("mean"), NNS.fingerprint("median"))
+
+    def test_memoize(self):
+        z = self.load_default_data()
+        cache = NNS.ResultCache()
+        PM_matrix = NNS.memoize(NNS.PM_matrix, cache=cache)
+        expected = NNS.PM_matrix(1, 1, target="mean", variable=z)
+
+        ret = PM_matrix(1, 1, target="mean", variable=z)
+        pd.testing.assert_frame_equal(ret["cov.matrix"], expected["cov.matrix"])
+        self.assertEqual(cache.stats()["misses"], 1)
+        # same content, other object and positional/keyword mix: hit
+        ret["cov.matrix"].iloc[0, 0] = 1000.0  # results are copies
+        ret = PM_matrix(1, 1, "mean", z.copy())
+        pd.testing.assert_frame_equal(ret["cov.matrix"], expected["cov.matrix"])
+        self.assertEqual(cache.stats()["hits"], 1)
+        # other arguments: miss
+        PM_matrix(1, 1, target="mean", variable=z, pop_adj=True)
+        self.assertEqual(PM_matrix.cache_info()["misses"], 2)
+        self.assertEqual(PM_matrix.cache_info()["entries"], 2)
+
+        LPM_VaR = NNS.memoize(NNS.LPM_VaR, cache=cache)
+        self.assertAlmostEqual(LPM_VaR(0.1, 0, z["x"]), NNS.LPM_VaR(0.1, 0, z["x"]))
+        self.assertEqual(len(cache), 3)
+        self.assertEqual(PM_matrix.cache_clear(), 2)
+        self.assertEqual(len(cache), 1)
+        self.assertEqual(cache.invalidate(NNS.LPM_VaR), 1)
+        self.assertEqual(len(cache), 0)
+
+        @NNS.memoize
+        def f(x, degree=1):
+            return np.sum(x) * degree
+
+        self.assertEqual(f(np.arange(4)), 6)
+        self.assertEqual(f(np.arange(4), degree=1), 6)
+        self.assertEqual(f.cache_info()["hits"], NNS.cache_info()["hits"])
+        self.assertEqual(NNS.cache_clear(f), 1)
+
+    def test_lru(self):
+        cache = NNS.ResultCache(max_bytes=3 * 8000 + 100)
+        square = NNS.memoize(lambda x: x ** 2, cache=cache, copy_result=False)
+        a, b, c, d = [np.full(1000, float(i)) for i in range(4)]
+        square(a)
+        square(b)
+        square(c)
+        square(a)  # a is now most recently used
+        square(d)  # evicts b
+        self.assertEqual(cache.stats()["evictions"], 1)
+        hits = cache.stats()["hits"]
+        square(a)
+        square(c)
+        square(d)
+        self.assertEqual(cache.stats()["hits"], hits + 3)
+        square(b)
+        self.assertEqual(cache.stats()["evictions"], 2)
+        # larger than the whole cache: not stored
+        square(np.zeros(10000))
+        self.assertEqual(len(cache), 3)
+        cache.clear()
+        self.assertEqual(cache.stats()["hits"], 0)
+        self.assertEqual(cache.stats()["bytes"], 0)
+
+    def test_disk_cache(self):
+        z = self.load_default_data()
+        with tempfile.TemporaryDirectory() as directory:
+            cache = NNS.DiskCache(directory, mmap_min_bytes=0)
+            PM_matrix = NNS.memoize(NNS.PM_matrix, cache=cache)
+            expected = NNS.PM_matrix(1, 1, target="mean", variable=z)
+            PM_matrix(1, 1, target="mean", variable=z)
+            # other instance on the same directory, as another process would see it
+            other = NNS.DiskCache(directory, mmap_min_bytes=0)
+            ret = NNS.memoize(NNS.PM_matrix, cache=other)(1, 1, target="mean", variable=z)
+            self.assertEqual(other.stats()["hits"], 1)
+            for k in expected:
+                pd.testing.assert_frame_equal(ret[k], expected[k])
+            base = ret["cov.matrix"].values
+            while base is not None and not isinstance(base, np.memmap):
+                base = base.base
+            self.assertIsInstance(base, np.memmap)  # zero-copy view of the file
+            self.assertFalse(ret["cov.matrix"].values.flags.writeable)
+
+            square = NNS.memoize(lambda x: x ** 2, cache=cache)
+            self.assertEqual(square(3), 9)
+            self.assertEqual(square(3), 9)
+            self.assertEqual(len(cache), 2)
+            self.assertEqual(cache.invalidate(NNS.PM_matrix), 1)
+            self.assertEqual(len(cache), 1)
+            cache.clear()
+            self.assertEqual(os.listdir(directory), [".lock"])
+
+            # size limit: least recently used entries go first
+            cache = NNS.DiskCache(directory, max_bytes=3 * 8400)
+            square = NNS.memoize(lambda x: x ** 2, cache=cache)
+            a, b, c, d = [np.full(1000, float(i)) for i in range(4)]
+            for v in (a, b, c):
+                square(v)
+                time.sleep(0.01)
+            square(a)
+            time.sleep(0.01)
+            square(d)  # evicts b
+            self.assertEqual(cache.stats()["evictions"], 1)
+            np.testing.assert_array_equal(square(a), a ** 2)
+            self.assertEqual(cache.stats()["hits"], 2)
+
+            # ttl
+            cache = NNS.DiskCache(directory, ttl=0.05)
+            cache.clear()
+            square = NNS.memoize(lambda x: x ** 2, cache=cache)
+            square(a)
+            square(a)
+            time.sleep(0.1)
+            square(a)
+            self.assertEqual(cache.stats()["hits"], 1)
+            self.assertEqual(cache.stats()["misses"], 2)
+
+    def load_default_data(self):
+        rng = np.random.RandomState(123)
+        return pd.DataFrame({"x": rng.rand(100), "y": rng.rand(100), "z": rng.rand(100)})
@@ -1,5 +1,6 @@
 # -*- coding: utf-8 -*-
 import unittest
+import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
 
@@ -45,6 +46,60 @@ class TestCopula(unittest.TestCase):
         )
         plt.close()
 
+    def test_Copula_pm_matrix(self):
+        # row-wise sums (default) against the upper triangles of PM_matrix
+        z = self.load_default_data()
+        for continuous in [True, False]:
+            self.assertAlmostEqual(
+                NNS.NNS_copula(z, continuous=continuous, plot=False),
+                NNS.NNS_copula(z, continuous=continuous, plot=False, pm_matrix=True),
+            )
+        x = np.random.RandomState(123).randn(50, 6)
+        x[:, 1] += x[:, 0]
+        for continuous in [True, False]:
+            self.assertAlmostEqual(
+                NNS.NNS_copula(x, continuous=continuous, plot=False),
+                NNS.NNS_copula(x, continuous=continuous, plot=False, pm_matrix=True),
+            )
+
+    def test_Copula_batch(self):
+        z = self.load_default_data()
+        subsets = [["x", "y"], ["x", "z"], ["x", "y", "z"], ["z", "y"]]
+        for continuous in [True, False]:
+            ret = NNS.NNS_copula_batch(z, subsets, continuous=continuous)
+            self.assertEqual(len(ret), len(subsets))
+            for r, s in zip(ret, subsets):
+                self.assertAlmostEqual(r, NNS.NNS_copula(z[s], continuous=continuous, plot=False))
+        x = np.round(np.random.RandomState(123).randn(40, 8), 1)
+        subsets = [[0, 1, 2], [3, 4], [5, 6, 7, 0], [2, 7]]
+        for continuous in [True, False]:
+            ret = NNS.NNS_copula_batch(x, subsets, continuous=continuous)
+            for r, s in zip(ret, subsets):
+                self.assertAlmostEqual(
+                    r, NNS.NNS_copula(x[:, s], continuous=continuous, plot=False)
+                )
+
+    def test_Copula_rolling(self):
+        z = self.load_default_data()
+        for continuous in [True, False]:
+            ret = NNS.NNS_copula_rolling(z, 30, continuous=continuous, step=7)
+            self.assertEqual(list(ret.index), list(z.index[29::7]))
+            for end, r in ret.items():
+                self.assertAlmostEqual(
+                    r, NNS.NNS_copula(z.loc[end - 29 : end], continuous=continuous, plot=False)
+                )
+
+    def test_Copula_boot(self):
+        z = self.load_default_data()
+        ret = NNS.NNS_copula_boot(z, reps=200, seed=123)
+        self.assertAlmostEqual(ret["estimate"], 0.1191304)
+        self.assertEqual(len(ret["replicates"]), 200)
+        self.assertLessEqual(ret["lower.CI"], ret["upper.CI"])
+        self.assertTrue(((ret["replicates"] >= 0) & (ret["replicates"] <= 1)).all())
+        # seeded per replicate: same values whatever the number of replicates
+        again = NNS.NNS_copula_boot(z, reps=20, seed=123)
+        np.testing.assert_array_equal(again["replicates"], ret["replicates"][:20])
+
     def load_default_data(self):
         # R Code:
         # x <- c(0.6964691855978616, 0.28613933495037946, 0.2268514535642031, 0.5513147690828912, 0.7194689697855631, 0.42310646012446096, 0.9807641983846155, 0.6848297385848633, 0.48093190148436094, 0.3921175181941505, 0.3431780161508694, 0.7290497073840416, 0.4385722446796244, 0.05967789660956835, 0.3980442553304314, 0.7379954057320357, 0.18249173045349998, 0.17545175614749253, 0.5315513738418384, 0.5318275870968661, 0.6344009585513211, 0.8494317940777896, 0.7244553248606352, 0.6110235106775829, 0.7224433825702216, 0.3229589138531782, 0.3617886556223141, 0.22826323087895561, 0.29371404638882936, 0.6309761238544878, 0.09210493994507518, 0.43370117267952824, 0.4308627633296438, 0.4936850976503062, 0.425830290295828, 0.3122612229724653, 0.4263513069628082, 0.8933891631171348, 0.9441600182038796, 0.5018366758843366, 0.6239529517921112, 0.11561839507929572, 0.3172854818203209, 0.4148262119536318, 0.8663091578833659, 0.2504553653965067, 0.48303426426270435, 0.985559785610705, 0.5194851192598093, 0.6128945257629677, 0.12062866599032374, 0.8263408005068332, 0.6030601284109274, 0.5450680064664649, 0.3427638337743084, 0.3041207890271841, 0.4170222110247016, 0.6813007657927966, 0.8754568417951749, 0.5104223374780111, 0.6693137829622723, 0.5859365525622129, 0.6249035020955999, 0.6746890509878248, 0.8423424376202573, 0.08319498833243877, 0.7636828414433382, 0.243666374536874, 0.19422296057877086, 0.5724569574914731, 0.09571251661238711, 0.8853268262751396, 0.6272489720512687, 0.7234163581899548, 0.01612920669501683, 0.5944318794450425, 0.5567851923942887, 0.15895964414472274, 0.1530705151247731, 0.6955295287709109, 0.31876642638187636, 0.6919702955318197, 0.5543832497177721, 0.3889505741231446, 0.9251324896139861, 0.8416699969127163, 0.35739756668317624, 0.04359146379904055, 0.30476807341109746, 0.398185681917981, 0.7049588304513622, 0.9953584820340174, 0.35591486571745956, 0.7625478137854338, 0.5931769165622212, 0.6917017987001771, 0.15112745234808023, 0.39887629272615654, 0.24085589772362448, 0.34345601404832493)
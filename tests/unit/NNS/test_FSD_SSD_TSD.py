@@ -1,5 +1,6 @@
 # -*- coding: utf-8 -*-
 import unittest
+import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
 import NNS
@@ -102,6 +103,41 @@ class TestFSD_SSD_TSD(unittest.TestCase):
         self.assertEqual(NNS.NNS_TSD(y.values ** 2, x.values, use_plot=True), "Y TSD X")
         self.assertEqual(NNS.NNS_TSD(y.values ** 2, x.values, use_plot=False), "Y TSD X")
 
+    def test_NNS_SD(self):
+        z = self.load_default_data()
+        x, y = z["x"], z["y"]
+        for degree, name in [(1, "FSD"), (2, "SSD"), (3, "TSD")]:
+            ret = NNS.NNS_SD(x, y ** 2, degree)
+            self.assertEqual(ret["result"], f"X {name} Y")
+            self.assertTrue(ret["x.dominates"])
+            self.assertTrue(np.isnan(ret["x.violation"]))
+            ret = NNS.NNS_SD(x, y, degree)
+            self.assertEqual(ret["result"], f"NO {name} EXISTS")
+            # first point where the curve of x is above the curve of y
+            i = np.argmax(ret["x.curve"] > ret["y.curve"])
+            self.assertEqual(ret["x.violation"], ret["support"][i])
+            self.assertFalse(np.any(ret["x.curve"][:i] > ret["y.curve"][:i]))
+        ret = NNS.NNS_SD(x, y, 1, "discrete")
+        np.testing.assert_allclose(ret["x.curve"], NNS.LPM_ratio(0, ret["support"], x))
+        ret = NNS.NNS_SD(x, y, 2)
+        np.testing.assert_allclose(ret["support"], np.unique(np.append(x, y)))
+        np.testing.assert_allclose(ret["y.curve"], NNS.LPM(1, ret["support"], y), rtol=1e-6)
+
+    def test_plot_SD(self):
+        rng = np.random.RandomState(123)
+        x, y = rng.randn(10000), rng.randn(10000)
+        ret = NNS.NNS_SD(x, y, 1)
+        plt.figure()
+        ax = NNS.plot_SD(ret, max_points=500)
+        self.assertLessEqual(len(ax.lines[0].get_xdata()), 502)
+        self.assertIn(ret["x.violation"], ax.lines[0].get_xdata())
+        plt.close()
+        # headless (Agg): no implicit plot
+        plt.figure()
+        NNS.NNS_SSD(x, y)
+        self.assertEqual(len(plt.gca().lines), 0)
+        plt.close()
+
     def load_default_data(self):
         # R Code:
         # x <- c(0.6964691855978616, 0.28613933495037946, 0.2268514535642031, 0.5513147690828912, 0.7194689697855631, 0.42310646012446096, 0.9807641983846155, 0.6848297385848633, 0.48093190148436094, 0.3921175181941505, 0.3431780161508694, 0.7290497073840416, 0.4385722446796244, 0.05967789660956835, 0.3980442553304314, 0.7379954057320357, 0.18249173045349998, 0.17545175614749253, 0.5315513738418384, 0.5318275870968661, 0.6344009585513211, 0.8494317940777896, 0.7244553248606352, 0.6110235106775829, 0.7224433825702216, 0.3229589138531782, 0.3617886556223141, 0.22826323087895561, 0.29371404638882936, 0.6309761238544878, 0.09210493994507518, 0.43370117267952824, 0.4308627633296438, 0.4936850976503062, 0.425830290295828, 0.3122612229724653, 0.4263513069628082, 0.8933891631171348, 0.9441600182038796, 0.5018366758843366, 0.6239529517921112, 0.11561839507929572, 0.3172854818203209, 0.4148262119536318, 0.8663091578833659, 0.2504553653965067, 0.48303426426270435, 0.985559785610705, 0.5194851192598093, 0.6128945257629677, 0.12062866599032374, 0.8263408005068332, 0.6030601284109274, 0.5450680064664649, 0.3427638337743084, 0.3041207890271841, 0.4170222110247016, 0.6813007657927966, 0.8754568417951749, 0.5104223374780111, 0.6693137829622723, 0.5859365525622129, 0.6249035020955999, 0.6746890509878248, 0.8423424376202573, 0.08319498833243877, 0.7636828414433382, 0.243666374536874, 0.19422296057877086, 0.5724569574914731, 0.09571251661238711, 0.8853268262751396, 0.6272489720512687, 0.7234163581899548, 0.01612920669501683, 0.5944318794450425, 0.5567851923942887, 0.15895964414472274, 0.1530705151247731, 0.6955295287709109, 0.31876642638187636, 0.6919702955318197, 0.5543832497177721, 0.3889505741231446, 0.9251324896139861, 0.8416699969127163, 0.35739756668317624, 0.04359146379904055, 0.30476807341109746, 0.398185681917981, 0.7049588304513622, 0.9953584820340174, 0.35591486571745956, 0.7625478137854338, 0.5931769165622212, 0.6917017987001771, 0.15112745234808023, 0.39887629272615654, 0.24085589772362448, 0.34345601404832493)
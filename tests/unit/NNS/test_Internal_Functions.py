@@ -55,6 +55,72 @@ class TestInternalFunctions(unittest.TestCase):
         self.assertAlmostEqual(NNS.Internal_Functions.mode(x2), 0.4388948, delta=0.001)
         self.assertAlmostEqual(NNS.Internal_Functions.mode(x3), 0.6733525, delta=0.002)
 
+    def test_spread_summary(self):
+        x = self.load_default_data()["x"].values
+        rng = np.random.RandomState(3)
+        funcs = NNS.Internal_Functions
+        for v in [x, x[:7], np.round(rng.randn(301) * 2), rng.randn(40000)]:
+            ret = funcs.spread_summary(v)
+            q75, q25 = np.percentile(v, [75, 25])
+            self.assertAlmostEqual(ret[0], np.std(v, ddof=1))
+            self.assertAlmostEqual(ret[1], q75 - q25)
+            # Tukey hinges from the sorted values
+            s = np.sort(v)
+            n4 = np.floor((len(v) + 3) / 2) / 2
+            d = np.array([1, n4, (len(v) + 1) / 2, len(v) + 1 - n4, len(v)])
+            hinges = 0.5 * (s[np.floor(d).astype(int) - 1] + s[np.ceil(d).astype(int) - 1])
+            self.assertAlmostEqualArray(ret[2:], hinges)
+            self.assertAlmostEqualArray(funcs.fivenum(v), hinges)
+            self.assertAlmostEqual(
+                funcs.bw_nrd0(v), 0.9 * min(ret[0], ret[1] / 1.34) * len(v) ** -0.2
+            )
+        self.assertAlmostEqualArray(
+            funcs.spread_summary(np.append(x, np.nan)), funcs.spread_summary(x)
+        )
+        self.assertTrue(np.isnan(funcs.spread_summary([np.nan])).all())
+
+        frame = pd.DataFrame({"a": x, "b": np.r_[x[:50], [np.nan] * 50]})
+        columns = funcs.spread_summary_columns(frame)
+        self.assertEqual(list(columns.columns)[:3], ["sd", "IQR", "min"])
+        self.assertAlmostEqualArray(columns.loc["a"].values, funcs.spread_summary(x))
+        self.assertAlmostEqualArray(columns.loc["b"].values, funcs.spread_summary(x[:50]))
+
+        group = np.arange(x.shape[0]) % 3
+        groups = funcs.group_spread_summary(x, group)
+        bws = funcs.group_bw_nrd0(x, group)
+        for g in range(3):
+            self.assertAlmostEqualArray(groups[g], funcs.spread_summary(x[group == g]))
+            self.assertAlmostEqual(bws[g], funcs.bw_nrd0(x[group == g]))
+        self.assertTrue(np.isnan(funcs.group_bw_nrd0([1.0, 2.0, 3.0], [0, 0, 1])[1]))
+
+    def test_mode_engines(self):
+        x = self.load_default_data()["x"]
+        rng = np.random.RandomState(7)
+        for v in [x, x[0:10], x[20:30], rng.randn(500) * 3 + 1, rng.exponential(size=50)]:
+            reference = NNS.Internal_Functions.mode(v, engine="kdepy")
+            self.assertAlmostEqual(NNS.Internal_Functions.mode(v), reference)
+            # within 2 grid steps of 1024 points
+            step = (np.ptp(v) * 1.1 + 8 * NNS.Internal_Functions.bw_nrd0(np.asarray(v))) / 1023
+            self.assertAlmostEqual(
+                NNS.Internal_Functions.mode(v, engine="fft"), reference, delta=2 * step
+            )
+            self.assertAlmostEqual(
+                NNS.Internal_Functions.mode(v, grid_size=256),
+                NNS.Internal_Functions.mode(v, grid_size=256, engine="kdepy"),
+            )
+        self.assertEqual(NNS.Internal_Functions.mode(np.array([1.5])), 1.5)
+        with self.assertRaises(Exception):
+            NNS.Internal_Functions.mode(x, engine="scipy")
+
+        # symmetric data: grid points tie, the default engine picks the one of KDEpy
+        self.assertAlmostEqual(NNS.Internal_Functions.mode(np.arange(1.0, 6.0)), 2.994162318576315)
+        for _ in range(20):
+            h = np.round(rng.rand(rng.randint(1, 10)) * 10, 1)
+            for v in [np.r_[5 - h, 5 + h], np.r_[5 - h, 5, 5 + h], np.arange(1.0, len(h) + 4)]:
+                self.assertEqual(
+                    NNS.Internal_Functions.mode(v), NNS.Internal_Functions.mode(v, engine="kdepy")
+                )
+
     def test_mode_class(self):
         x = self.load_default_data()["x"]
         y = np.array([1, 1, 1, 1, 1, 2, 2, 2, 3, 3, 3, 4, 4, 4])
@@ -91,6 +157,72 @@ class TestInternalFunctions(unittest.TestCase):
             NNS.Internal_Functions.gravity_class(x3), 0.5406646, delta=0.007
         )  # TODO: Get a better precision (mode fuction)
 
+    def test_group_functions(self):
+        x = self.load_default_data()["x"].values
+        y = np.random.RandomState(1).randn(200) * 3
+        values = np.r_[x, y, [2.5], [1.0, 4.0]]
+        group = np.repeat([2, 0, 3, 1], [x.shape[0], y.shape[0], 1, 2])
+        groups = [y, [1.0, 4.0], x, [2.5]]
+        funcs = NNS.Internal_Functions
+        self.assertAlmostEqualArray(funcs.group_mean(values, group), [np.mean(g) for g in groups])
+        self.assertAlmostEqualArray(
+            funcs.group_median(values, group), [np.median(g) for g in groups]
+        )
+        fivenums = funcs.group_fivenum(values, group)
+        self.assertEqual(fivenums.shape, (4, 5))
+        for i, g in enumerate(groups):
+            self.assertAlmostEqualArray(fivenums[i], funcs.fivenum(np.asarray(g)))
+        modes = funcs.group_mode(values, group)
+        gravities = funcs.group_gravity(values, group)
+        classes = funcs.group_gravity_class(values, group)
+        for i, g in enumerate(groups[:3]):
+            g = np.asarray(g)
+            self.assertAlmostEqual(modes[i], funcs.mode(g))
+            self.assertAlmostEqual(gravities[i], funcs.gravity(g))
+            self.assertAlmostEqual(classes[i], funcs.gravity_class(g))
+        # single observation: the observation itself
+        self.assertEqual(modes[3], 2.5)
+        self.assertEqual(gravities[3], 2.5)
+        self.assertEqual(classes[3], 2.5)
+        # empty group id
+        self.assertTrue(np.isnan(funcs.group_median(values, np.where(group == 1, 4, group))[1]))
+
+        # NaN dropped within every group, as in fivenum; an all-NaN group is an empty one
+        self.assertAlmostEqualArray(
+            funcs.group_median([1, 2, np.nan, 4, 5, 6], [0, 0, 0, 1, 1, 1]), [1.5, 5]
+        )
+        self.assertAlmostEqualArray(
+            funcs.group_fivenum([1, 2, np.nan, 4, 5, 6], [0, 0, 0, 1, 1, 1])[0], [1, 1, 1.5, 2, 2]
+        )
+        nan_values = np.r_[values, np.nan, np.nan, np.nan, np.nan]
+        nan_group = np.r_[group, 0, 2, 1, 4]
+        for func, clean in [
+            (funcs.group_mean, np.mean),
+            (funcs.group_median, np.median),
+            (funcs.group_fivenum, funcs.fivenum),
+            (funcs.group_spread_summary, funcs.spread_summary),
+            (funcs.group_bw_nrd0, funcs.bw_nrd0),
+            (funcs.group_mode, funcs.mode),
+            (funcs.group_gravity, funcs.gravity),
+            (funcs.group_gravity_class, funcs.gravity_class),
+        ]:
+            ret = func(nan_values, nan_group)
+            self.assertEqual(len(ret), 5)
+            for i, g in enumerate(groups[:3]):
+                np.testing.assert_allclose(ret[i], clean(np.asarray(g)), rtol=1e-7)
+            self.assertTrue(np.isnan(ret[4]).all())
+
+        # symmetric groups: two grid points tie for the mode, resolved as KDEpy
+        groups = [np.arange(1.0, 6.0), np.arange(1.0, 11.0), np.r_[-x, x], np.r_[3 - x, 3, 3 + x]]
+        values = np.concatenate(groups)
+        group = np.repeat(np.arange(len(groups)), [len(g) for g in groups])
+        modes = funcs.group_mode(values, group)
+        gravities = funcs.group_gravity(values, group)
+        for i, g in enumerate(groups):
+            self.assertEqual(modes[i], funcs.mode(g, engine="kdepy"))
+            self.assertAlmostEqual(gravities[i], funcs.gravity(g))
+        self.assertAlmostEqual(modes[0], 2.994162318576315)
+
     def test_alt_cbind(self):
         x = pd.Series([1.0, 2], name="x")
         y = pd.Series([1.0, 2, 3, 4, 5], name="y")
@@ -118,6 +118,32 @@ class TestPartialMoments(unittest.TestCase):
             [4.742673e-03, 4.970647e-02, 2.359908e-06, 6.724064e-03, 3.472444e-02, 5.931415e-02],
         )
 
+    def test_map_LPM_UPM(self):
+        x = self.load_default_data()["x"]
+        jobs = [
+            (0, x.mean(), x),
+            (1, x.mean(), x.values),
+            (2, x[4:10].values, x.values),
+            (1, list(x[4:10].values), list(x.values)),
+        ]
+        for max_workers in [1, 4]:
+            ret = NNS.map_LPM(jobs, max_workers=max_workers)
+            self.assertEqual(len(ret), len(jobs))
+            self.assertAlmostEqual(ret[0], 0.49)
+            self.assertAlmostEqual(ret[1], 0.1032933)
+            self.assertAlmostEqualArray(
+                ret[2], [0.10301058, 0.01663970, 0.28997176, 0.08712359, 0.02590746, 0.01284660]
+            )
+            self.assertAlmostEqualArray(ret[3], NNS.LPM(*jobs[3]))
+
+            ret = NNS.map_UPM(jobs, max_workers=max_workers)
+            self.assertEqual(len(ret), len(jobs))
+            self.assertAlmostEqual(ret[0], 0.51)
+            self.assertAlmostEqual(ret[1], 0.1032933)
+            self.assertAlmostEqualArray(ret[2], NNS.UPM(*jobs[2]))
+            self.assertAlmostEqualArray(ret[3], NNS.UPM(*jobs[3]))
+        self.assertEqual(NNS.map_LPM([]), [])
+
     def test_Co_UPM(self):
         z = self.load_default_data()
         x, y = z["x"], z["y"]
@@ -688,6 +714,25 @@ class TestPartialMoments(unittest.TestCase):
                 check_less_precise=6,
             )
 
+    def test_PM_matrix_degree0(self):
+        # bitset engine: same frequencies as Co_LPM / Co_UPM / D_LPM / D_UPM of degree 0
+        rng = np.random.RandomState(123)
+        x = pd.DataFrame(np.round(rng.randn(130, 5), 1), columns=list("abcde"))
+        x.iloc[3, 1] = np.nan
+        for target in ["mean", 0.0]:
+            ret = NNS.PM_matrix(0, 0, target=target, variable=x, pop_adj=True)
+            for i in x.columns:
+                for j in x.columns:
+                    tx = np.mean(x[i].values) if target == "mean" else target
+                    ty = np.mean(x[j].values) if target == "mean" else target
+                    adj = 5 / 4
+                    args = dict(x=x[i], y=x[j], target_x=tx, target_y=ty)
+                    self.assertEqual(ret["clpm"].loc[j, i], NNS.Co_LPM(0, 0, **args) * adj)
+                    self.assertEqual(ret["cupm"].loc[j, i], NNS.Co_UPM(0, 0, **args) * adj)
+                    if i != j:
+                        self.assertEqual(ret["dlpm"].loc[j, i], NNS.D_LPM(0, 0, **args) * adj)
+                        self.assertEqual(ret["dupm"].loc[j, i], NNS.D_UPM(0, 0, **args) * adj)
+
     def test_LPM_ratio(self):
         x = self.load_default_data()["x"]
         self.assertAlmostEqual(NNS.LPM_ratio(degree=0, target="mean", variable=x), 0.49)
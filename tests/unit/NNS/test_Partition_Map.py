@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+import unittest
+import numpy as np
+import pandas as pd
+
+import NNS
+from NNS.Internal_Functions import gravity
+
+
+class TestPartitionMap(unittest.TestCase):
+    COMPARISON_PRECISION = 7
+
+    def test_NNS_part(self):
+        x = np.arange(1, 11, dtype=float)
+        y = np.array([3, 1, 4, 1, 5, 9, 2, 6, 5, 3], dtype=float)
+        ret = NNS.NNS_part(x, y)
+        self.assertEqual(ret["order"], 1)
+        self.assertEqual(
+            list(ret["dt"]["quadrant"]),
+            ["q4", "q4", "q2", "q4", "q2", "q1", "q3", "q1", "q1", "q3"],
+        )
+        self.assertEqual(list(ret["dt"]["prior.quadrant"]), ["q"] * 10)
+        self.assertEqual(list(ret["dt"].columns), ["x", "y", "quadrant", "prior.quadrant"])
+        rp = ret["regression.points"]
+        self.assertEqual(list(rp.columns), ["quadrant", "x", "y"])
+        self.assertEqual(list(rp["quadrant"]), ["q"])
+        self.assertAlmostEqual(rp["x"][0], gravity(x), self.COMPARISON_PRECISION)
+        self.assertAlmostEqual(rp["y"][0], gravity(y), self.COMPARISON_PRECISION)
+
+        ret = NNS.NNS_part(pd.Series(x), pd.Series(y), _type="XONLY")
+        self.assertEqual(
+            list(ret["dt"]["quadrant"]),
+            ["q11", "q11", "q12", "q12", "q12", "q21", "q21", "q22", "q22", "q22"],
+        )
+        self.assertEqual(list(ret["regression.points"]["quadrant"]), ["q1", "q2"])
+        self.assertAlmostEqual(ret["regression.points"]["x"][0], gravity(x[:5]))
+        self.assertAlmostEqual(ret["regression.points"]["y"][1], gravity(y[5:]))
+
+    def test_NNS_part_random(self):
+        rng = np.random.RandomState(123)
+        x = rng.randn(1000)
+        y = x + rng.randn(1000)
+        for noise_reduction, stat in [("off", gravity), ("mean", np.mean), ("median", np.median)]:
+            ret = NNS.NNS_part(x, y, noise_reduction=noise_reduction)
+            dt = ret["dt"]
+            rp = ret["regression.points"]
+            self.assertEqual(ret["order"], 3)
+            # quadrants extend their prior quadrant by one digit
+            for q, p in zip(dt["quadrant"], dt["prior.quadrant"]):
+                self.assertEqual(q[:-1], p)
+            # regression points: central tendencies of the last partitioned quadrants
+            self.assertEqual(list(rp["quadrant"]), sorted(rp["quadrant"]))
+            for _, row in rp.iterrows():
+                group = dt[dt["prior.quadrant"] == row["quadrant"]]
+                self.assertAlmostEqual(row["x"], gravity(group["x"].values))
+                self.assertAlmostEqual(row["y"], stat(group["y"].values))
+                lo_x = group["x"] <= row["x"]
+                lo_y = group["y"] <= row["y"]
+                digits = (1 + lo_x + 2 * lo_y).astype(str)
+                self.assertTrue((group["quadrant"] == row["quadrant"] + digits).all())
+
+        ret = NNS.NNS_part(x, y, order=2)
+        self.assertEqual(ret["order"], 2)
+        self.assertEqual(ret["dt"]["quadrant"].str.len().max(), 3)
+        self.assertEqual(len(ret["regression.points"]), 4)
+
+        ret = NNS.NNS_part(x, y, min_obs_stop=False)
+        self.assertIsNone(ret["regression.points"])
+
+        # perfect fit: every observation is a regression point
+        ret = NNS.NNS_part(x[:100], y[:100], order="max")
+        rp = ret["regression.points"]
+        self.assertEqual(len(rp), 100)
+        self.assertEqual(list(rp["quadrant"]), sorted(ret["dt"]["quadrant"]))
+
+    def test_NNS_part_discrete_xonly(self):
+        rng = np.random.RandomState(42)
+        x = rng.randint(0, 5, 200).astype(float)
+        y = x + rng.randn(200)
+        rp = NNS.NNS_part(x, y, _type="XONLY")["regression.points"]
+        np.testing.assert_array_equal(rp["x"], np.round(rp["x"]))
+
+    def test_NNS_part_noise_reduction(self):
+        with self.assertRaises(Exception):
+            NNS.NNS_part(np.arange(10), np.arange(10), noise_reduction="max")
+
+    def test_NNS_part_input(self):
+        with self.assertRaisesRegex(Exception, "empty"):
+            NNS.NNS_part(np.array([]), np.array([]))
+        x = np.arange(10, dtype=float)
+        for _type in [None, "XONLY"]:
+            with self.assertRaisesRegex(Exception, "NaN"):
+                NNS.NNS_part(np.r_[x, np.nan], np.r_[x, 1.0], _type=_type)
+            with self.assertRaisesRegex(Exception, "NaN"):
+                NNS.NNS_part(x, np.r_[x[:-1], np.nan], _type=_type)
+
+    def test_NNS_part_tree(self):
+        rng = np.random.RandomState(1)
+        x = rng.randn(2000)
+        y = x + rng.randn(2000)
+        for kwargs in [{}, {"_type": "XONLY"}, {"obs_req": 1}, {"order": "max"}]:
+            ret = NNS.NNS_part(x, y, tree=True, **kwargs)
+            tree = ret["tree"]
+            # training points fall in their own quadrants
+            np.testing.assert_array_equal(
+                tree.assign(x, y, labels=True), ret["dt"]["quadrant"].values
+            )
+            saved = NNS.PartitionTree.from_dict({k: v.copy() for k, v in tree.to_dict().items()})
+            x_new = rng.randn(500) * 2
+            y_new = rng.randn(500) * 2
+            np.testing.assert_array_equal(saved.assign(x_new, y_new), tree.assign(x_new, y_new))
+        self.assertNotIn("tree", NNS.NNS_part(x, y))
+
+        # XONLY: y not needed; one split per level
+        tree = NNS.NNS_part(x, y, _type="XONLY", order=2, tree=True)["tree"]
+        self.assertEqual(tree.depth, 2)
+        self.assertEqual(len(tree.quadrant), 3)
+        labels = tree.assign(np.array([-10.0, 10.0]), labels=True)
+        self.assertEqual(list(labels), ["q11", "q22"])
+        with self.assertRaises(Exception):
+            NNS.NNS_part(x, y, tree=True)["tree"].assign(x)
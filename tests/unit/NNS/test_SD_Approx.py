@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+import unittest
+import numpy as np
+import NNS
+
+
+class TestSD_Approx(unittest.TestCase):
+    COMPARISON_PRECISION = 7
+
+    def test_matches_exact(self):
+        rng = np.random.RandomState(123)
+        for _ in range(200):
+            y = rng.randn(rng.randint(1, 80))
+            x = rng.choice(y, rng.randint(1, 80)) + np.abs(rng.randn()) * rng.randn(1) * 0.5
+            bins = rng.choice([1, 3, 16, 1024])
+            for degree in [1, 2, 3]:
+                for type_cdf in ["discrete", "continuous"]:
+                    exact = NNS.NNS_SD(x, y, degree, type_cdf)
+                    approx = NNS.NNS_SD_approx(x, y, degree, type_cdf, bins=bins)
+                    self.assertEqual(approx["result"], exact["result"])
+                    self.assertEqual(approx["x.error.bound"], 0)
+                    self.assertEqual(approx["y.error.bound"], 0)
+
+    def test_no_escalation(self):
+        # LPM 2 violation at an edge between integer values, none at the sample points
+        x = np.array(
+            [1.0, 2, 1, 3, 1, -5, -5, 2, 1, 1, 1, 2, -5, 2, 1, -5, 1, 1, 2, 1, 2, 1, -5, 1, -5]
+        )
+        y = np.array([-1.0, 0, -1, 4, -1, -1, 1, -1, -7])
+        self.assertEqual(NNS.NNS_SD(x, y, 3)["result"], "X TSD Y")
+        ret = NNS.NNS_SD_approx(x, y, 3, bins=64, escalate=False)
+        self.assertTrue(np.isnan(ret["x.violation"]))
+        self.assertGreater(ret["x.error.bound"], 0)
+        self.assertEqual(NNS.NNS_SD_approx(x, y, 3, bins=64)["result"], "X TSD Y")
+        # a decision differing from the exact one always comes with a bound
+        rng = np.random.RandomState(0)
+        for _ in range(200):
+            y = np.round(rng.randn(rng.randint(2, 30)) * rng.choice([1, 3, 10]))
+            x = np.round(rng.choice(y, rng.randint(2, 30)) + rng.choice([0, 1, 2]))
+            for degree in [1, 2, 3]:
+                for type_cdf in ["discrete", "continuous"]:
+                    exact = NNS.NNS_SD(x, y, degree, type_cdf)
+                    approx = NNS.NNS_SD_approx(x, y, degree, type_cdf, bins=64, escalate=False)
+                    if approx["result"] != exact["result"]:
+                        self.assertGreater(approx["x.error.bound"] + approx["y.error.bound"], 0)
+
+    def test_wrappers(self):
+        rng = np.random.RandomState(1)
+        y = rng.randn(100000)
+        x = y + 0.1
+        self.assertEqual(NNS.NNS_FSD(x, y, bins=256, use_plot=False), "X FSD Y")
+        self.assertEqual(NNS.NNS_SSD(y, x, bins=256, use_plot=False), "Y SSD X")
+        self.assertEqual(NNS.NNS_TSD(x, rng.randn(1000), bins=256, use_plot=False), "NO TSD EXISTS")
+        ret = NNS.NNS_SD(x, y, 2, bins=256)
+        self.assertEqual(len(ret["support"]), 258)
+        self.assertEqual(ret["escalated"], 0)
+
+    def test_sketch(self):
+        rng = np.random.RandomState(2)
+        x, y = rng.randn(20000) + 0.02, rng.randn(20000)
+        sk_x, sk_y = NNS.SDSketch(-2, 2, 64), NNS.SDSketch(-2, 2, 64)
+        for chunk in np.array_split(x, 7):
+            sk_x.update(chunk)
+        sk_y.update(y)
+        self.assertEqual(sk_x.n, x.shape[0])
+        self.assertAlmostEqual(sk_x.mean, np.mean(x), self.COMPARISON_PRECISION)
+        # curves exact at the grid points, also with values outside [lo, hi]
+        for degree in [1, 2, 3]:
+            ret = NNS.NNS_SD_approx(sk_x, sk_y, degree)
+            lpm_degree = 0 if degree == 1 else degree - 1
+            d = ret["support"][:, None] - x[None, :]
+            if lpm_degree == 0:
+                expected = np.mean(d >= 0, axis=1)
+            else:
+                expected = np.mean(np.maximum(d, 0) ** lpm_degree, axis=1)
+            np.testing.assert_allclose(ret["x.curve"], expected, rtol=1e-9, atol=1e-12)
+        # no escalation from sketches: the bound covers the gap between the curves of each bin
+        ret = NNS.NNS_SD_approx(sk_x, sk_y, 1)
+        exact = NNS.NNS_SD(x, y, 1)
+        if ret["x.dominates"] and not exact["x.dominates"]:
+            self.assertGreaterEqual(
+                ret["x.error.bound"], np.max(exact["x.curve"] - exact["y.curve"])
+            )
+        with self.assertRaises(Exception):
+            NNS.NNS_SD_approx(sk_x, NNS.SDSketch(-1, 1, 64), 1)
@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+import unittest
+
+import numpy as np
+import pandas as pd
+
+import NNS
+
+
+class TestSD_Matrix(unittest.TestCase):
+    COMPARISON_PRECISION = 7
+
+    def test_NNS_SD_matrix(self):
+        z = self.load_default_data()
+        tests = {
+            (1, "discrete"): lambda a, b: NNS.NNS_FSD_uni(a, b, "discrete"),
+            (1, "continuous"): lambda a, b: NNS.NNS_FSD_uni(a, b, "continuous"),
+            (2, "discrete"): NNS.NNS_SSD_uni,
+            (3, "discrete"): NNS.NNS_TSD_uni,
+        }
+        for (degree, type_first_degree), uni in tests.items():
+            ret = NNS.NNS_SD_matrix(z, degree, type_first_degree)
+            self.assertIsInstance(ret, pd.DataFrame)
+            self.assertEqual(list(ret.columns), list(z.columns))
+            for i in z.columns:
+                for j in z.columns:
+                    expected = i != j and uni(z[i], z[j]) == 1
+                    self.assertEqual(ret.loc[i, j], expected, (degree, i, j))
+            ret_np = NNS.NNS_SD_matrix(z.values, degree, type_first_degree)
+            np.testing.assert_array_equal(ret_np, ret.values)
+        self.assertTrue(NNS.NNS_SD_matrix(z, 1).loc["x", "y2"])
+
+    def load_default_data(self):
+        rng = np.random.RandomState(123)
+        x, y = rng.rand(100), rng.rand(100)
+        return pd.DataFrame(
+            {
+                "x": x,
+                "y": y,
+                "y2": y ** 2,
+                "x+": x + 0.2,
+                "n": rng.randn(100) * 0.1 + 0.5,
+                "x_copy": x[::-1].copy(),
+            }
+        )
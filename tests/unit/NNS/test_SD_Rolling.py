@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+import unittest
+import numpy as np
+import pandas as pd
+import NNS
+
+
+class TestSD_Rolling(unittest.TestCase):
+    COMPARISON_PRECISION = 7
+
+    def test_matches_NNS_SD(self):
+        rng = np.random.RandomState(123)
+        for _ in range(10):
+            n = rng.randint(5, 80)
+            window, step = rng.randint(1, n + 1), rng.randint(1, 5)
+            y = np.round(rng.randn(n), 1)
+            x = np.round(y + rng.randn(n) * 0.3 + 0.2, 1)
+            for degree in [1, 2, 3]:
+                ret = NNS.NNS_SD_rolling(x, y, degree, window, step=step)
+                self.assertEqual(len(ret), (n - window) // step + 1)
+                for end, row in ret.iterrows():
+                    start = end - window + 1
+                    sd = NNS.NNS_SD(x[start : end + 1], y[start : end + 1], degree)
+                    self.assertEqual(row["x.dominates"], sd["x.dominates"])
+                    self.assertEqual(row["y.dominates"], sd["y.dominates"])
+                    self.assertAlmostEqual(
+                        row["x.margin"],
+                        max(0, np.max(sd["x.curve"] - sd["y.curve"])),
+                        self.COMPARISON_PRECISION,
+                    )
+
+    def test_panel(self):
+        rng = np.random.RandomState(1)
+        index = pd.date_range("2020-01-01", periods=300)
+        x = pd.DataFrame(rng.randn(300, 3) + [0.5, 0, -0.5], index=index, columns=["a", "b", "c"])
+        y = pd.Series(rng.randn(300), index=index)
+        ret = NNS.NNS_SD_rolling(x, y, 2, 100, step=10)
+        self.assertEqual(list(ret["x.dominates"].columns), ["a", "b", "c"])
+        self.assertEqual(ret["x.dominates"].index[0], index[99])
+        for c in x.columns:
+            single = NNS.NNS_SD_rolling(x[c], y, 2, 100, step=10)
+            for field in ["x.dominates", "y.dominates", "x.margin", "y.margin"]:
+                np.testing.assert_array_equal(ret[field][c].values, single[field].values)
+        self.assertGreater(ret["x.dominates"]["a"].mean(), ret["x.dominates"]["c"].mean())
@@ -58,6 +58,82 @@ class TestSD_Efficient_Set(unittest.TestCase):
         self.assertEqualArray(NNS.NNS_SD_efficient_set(x=z.values, degree=2, status=True), [4, 3])
         self.assertEqualArray(NNS.NNS_SD_efficient_set(x=z.values, degree=3, status=True), [4, 3])
 
+    def test_progress(self):
+        z = self.load_default_data()
+        calls = []
+        ret = NNS.NNS_SD_efficient_set(z, 1, progress=lambda i, n: calls.append((i, n)))
+        self.assertEqual(calls, [(1, 2), (2, 2)])
+        self.assertEqual(ret, NNS.NNS_SD_efficient_set(z, 1, status=False))
+
+        def stop(i, n):
+            raise KeyboardInterrupt()
+
+        with self.assertRaises(KeyboardInterrupt):
+            NNS.NNS_SD_efficient_set(z, 1, progress=stop)
+
+    def test_matches_uni(self):
+        # challenger dominated iff some member of the current set dominates it (NNS_*_uni)
+        def reference(x, degree):
+            order = np.argsort([NNS.LPM(1, np.max(x), x[:, i]) for i in range(x.shape[1])])
+            uni = {1: NNS.NNS_FSD_uni, 2: NNS.NNS_SSD_uni, 3: NNS.NNS_TSD_uni}[degree]
+            base = [order[0]]
+            for i in order[1:]:
+                if not any(uni(x[:, j], x[:, i]) == 1 for j in base):
+                    base.append(i)
+            return [i for i in order if i in base]
+
+        rng = np.random.RandomState(123)
+        for _ in range(10):
+            k = rng.randint(2, 25)
+            x = np.round(rng.randn(50, k) * rng.rand(k) + rng.rand(k) * 2, 1)
+            for degree in [1, 2, 3]:
+                self.assertEqual(
+                    list(NNS.NNS_SD_efficient_set(x, degree, status=False)), reference(x, degree)
+                )
+                self.assertEqual(
+                    list(NNS.NNS_SD_efficient_set(x, degree, status=False, bins=16)),
+                    reference(x, degree),
+                )
+
+    @staticmethod
+    def reference(sd, degree):
+        return NNS.NNS_SD_efficient_set(sd.data, degree, status=False)
+
+    def test_SDEfficientSet(self):
+        rng = np.random.RandomState(123)
+
+        def data(n, k, start=0):
+            values = np.round(rng.randn(n, k) * rng.rand(k) + rng.rand(k) * 2, 2)
+            return pd.DataFrame(values, columns=[f"c{i}" for i in range(start, start + k)])
+
+        for degree in [1, 2, 3]:
+            sd = NNS.SDEfficientSet(data(60, 40), degree, window=60)
+            expected = NNS.NNS_SD_efficient_set(sd.data, degree, status=False)
+            self.assertEqual(sd.efficient_set(), expected)
+            tests = sd.tests
+            # cached result
+            sd.efficient_set()
+            self.assertEqual(sd.tests, tests)
+            # new columns: only pairs involving them are tested
+            sd.add_columns(data(60, 2, start=40))
+            self.assertEqual(sd.efficient_set(), self.reference(sd, degree))
+            self.assertLessEqual(sd.tests - tests, 2 * 42)
+            sd.remove_columns(["c3", expected[0]])
+            self.assertEqual(sd.efficient_set(), self.reference(sd, degree))
+            # rolling window
+            sd.append_rows(data(5, 40).values)
+            self.assertEqual(sd.data.shape, (60, 40))
+            self.assertEqual(sd.efficient_set(), self.reference(sd, degree))
+            sd.expire_rows(10)
+            self.assertEqual(sd.efficient_set(), self.reference(sd, degree))
+            np.testing.assert_array_equal(sd._sorted, np.sort(sd.data.values, axis=0).T)
+        # ndarray: column positions
+        x = data(50, 10).values
+        sd = NNS.SDEfficientSet(x, 2)
+        sd.remove_columns([0])
+        expected = NNS.NNS_SD_efficient_set(x[:, 1:], 2, status=False)
+        self.assertEqualArray(sd.efficient_set(), expected)
+
     def load_default_data(self):
         # R Code:
         # x <- c(0.6964691855978616, 0.28613933495037946, 0.2268514535642031, 0.5513147690828912, 0.7194689697855631, 0.42310646012446096, 0.9807641983846155, 0.6848297385848633, 0.48093190148436094, 0.3921175181941505, 0.3431780161508694, 0.7290497073840416, 0.4385722446796244, 0.05967789660956835, 0.3980442553304314, 0.7379954057320357, 0.18249173045349998, 0.17545175614749253, 0.5315513738418384, 0.5318275870968661, 0.6344009585513211, 0.8494317940777896, 0.7244553248606352, 0.6110235106775829, 0.7224433825702216, 0.3229589138531782, 0.3617886556223141, 0.22826323087895561, 0.29371404638882936, 0.6309761238544878, 0.09210493994507518, 0.43370117267952824, 0.4308627633296438, 0.4936850976503062, 0.425830290295828, 0.3122612229724653, 0.4263513069628082, 0.8933891631171348, 0.9441600182038796, 0.5018366758843366, 0.6239529517921112, 0.11561839507929572, 0.3172854818203209, 0.4148262119536318, 0.8663091578833659, 0.2504553653965067, 0.48303426426270435, 0.985559785610705, 0.5194851192598093, 0.6128945257629677, 0.12062866599032374, 0.8263408005068332, 0.6030601284109274, 0.5450680064664649, 0.3427638337743084, 0.3041207890271841, 0.4170222110247016, 0.6813007657927966, 0.8754568417951749, 0.5104223374780111, 0.6693137829622723, 0.5859365525622129, 0.6249035020955999, 0.6746890509878248, 0.8423424376202573, 0.08319498833243877, 0.7636828414433382, 0.243666374536874, 0.19422296057877086, 0.5724569574914731, 0.09571251661238711, 0.8853268262751396, 0.6272489720512687, 0.7234163581899548, 0.01612920669501683, 0.5944318794450425, 0.5567851923942887, 0.15895964414472274, 0.1530705151247731, 0.6955295287709109, 0.31876642638187636, 0.6919702955318197, 0.5543832497177721, 0.3889505741231446, 0.9251324896139861, 0.8416699969127163, 0.35739756668317624, 0.04359146379904055, 0.30476807341109746, 0.398185681917981, 0.7049588304513622, 0.9953584820340174, 0.35591486571745956, 0.7625478137854338, 0.5931769165622212, 0.6917017987001771, 0.15112745234808023, 0.39887629272615654, 0.24085589772362448, 0.34345601404832493)
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+import unittest
+import zlib
+
+import numpy as np
+import pandas as pd
+
+import NNS
+from NNS.Sort_Cache import sorted_union, sorted_values
+
+
+class TestSortCache(unittest.TestCase):
+    COMPARISON_PRECISION = 7
+
+    def test_sorted_values(self):
+        x, y = self.load_default_data()
+        NNS.sort_cache_clear()
+        s = sorted_values(x)
+        np.testing.assert_array_equal(s, np.sort(x))
+        self.assertFalse(s.flags.writeable)
+        self.assertIs(sorted_values(x), s)
+        self.assertIs(sorted_values(pd.Series(x)), s)  # same buffer
+        self.assertEqual(NNS.sort_cache_info()["hits"], 2)
+        # modified in place: sorted again
+        x[0] = 100.0
+        np.testing.assert_array_equal(sorted_values(x), np.sort(x))
+        # modified in place with the same crc32: the last bit of these values, a solution of the
+        # (linear) crc of the bit flips, found by gaussian elimination
+        crc = zlib.crc32(x.tobytes())
+        x.view(np.uint64)[[0, 6, 9, 10, 16, 20, 21, 22, 24, 25, 27, 28, 30, 31, 32]] ^= np.uint64(1)
+        self.assertEqual(zlib.crc32(x.tobytes()), crc)
+        np.testing.assert_array_equal(sorted_values(x), np.sort(x))
+        # strided column views
+        m = np.column_stack([x, y])
+        np.testing.assert_array_equal(sorted_values(m[:, 1]), np.sort(y))
+        self.assertIs(sorted_values(m[:, 1]), sorted_values(m[:, 1]))
+
+        with NNS.sort_cache(False):
+            self.assertEqual(NNS.sort_cache_info()["entries"], 0)
+            np.testing.assert_array_equal(sorted_values(y), np.sort(y))
+            self.assertEqual(NNS.sort_cache_info()["entries"], 0)
+        self.assertTrue(NNS.sort_cache_info()["enabled"])
+
+    def test_sorted_union(self):
+        x, y = self.load_default_data()
+        y[:10] = x[:10]  # shared values
+        np.testing.assert_array_equal(sorted_union(x, y), np.unique(np.append(x, y)))
+        np.testing.assert_array_equal(sorted_union(y, x), np.unique(np.append(x, y)))
+        x[[3, 50]] = np.nan
+        np.testing.assert_array_equal(sorted_union(x, y), np.unique(np.append(x, y)))
+        a, b = np.arange(100) % 7, np.arange(100) % 11
+        np.testing.assert_array_equal(sorted_union(a, b), np.unique(np.append(a, b)))
+
+    def test_limits(self):
+        x, y = self.load_default_data()
+        NNS.sort_cache_clear()
+        with NNS.sort_cache(True, max_bytes=x.nbytes):
+            sorted_values(x)
+            sorted_values(y)  # evicts x
+            self.assertEqual(NNS.sort_cache_info()["entries"], 1)
+            self.assertLessEqual(NNS.sort_cache_info()["bytes"], x.nbytes)
+
+    def test_consumers(self):
+        x, y = self.load_default_data()
+        self.assertAlmostEqual(
+            NNS.LPM_VaR(0.1, 0, x),
+            np.quantile(x, 0.1),
+            self.COMPARISON_PRECISION,
+        )
+        np.testing.assert_allclose(
+            NNS.UPM_VaR([0.0, 0.25, 0.5, 0.99, 1.0], 0, x),
+            np.quantile(x, [1.0, 0.75, 0.5, 0.01, 0.0]),
+        )
+        self.assertTrue(np.isnan(NNS.LPM_VaR(0.1, 0, np.append(x, np.nan))))
+        self.assertEqual(
+            NNS.Internal_Functions.fivenum(np.append(x, np.nan)),
+            NNS.Internal_Functions.fivenum(x),
+        )
+        z = pd.DataFrame({"x": x, "y": y, "z": x + 0.1})
+        NNS.sort_cache_clear()
+        NNS.NNS_SD_efficient_set(z, 1, status=False)
+        # every column sorted once, whatever the number of comparisons
+        self.assertEqual(NNS.sort_cache_info()["misses"] - NNS.sort_cache_info()["entries"], 0)
+
+    def load_default_data(self):
+        rng = np.random.RandomState(123)
+        return rng.randn(100), rng.randn(100)
@@ -1,9 +1,12 @@
 # -*- coding: utf-8 -*-
 import unittest
+from fractions import Fraction
 
+import numpy as np
 import pandas as pd
 
 import NNS
+from NNS.Partial_Moments import LPM, UPM
 
 
 class TestUni_SD_Routines(unittest.TestCase):
@@ -29,6 +32,69 @@ class TestUni_SD_Routines(unittest.TestCase):
         assert NNS.NNS_TSD_uni(x, y) == 0
         assert NNS.NNS_TSD_uni(x, y.pow(2)) == 1
 
+    def test_sweep_matches_LPM(self):
+        # merge sweep against LPM evaluated at every point of the combined support
+        def reference(x, y, degree, ratio):
+            Combined_sort = np.unique(np.append(x, y))
+            LPM_x_sort, LPM_y_sort = LPM(degree, Combined_sort, x), LPM(degree, Combined_sort, y)
+            if ratio:
+                LPM_x_sort = LPM_x_sort / (UPM(degree, Combined_sort, x) + LPM_x_sort)
+                LPM_y_sort = LPM_y_sort / (UPM(degree, Combined_sort, y) + LPM_y_sort)
+            return int(
+                not np.any(LPM_x_sort > LPM_y_sort) and not np.equal(LPM_x_sort, LPM_y_sort).all()
+            )
+
+        rng = np.random.RandomState(123)
+        for _ in range(200):
+            y = np.round(rng.randn(rng.randint(2, 80)), rng.choice([1, 8]))
+            x = np.round(rng.randn(rng.randint(2, 80)) + rng.choice([0, 0.5, 2]), 1)
+            if rng.rand() < 0.3:
+                x = y + rng.choice([0, 0.1])
+            x = np.maximum(x, y.min())
+            tests = [
+                (NNS.NNS_FSD_uni(x, y, "discrete"), 0, True),
+                (NNS.NNS_FSD_uni(x, y, "continuous"), 1, True),
+            ]
+            if x.mean() >= y.mean():
+                tests += [(NNS.NNS_SSD_uni(x, y), 1, False), (NNS.NNS_TSD_uni(x, y), 2, False)]
+            for ret, degree, ratio in tests:
+                self.assertEqual(ret, reference(x, y, degree, ratio))
+        # NaN: LPM path
+        x = np.append(y + 1, np.nan)
+        self.assertEqual(NNS.NNS_SSD_uni(x, y), 0)
+
+    def test_sweep_near_ties(self):
+        # float64 sweep against exact (rational) partial moments; the float32 LPM path differs
+        def exact(x, y, degree, ratio):
+            x, y = [Fraction(v) for v in x], [Fraction(v) for v in y]
+            lx, ly = [], []
+            for t in sorted(set(x) | set(y)):
+                for v, ret in [(x, lx), (y, ly)]:
+                    lpm = sum((t - a) ** degree for a in v if a <= t) / len(v)
+                    upm = sum((a - t) ** degree for a in v if a > t) / len(v)
+                    ret.append(lpm / (lpm + upm) if ratio else lpm)
+            return int(all(a <= b for a, b in zip(lx, ly)) and lx != ly)
+
+        rng = np.random.RandomState(0)
+        for k in range(100):
+            x = rng.randn(rng.randint(5, 40))
+            y = rng.permutation(x) if k % 2 == 0 else x + rng.randn(x.shape[0]) * 1e-7
+            tests = [(NNS.NNS_FSD_uni(x, y, "continuous"), 1, True)] if x.min() >= y.min() else []
+            if x.min() >= y.min() and x.mean() >= y.mean():
+                tests += [(NNS.NNS_SSD_uni(x, y), 1, False), (NNS.NNS_TSD_uni(x, y), 2, False)]
+            for ret, degree, ratio in tests:
+                self.assertEqual(ret, exact(x, y, degree, ratio))
+            if k % 2 == 0:
+                self.assertEqual(NNS.NNS_TSD_uni(x, y), 0)
+
+        # a sample and its permutation: no dominance, the float32 LPM finds x TSD y
+        x = np.array([0.32, -0.25, 1.46, -2.06])
+        y = x[::-1].copy()
+        self.assertEqual(NNS.NNS_TSD_uni(x, y), 0)
+        Combined_sort = np.unique(x)
+        LPM_x_sort, LPM_y_sort = LPM(2, Combined_sort, x), LPM(2, Combined_sort, y)
+        self.assertTrue(np.all(LPM_x_sort <= LPM_y_sort) and np.any(LPM_x_sort < LPM_y_sort))
+
     def load_default_data(self):
         # R Code:
         # x <- c(0.6964691855978616, 0.28613933495037946, 0.2268514535642031, 0.5513147690828912, 0.7194689697855631, 0.42310646012446096, 0.9807641983846155, 0.6848297385848633, 0.48093190148436094, 0.3921175181941505, 0.3431780161508694, 0.7290497073840416, 0.4385722446796244, 0.05967789660956835, 0.3980442553304314, 0.7379954057320357, 0.18249173045349998, 0.17545175614749253, 0.5315513738418384, 0.5318275870968661, 0.6344009585513211, 0.8494317940777896, 0.7244553248606352, 0.6110235106775829, 0.7224433825702216, 0.3229589138531782, 0.3617886556223141, 0.22826323087895561, 0.29371404638882936, 0.6309761238544878, 0.09210493994507518, 0.43370117267952824, 0.4308627633296438, 0.4936850976503062, 0.425830290295828, 0.3122612229724653, 0.4263513069628082, 0.8933891631171348, 0.9441600182038796, 0.5018366758843366, 0.6239529517921112, 0.11561839507929572, 0.3172854818203209, 0.4148262119536318, 0.8663091578833659, 0.2504553653965067, 0.48303426426270435, 0.985559785610705, 0.5194851192598093, 0.6128945257629677, 0.12062866599032374, 0.8263408005068332, 0.6030601284109274, 0.5450680064664649, 0.3427638337743084, 0.3041207890271841, 0.4170222110247016, 0.6813007657927966, 0.8754568417951749, 0.5104223374780111, 0.6693137829622723, 0.5859365525622129, 0.6249035020955999, 0.6746890509878248, 0.8423424376202573, 0.08319498833243877, 0.7636828414433382, 0.243666374536874, 0.19422296057877086, 0.5724569574914731, 0.09571251661238711, 0.8853268262751396, 0.6272489720512687, 0.7234163581899548, 0.01612920669501683, 0.5944318794450425, 0.5567851923942887, 0.15895964414472274, 0.1530705151247731, 0.6955295287709109, 0.31876642638187636, 0.6919702955318197, 0.5543832497177721, 0.3889505741231446, 0.9251324896139861, 0.8416699969127163, 0.35739756668317624, 0.04359146379904055, 0.30476807341109746, 0.398185681917981, 0.7049588304513622, 0.9953584820340174, 0.35591486571745956, 0.7625478137854338, 0.5931769165622212, 0.6917017987001771, 0.15112745234808023, 0.39887629272615654, 0.24085589772362448, 0.34345601404832493)
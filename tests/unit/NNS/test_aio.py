@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import NNS
+import NNS.aio
+
+
+class TestAio(unittest.TestCase):
+    COMPARISON_PRECISION = 7
+
+    def test_PM_matrix(self):
+        z = self.load_default_data()
+        expected = NNS.PM_matrix(1, 1, target="mean", variable=z, pop_adj=True)
+
+        async def run():
+            return await asyncio.gather(
+                NNS.aio.PM_matrix(1, 1, target="mean", variable=z, pop_adj=True, chunk_size=1),
+                NNS.aio.PM_matrix(1, 1, target="mean", variable=z, pop_adj=True, chunk_size=1),
+            )
+
+        for ret in asyncio.run(run()):
+            for k in expected:
+                pd.testing.assert_frame_equal(ret[k], expected[k])
+        self.assertEqual(asyncio.run(NNS.aio.PM_matrix(1, 1))["cupm"], None)
+
+    def test_VaR(self):
+        x = self.load_default_data()["x"]
+        percentiles = [0.05, 0.25, 0.5, 0.9]
+
+        async def run():
+            return await asyncio.gather(
+                NNS.aio.LPM_VaR(0.05, 0, x),
+                NNS.aio.LPM_VaR(percentiles, 0, x, chunk_size=2),
+                NNS.aio.LPM_VaR(percentiles, 1, x.values),
+                NNS.aio.UPM_VaR(0.05, 1, x),
+                NNS.aio.UPM_VaR(percentiles, 0, x),
+            )
+
+        NNS.aio.set_executor(ThreadPoolExecutor(max_workers=2))
+        try:
+            ret = asyncio.run(run())
+        finally:
+            NNS.aio.get_executor().shutdown()
+            NNS.aio.set_executor(None)
+        self.assertAlmostEqual(ret[0], NNS.LPM_VaR(0.05, 0, x))
+        np.testing.assert_allclose(ret[1], NNS.LPM_VaR(percentiles, 0, x))
+        np.testing.assert_allclose(ret[2], NNS.LPM_VaR(percentiles, 1, x.values))
+        self.assertAlmostEqual(ret[3], NNS.UPM_VaR(0.05, 1, x))
+        np.testing.assert_allclose(ret[4], NNS.UPM_VaR(percentiles, 0, x))
+
+    def test_NNS_SD_efficient_set(self):
+        z = self.load_default_data()
+        z["xx"] = z["x"] + 10
+        z["yy"] = z["y"] + 10
+        ret = asyncio.run(NNS.aio.NNS_SD_efficient_set(z, 1))
+        self.assertEqual(ret, NNS.NNS_SD_efficient_set(z, 1, status=False))
+
+    def test_cancel(self):
+        x = self.load_default_data()["x"]
+
+        percentiles = np.linspace(0, 1, 200)
+
+        async def run():
+            task = asyncio.ensure_future(NNS.aio.LPM_VaR(percentiles, 1, x, chunk_size=1))
+            await asyncio.sleep(0.01)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+            # nothing left in flight once the only caller is gone
+            await asyncio.sleep(0.05)
+            return len(NNS.aio._inflight)
+
+        self.assertEqual(asyncio.run(run()), 0)
+
+    def load_default_data(self):
+        rng = np.random.RandomState(123)
+        return pd.DataFrame({"x": rng.rand(100), "y": rng.rand(100), "z": rng.rand(100)})